@@ -1,48 +1,48 @@
 from datetime import datetime
 from prettytable import PrettyTable
 import struct
-import os
+import record_codec
+import date_codec
+import storage
 
 # -------------------- Config --------------------
 LOG_FILE = "product_change.bin"
 CUSTOMER_LOG_FILE = "customer_change.bin"
-LOG_STRUCT_FMT = "19si13s20sffi12si20s"
-LOG_RECORD_SIZE = struct.calcsize(LOG_STRUCT_FMT)
-CUSTOMER_LOG_STRUCT_FMT = "19si10s50s10sI20s"
-CUSTOMER_LOG_RECORD_SIZE = struct.calcsize(CUSTOMER_LOG_STRUCT_FMT)
+LOG_STRUCT_FMT = record_codec.PRODUCT_LOG.format
+LOG_RECORD_SIZE = record_codec.PRODUCT_LOG.size
+CUSTOMER_LOG_STRUCT_FMT = record_codec.CUSTOMER_LOG.format
+CUSTOMER_LOG_RECORD_SIZE = record_codec.CUSTOMER_LOG.size
 
-SALE_STRUCT_FMT = "10s10s10sffi"
-SALE_RECORD_SIZE = struct.calcsize(SALE_STRUCT_FMT)
+SALE_STRUCT_FMT = record_codec.SALE.format
+SALE_RECORD_SIZE = record_codec.SALE.size
 
-SALE_DETAIL_STRUCT_FMT = "10s13siff"
-SALE_DETAIL_RECORD_SIZE = struct.calcsize(SALE_DETAIL_STRUCT_FMT)
+SALE_DETAIL_STRUCT_FMT = record_codec.SALE_DETAIL.format
+SALE_DETAIL_RECORD_SIZE = record_codec.SALE_DETAIL.size
 
-CUSTOMER_STRUCT_FMT = "10s50s10sI"
-CUSTOMER_RECORD_SIZE = struct.calcsize(CUSTOMER_STRUCT_FMT)
+CUSTOMER_STRUCT_FMT = record_codec.CUSTOMER.format
+CUSTOMER_RECORD_SIZE = record_codec.CUSTOMER.size
 
 # -------------------- ฟังก์ชันช่วย --------------------
 def unpack_log(data: bytes):
     try:
-        r = struct.unpack(LOG_STRUCT_FMT, data)
+        r = record_codec.PRODUCT_LOG.unpack(data)
     except struct.error:
         return None
-
-    ts_raw = r[0].decode().strip("\x00")
-    op_code = r[1]
-    pro_id = r[2].decode().strip("\x00")
-    pro_name = r[3].decode().strip("\x00")
-    pro_cost = r[4]
-    pro_sale = r[5]
-    pro_amount = r[6]
-    category = r[7].decode().strip("\x00")
-    pro_status = r[8]
-    user = r[9].decode().strip("\x00")
-
-    ts_dt = None
-    try:
-        ts_dt = datetime.strptime(ts_raw.replace("_", " "), "%Y-%m-%d %H:%M:%S")
-    except:
-        ts_dt = None
+    return log_to_dict(record_codec.ProductLogRow(r))
+
+def log_to_dict(r):
+    ts_raw = r.ts
+    op_code = r.op_code
+    pro_id = r.pro_id
+    pro_name = r.pro_name
+    pro_cost = r.pro_cost
+    pro_sale = r.pro_salePrice
+    pro_amount = r.pro_amount
+    category = r.category
+    pro_status = r.status
+    user = r.user
+
+    ts_dt = date_codec.parse_timestamp(r[0])  # cache ตาม timestamp ดิบ 19 bytes
 
     return {
         "ts": ts_raw,
@@ -60,22 +60,20 @@ def unpack_log(data: bytes):
 
 def unpack_customer_log(data: bytes):
     try:
-        r = struct.unpack(CUSTOMER_LOG_STRUCT_FMT, data)
+        r = record_codec.CUSTOMER_LOG.unpack(data)
     except struct.error:
         return None
-    ts_raw = r[0].decode().strip("\x00")
-    op_code = r[1]
-    cust_id = r[2].decode().strip("\x00")
-    cust_name = r[3].decode().strip("\x00")
-    cust_tel = r[4].decode().strip("\x00")
-    cust_status = r[5]
-    user = r[6].decode().strip("\x00")
-
-    ts_dt = None
-    try:
-        ts_dt = datetime.strptime(ts_raw.replace("_", " "), "%Y-%m-%d %H:%M:%S")
-    except:
-        ts_dt = None
+    return customer_log_to_dict(record_codec.CustomerLogRow(r))
+
+def customer_log_to_dict(r):
+    op_code = r.op_code
+    cust_id = r.cust_id
+    cust_name = r.cust_name
+    cust_tel = r.cust_tel
+    cust_status = r.status
+    user = r.user
+
+    ts_dt = date_codec.parse_timestamp(r[0])  # cache ตาม timestamp ดิบ 19 bytes
 
     return {
         "ts_dt": ts_dt,
@@ -87,10 +85,47 @@ def unpack_customer_log(data: bytes):
         "User": user
     }
 
+def load_sale_details(sale_ids):
+    """รายละเอียดสินค้าเฉพาะบิลที่เลือก (sale_id -> list ของ dict) หักสินค้าที่คืนแล้ว (แบบ file อ่านผ่าน sale_detail.idx)"""
+    sale_details = {}
+    for sale_id in dict.fromkeys(sale_ids):
+        for r in map(record_codec.SaleDetailRow, storage.get().sale_lines(sale_id)):
+            sale_details.setdefault(sale_id, []).append({
+                "pro_id": r.pro_id.strip(),
+                "amount": r.amount,
+                "price": r.sale_price,
+                "discount": r.discount
+            })
+    return sale_details
+
+def sale_summary(sale):
+    """sale_id / cust_id / net_price ของบิล (None ถ้าไม่มี)"""
+    if sale is None:
+        return None
+    return {"sale_id": sale["sale_id"], "cust_id": sale["cust_id"], "net_price": sale["net_price"]}
+
+def totals_summary(bill):
+    """แปลง (sale_id, cust_id, net_price) จาก day_totals เป็น dict แบบ sale_summary"""
+    if bill is None:
+        return None
+    sale_id, cust_id, net_price = bill
+    return {"sale_id": sale_id, "cust_id": cust_id, "net_price": net_price}
+
+def load_day_sales(day):
+    """บิลของวันหนึ่งจาก storage engine (หัก void / คืนสินค้าแล้ว บิลที่ void ไม่ถูกส่งมา)"""
+    return [{
+        "sale_id": r.sale_id.strip(),
+        "cust_id": r.cust_id.strip(),
+        "net_price": float(r.net_price),
+        "net_discount": float(r.total_discount),
+        "sale_status": int(r.status),
+        "sale_dt": day
+    } for r in map(record_codec.SaleRow, storage.get().sales_of_day(day))]
+
 # -------------------- ฟังก์ชันสร้างรายงาน --------------------
 def generate_report():
     try:
-        # -------------------- อ่าน product.dat --------------------
+        # -------------------- อ่านสินค้า --------------------
         products = {}
         table = PrettyTable()
         table.field_names = ["ID", "Name", "Cost", "Sale Price", "Amount", "Category", "Status"]
@@ -99,100 +134,36 @@ def generate_report():
         category_counter = {}
         sold_out_products = []
 
-        if not os.path.exists("product.dat"):
-            print("❌ ไม่พบไฟล์ product.dat")
-            return
-
-        with open("product.dat", "rb") as f:
-            record_size = struct.calcsize('13s20sffi12si')
-            while True:
-                data = f.read(record_size)
-                if not data:
-                    break
-                record = struct.unpack('13s20sffi12si', data)
-                pro_id = record[0].decode().strip("\x00")
-                pro_name = record[1].decode().strip("\x00")
-                pro_cost = record[2]
-                sale_price = record[3]
-                amount = record[4]
-                category = record[5].decode().strip("\x00")
-                status = record[6]
-
-                table.add_row([pro_id, pro_name, pro_cost, sale_price, amount, category, status])
-                products[pro_id] = pro_name
-
-                if status in status_counter:
-                    status_counter[status] += 1
-                category_counter[category] = category_counter.get(category, 0) + amount
-                if status == 2:
-                    sold_out_products.append(pro_name)
-            # print(table)
-
-        # -------------------- อ่าน customer.dat --------------------
+        for record in map(record_codec.ProductRow, storage.get().products().values()):
+            pro_id = record.pro_id
+            pro_name = record.pro_name
+            pro_cost = record.pro_cost
+            sale_price = record.pro_salePrice
+            amount = record.pro_amount
+            category = record.category
+            status = record.status
+
+            table.add_row([pro_id, pro_name, pro_cost, sale_price, amount, category, status])
+            products[pro_id] = pro_name
+
+            if status in status_counter:
+                status_counter[status] += 1
+            category_counter[category] = category_counter.get(category, 0) + amount
+            if status == 2:
+                sold_out_products.append(pro_name)
+        # print(table)
+
+        # -------------------- อ่านลูกค้า --------------------
         customers = {}
-        if os.path.exists("customer.dat"):
-            with open("customer.dat", "rb") as cf:
-                while True:
-                    data = cf.read(CUSTOMER_RECORD_SIZE)
-                    if not data:
-                        break
-                    r = struct.unpack(CUSTOMER_STRUCT_FMT, data)
-                    cust_id = r[0].decode().strip("\x00")
-                    cust_name = r[1].decode().strip("\x00")
-                    customers[cust_id] = cust_name
-
-        # -------------------- อ่าน sale_detail.dat --------------------
-        sale_details = {}
-        if os.path.exists("sale_detail.dat"):
-            with open("sale_detail.dat", "rb") as df:
-                while True:
-                    data = df.read(SALE_DETAIL_RECORD_SIZE)
-                    if not data: break
-                    if len(data) != SALE_DETAIL_RECORD_SIZE: continue
-                    r = struct.unpack(SALE_DETAIL_STRUCT_FMT, data)
-                    sale_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                    pro_id = r[1].decode(errors="ignore").strip("\x00").strip()
-                    amount = r[2]
-                    price = r[3]
-                    discount = r[4]
-                    if sale_id not in sale_details:
-                        sale_details[sale_id] = []
-                    sale_details[sale_id].append({
-                        "pro_id": pro_id,
-                        "amount": amount,
-                        "price": price,
-                        "discount": discount
-                    })
-
-        # -------------------- อ่าน sale.dat (เฉพาะวันนี้) --------------------
-        today_sales = []
-        if os.path.exists("sale.dat"):
-            with open("sale.dat", "rb") as sf:
-                while True:
-                    data = sf.read(SALE_RECORD_SIZE)
-                    if not data: break
-                    if len(data) != SALE_RECORD_SIZE: continue
-                    r = struct.unpack(SALE_STRUCT_FMT, data)
-                    sale_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                    cust_id = r[1].decode(errors="ignore").strip("\x00").strip()
-                    sale_date_str = r[2].decode(errors="ignore").strip("\x00").strip()
-                    net_price = r[3]
-                    net_discount = r[4]
-                    sale_status = r[5]
-
-                    try:
-                        sale_dt = datetime.strptime(sale_date_str, "%Y-%m-%d")
-                    except:
-                        continue
+        for r in map(record_codec.CustomerRow, storage.get().customers()):
+            customers[r.cust_id] = r.cust_name
+
+        # -------------------- อ่านบิลขาย (เฉพาะวันนี้ ไม่รวมบิลที่ยกเลิก) --------------------
+        today = datetime.now().date()
+        today_sales = [s for s in load_day_sales(today) if s["sale_status"] != 1]
 
-                    if sale_dt.date() == datetime.now().date() and sale_status != 1:
-                        today_sales.append({
-                            "sale_id": sale_id,
-                            "cust_id": cust_id,
-                            "net_price": net_price,
-                            "net_discount": net_discount,
-                            "sale_dt": sale_dt.date()
-                        })
+        # -------------------- อ่านรายละเอียดบิล (เฉพาะบิลของวันนี้) --------------------
+        sale_details = load_sale_details([s["sale_id"] for s in today_sales])
 
         # -------------------- รวมบิล + รายละเอียดสินค้าในตารางเดียว --------------------
         table_sale = PrettyTable()
@@ -232,10 +203,12 @@ def generate_report():
 
 
         # -------------------- คำนวณสรุปยอดขาย --------------------
-        total_sales = sum(s['net_price'] for s in today_sales) if today_sales else 0
-        max_sale = max(today_sales, key=lambda x: x['net_price']) if today_sales else None
-        min_sale = min(today_sales, key=lambda x: x['net_price']) if today_sales else None
-        avg_sale = (total_sales / len(today_sales)) if today_sales else 0
+        # แบบ file อ่านจาก daily_totals (อัปเดตตอนขาย/แก้ไข/ลบบิล) แทนการคำนวณใหม่ทุกครั้ง
+        totals = storage.get().day_totals(today)
+        total_sales = totals["total"]
+        max_sale = totals_summary(totals["max"])
+        min_sale = totals_summary(totals["min"])
+        avg_sale = (total_sales / totals["bills"]) if totals["bills"] else 0
 
         # -------------------- แสดงผลทางหน้าจอ --------------------
         print("\n📋 รายการขายวันนี้ + รายละเอียดสินค้า")
@@ -272,19 +245,15 @@ def generate_report():
         product_user_counter = {}
         action_meaning = {1:"ADD", 2:"UPDATE", 3:"DELETE", 4:"VIEW", 5:"OTHER"}
 
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE,"rb") as pf:
-                while True:
-                    data = pf.read(LOG_RECORD_SIZE)
-                    if not data: 
-                        break
-                    log = unpack_log(data)
-                    if log and log["ts_dt"] and log["ts_dt"].date() == datetime.now().date():
-                        product_logs.append(log)
-                        # นับ action
-                        product_action_counter[log["op_code"]] = product_action_counter.get(log["op_code"],0)+1
-                        # นับ user
-                        product_user_counter[log["User"]] = product_user_counter.get(log["User"],0)+1
+        # อ่านเฉพาะ log ของวันนี้ (binary search ตาม timestamp)
+        for r in storage.get().read_log(LOG_FILE, today, record_codec.ProductLogRow):
+            log = log_to_dict(r)
+            if log and log["ts_dt"] and log["ts_dt"].date() == datetime.now().date():
+                product_logs.append(log)
+                # นับ action
+                product_action_counter[log["op_code"]] = product_action_counter.get(log["op_code"],0)+1
+                # นับ user
+                product_user_counter[log["User"]] = product_user_counter.get(log["User"],0)+1
 
         print("\n=== Product Change History ===")
         if product_logs:
@@ -311,16 +280,12 @@ def generate_report():
         customer_logs = []
         customer_action_counter = {}
         customer_user_counter = {}
-        if os.path.exists(CUSTOMER_LOG_FILE):
-            with open(CUSTOMER_LOG_FILE,"rb") as cf:
-                while True:
-                    data = cf.read(CUSTOMER_LOG_RECORD_SIZE)
-                    if not data: break
-                    log = unpack_customer_log(data)
-                    if log and log["ts_dt"] and log["ts_dt"].date()==datetime.now().date():
-                        customer_logs.append(log)
-                        customer_action_counter[log["op_code"]] = customer_action_counter.get(log["op_code"],0)+1
-                        customer_user_counter[log["User"]] = customer_user_counter.get(log["User"],0)+1
+        for r in storage.get().read_log(CUSTOMER_LOG_FILE, today, record_codec.CustomerLogRow):
+            log = customer_log_to_dict(r)
+            if log and log["ts_dt"] and log["ts_dt"].date()==datetime.now().date():
+                customer_logs.append(log)
+                customer_action_counter[log["op_code"]] = customer_action_counter.get(log["op_code"],0)+1
+                customer_user_counter[log["User"]] = customer_user_counter.get(log["User"],0)+1
 
         print("\n=== Customer Change History ===")
         if customer_logs:
@@ -617,96 +582,16 @@ def generate_report():
 #         if exit_input == "Y":
 #             break
 
-from datetime import datetime
-from prettytable import PrettyTable
-import struct
-import os
-
 def Sale_Report():
-    SALE_STRUCT_FMT = '10s10s10sffi'
-    SALE_RECORD_SIZE = struct.calcsize(SALE_STRUCT_FMT)
-
-    SALE_DETAIL_STRUCT_FMT = '10s13siff'
-    SALE_DETAIL_RECORD_SIZE = struct.calcsize(SALE_DETAIL_STRUCT_FMT)
-
-    CUSTOMER_STRUCT_FMT = '10s50s10sI'
-    CUSTOMER_RECORD_SIZE = struct.calcsize(CUSTOMER_STRUCT_FMT)
-
     # -------------------- อ่านข้อมูลสินค้า --------------------
     products = {}
-    if os.path.exists("product.dat"):
-        with open("product.dat", "rb") as pf:
-            record_size = struct.calcsize("13s20sffi12si")
-            while True:
-                data = pf.read(record_size)
-                if not data: break
-                if len(data) != record_size: continue
-                r = struct.unpack("13s20sffi12si", data)
-                pro_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                pro_name = r[1].decode(errors="ignore").strip("\x00").strip()
-                products[pro_id] = pro_name
+    for r in map(record_codec.ProductRow, storage.get().products().values()):
+        products[r.pro_id.strip()] = r.pro_name.strip()
 
     # -------------------- อ่านข้อมูลลูกค้า --------------------
     customers = {}
-    if os.path.exists("customer.dat"):
-        with open("customer.dat", "rb") as cf:
-            while True:
-                data = cf.read(CUSTOMER_RECORD_SIZE)
-                if not data: break
-                if len(data) != CUSTOMER_RECORD_SIZE: continue
-                r = struct.unpack(CUSTOMER_STRUCT_FMT, data)
-                cust_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                cust_name = r[1].decode(errors="ignore").strip("\x00").strip()
-                customers[cust_id] = cust_name
-
-    # -------------------- อ่านรายละเอียดการขาย --------------------
-    sale_details = {}
-    if os.path.exists("sale_detail.dat"):
-        with open("sale_detail.dat", "rb") as df:
-            while True:
-                data = df.read(SALE_DETAIL_RECORD_SIZE)
-                if not data: break
-                if len(data) != SALE_DETAIL_RECORD_SIZE: continue
-                r = struct.unpack(SALE_DETAIL_STRUCT_FMT, data)
-                sale_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                pro_id = r[1].decode(errors="ignore").strip("\x00").strip()
-                amount = r[2]
-                price = r[3]
-                discount = r[4]
-
-                if sale_id not in sale_details:
-                    sale_details[sale_id] = []
-                sale_details[sale_id].append({
-                    "pro_id": pro_id,
-                    "amount": amount,
-                    "price": price,
-                    "discount": discount
-                })
-
-    # -------------------- ฟังก์ชันช่วยแปลง string วันเป็น date object --------------------
-    def parse_sale_date(s: str):
-        try:
-            s = s.strip().strip("\x00").strip()
-            if not s:
-                return None
-            fmts = ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%d%m%Y"]
-            for fmt in fmts:
-                try:
-                    dt = datetime.strptime(s, fmt)
-                    if dt.year > 2500:
-                        dt = dt.replace(year=dt.year - 543)
-                    return dt.date()
-                except Exception:
-                    continue
-            # แบบไม่มีตัวคั่น DDMMYYYY
-            s2 = ''.join(ch for ch in s if ch.isdigit())
-            if len(s2) == 8:
-                day = int(s2[:2]); month = int(s2[2:4]); year = int(s2[4:])
-                if year > 2500: year -= 543
-                return datetime(year, month, day).date()
-            return None
-        except Exception:
-            return None
+    for r in map(record_codec.CustomerRow, storage.get().customers()):
+        customers[r.cust_id.strip()] = r.cust_name.strip()
 
     # -------------------- เริ่ม loop รายงาน --------------------
     while True:
@@ -749,47 +634,16 @@ def Sale_Report():
             print(f"❌ Error parsing date: {e}")
             continue
 
-        # -------------------- อ่าน sale.dat --------------------
-        if not os.path.exists("sale.dat"):
-            print("❌ ไม่พบไฟล์ sale.dat")
-            return
-
-        sales_today = []
-        cancelled_count = 0
-        discount_count = 0
-
+        # -------------------- อ่านบิลขาย --------------------
         try:
-            with open("sale.dat", "rb") as f:
-                while True:
-                    data = f.read(SALE_RECORD_SIZE)
-                    if not data: break
-                    if len(data) != SALE_RECORD_SIZE: continue
-                    try:
-                        r = struct.unpack(SALE_STRUCT_FMT, data)
-                        sale_id = r[0].decode(errors="ignore").strip("\x00").strip()
-                        cust_id = r[1].decode(errors="ignore").strip("\x00").strip()
-                        sale_date_str = r[2].decode(errors="ignore").strip("\x00").strip()
-                        net_price = float(r[3])
-                        net_discount = float(r[4])
-                        sale_status = int(r[5])
-                    except Exception:
-                        continue
-
-                    sale_dt = parse_sale_date(sale_date_str)
-                    if sale_dt is None: continue
-                    if sale_dt == report_date:
-                        sales_today.append({
-                            "sale_id": sale_id,
-                            "cust_id": cust_id,
-                            "net_price": net_price,
-                            "net_discount": net_discount,
-                            "sale_status": sale_status,
-                            "sale_dt": sale_dt
-                        })
-                        if sale_status == 1: cancelled_count += 1
-                        if net_discount > 0: discount_count += 1
+            # เฉพาะบิลของวันที่เลือก (แบบ file: sale_date.idx บอกตำแหน่ง record ไม่ต้อง parse วันที่ทุก record)
+            sales_today = load_day_sales(report_date)
+            sold = [s for s in sales_today if s["sale_status"] != 1]
+            cancelled_count = len(sales_today) - len(sold)
+            discount_count = sum(1 for s in sales_today if s["net_discount"] > 0)
+            sale_details = load_sale_details([s["sale_id"] for s in sales_today])
         except Exception as e:
-            print(f"❌ Error reading sale.dat: {e}")
+            print(f"❌ Error reading sales: {e}")
             continue
 
         if not sales_today:
@@ -845,10 +699,10 @@ def Sale_Report():
             print(table)
 
             # -------------------- สรุปยอดขาย (แบบข้อความ) --------------------
-            non_cancelled_count = sum(1 for s in sales_today if s['sale_status'] != 1)
-            total_sales = sum(s['net_price'] for s in sales_today if s['sale_status'] != 1)
-            max_sale = max(sales_today, key=lambda x: x['net_price'], default=None)
-            min_sale = min(sales_today, key=lambda x: x['net_price'], default=None)
+            non_cancelled_count = len(sold)
+            total_sales = sum(s["net_price"] for s in sold)
+            max_sale = sale_summary(max(sales_today, key=lambda s: s["net_price"], default=None))
+            min_sale = sale_summary(min(sales_today, key=lambda s: s["net_price"], default=None))
             avg_sale = total_sales / non_cancelled_count if non_cancelled_count > 0 else 0.0
 
             print("\n💰 สรุปยอดขาย")
@@ -873,9 +727,6 @@ def Sale_Report():
 
 
 def Product_report():
-    from prettytable import PrettyTable
-    import struct
-
     # สร้างตารางหลัก
     table = PrettyTable()
     table.field_names = ["ID", "Name", "Cost", "Sale Price", "Amount", "Category", "Status"]
@@ -884,36 +735,28 @@ def Product_report():
     category_counter = {}
     sold_out_products = []
 
-    # อ่านไฟล์ product.dat
+    # อ่านสินค้าจาก storage engine
     try:
-        with open("product.dat", "rb") as f:
-            record_fmt = "13s20sffi12si"
-            record_size = struct.calcsize(record_fmt)
-
-            while True:
-                data = f.read(record_size)
-                if not data:
-                    break
-                r = struct.unpack(record_fmt, data)
-                pro_id = r[0].decode().strip("\x00")
-                pro_name = r[1].decode().strip("\x00")
-                pro_cost = r[2]
-                pro_sale = r[3]
-                pro_amount = r[4]
-                category = r[5].decode().strip("\x00")
-                status = r[6]
-
-                table.add_row([pro_id, pro_name, pro_cost, pro_sale, pro_amount, category, status])
-
-                # นับสรุป
-                if status in status_counter:
-                    status_counter[status] += 1
-                if category in category_counter:
-                    category_counter[category] += pro_amount
-                else:
-                    category_counter[category] = pro_amount
-                if status == 2:
-                    sold_out_products.append(pro_name)
+        for r in map(record_codec.ProductRow, storage.get().products().values()):
+            pro_id = r.pro_id
+            pro_name = r.pro_name
+            pro_cost = r.pro_cost
+            pro_sale = r.pro_salePrice
+            pro_amount = r.pro_amount
+            category = r.category
+            status = r.status
+
+            table.add_row([pro_id, pro_name, pro_cost, pro_sale, pro_amount, category, status])
+
+            # นับสรุป
+            if status in status_counter:
+                status_counter[status] += 1
+            if category in category_counter:
+                category_counter[category] += pro_amount
+            else:
+                category_counter[category] = pro_amount
+            if status == 2:
+                sold_out_products.append(pro_name)
 
         # แสดงผลตารางสินค้า
         print("\n📋 รายการสินค้า")
@@ -938,8 +781,8 @@ def Product_report():
         else:
             print("ไม่มีสินค้าไหนหมด")
 
-    except FileNotFoundError:
-        print("❌ ไม่พบไฟล์ product.dat")
+    except Exception as e:
+        print(f"❌ Error reading products: {e}")
 
 
 
@@ -1,6 +1,9 @@
 import os
 import struct
-from datetime import datetime
+import record_codec
+import change_log
+import service
+import storage
 
 # ====== ไฟล์ ======
 PRODUCT_FILE = "product.dat"
@@ -9,31 +12,23 @@ CUSTOMER_FILE = "customer.dat"
 CUSTOMER_LOG_FILE = "customer_change.bin"
 
 # ====== Product Struct ======
-product_format = "13s20sffi12si"
-product_size = struct.calcsize(product_format)
-product_log_format = "19si13s20sffi12si20s"
-product_log_size = struct.calcsize(product_log_format)
-product_categories = ["Pistol", "Shotgun", "Rifle", "SMG"]
-product_max_lengths = {"Pro_id": 13, "Pro_name": 20, "Category": 12, "User": 20}
+product_format = record_codec.PRODUCT.format
+product_size = record_codec.PRODUCT.size
+product_log_format = record_codec.PRODUCT_LOG.format
+product_log_size = record_codec.PRODUCT_LOG.size
+product_categories = service.PRODUCT_CATEGORIES
+product_max_lengths = service.PRODUCT_MAX_LENGTHS
 product_max_digits_float = 5
 product_max_digits_int = 5
 
 # ====== Customer Struct ======
-customer_format = "10s50s10si"
-customer_size = struct.calcsize(customer_format)
-customer_log_format = "19si10s50s10si20s"
-customer_log_size = struct.calcsize(customer_log_format)
-customer_max_lengths = {"Cust_id": 10, "Cust_name": 50, "Cust_tel": 10, "User": 20}
+customer_format = record_codec.CUSTOMER.format
+customer_size = record_codec.CUSTOMER.size
+customer_log_format = record_codec.CUSTOMER_LOG.format
+customer_log_size = record_codec.CUSTOMER_LOG.size
+customer_max_lengths = service.CUSTOMER_MAX_LENGTHS
 
 # ====== ฟังก์ชันช่วยเหลือ ======
-def ts_now():
-    """สร้าง timestamp ปัจจุบัน"""
-    try:
-        return datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
-    except Exception as e:
-        print(f"⚠️ เกิดข้อผิดพลาดในการสร้างเวลา: {e}")
-        return "0000-00-00_00:00:00"
-
 def ensure_files():
     """ตรวจสอบและสร้างไฟล์ที่จำเป็น"""
     for f in [PRODUCT_FILE, PRODUCT_LOG_FILE, CUSTOMER_FILE, CUSTOMER_LOG_FILE]:
@@ -158,8 +153,7 @@ def input_int_with_size(prompt, max_digits):
 def pack_product(p):
     """แปลง dict เป็น binary สำหรับ Product"""
     try:
-        return struct.pack(
-            product_format,
+        return record_codec.PRODUCT.pack(
             p["Pro_id"].encode('utf-8').ljust(product_max_lengths["Pro_id"], b"\x00"),
             p["Pro_name"].encode('utf-8').ljust(product_max_lengths["Pro_name"], b"\x00"),
             float(p["Pro_cost"]),
@@ -178,16 +172,7 @@ def pack_product(p):
 def unpack_product(data):
     """แปลง binary เป็น dict สำหรับ Product"""
     try:
-        r = struct.unpack(product_format, data)
-        return {
-            "Pro_id": r[0].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_name": r[1].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_cost": r[2],
-            "Pro_salePrice": r[3],
-            "Pro_amount": r[4],
-            "Category": r[5].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_status": r[6]
-        }
+        return product_to_dict(record_codec.PRODUCT.unpack(data))
     except struct.error as e:
         print(f"❌ ข้อผิดพลาดในการ unpack ข้อมูล: {e}")
         return None
@@ -195,41 +180,33 @@ def unpack_product(data):
         print(f"❌ เกิดข้อผิดพลาดที่ไม่คาดคิด: {e}")
         return None
 
-def pack_product_log(p, op_code, user="Admin"):
-    """แปลง dict เป็น binary สำหรับ Product Log"""
-    try:
-        return struct.pack(
-            product_log_format,
-            ts_now().encode('utf-8'),
-            int(op_code),
-            p["Pro_id"].encode('utf-8').ljust(product_max_lengths["Pro_id"], b"\x00"),
-            p["Pro_name"].encode('utf-8').ljust(product_max_lengths["Pro_name"], b"\x00"),
-            float(p["Pro_cost"]),
-            float(p["Pro_salePrice"]),
-            int(p["Pro_amount"]),
-            p["Category"].encode('utf-8').ljust(product_max_lengths["Category"], b"\x00"),
-            int(p["Pro_status"]),
-            user.encode('utf-8').ljust(product_max_lengths["User"], b"\x00")
-        )
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการสร้าง log: {e}")
-        return None
+def product_to_dict(r):
+    """แปลง tuple ที่ unpack แล้วเป็น dict สำหรับ Product"""
+    return {
+        "Pro_id": record_codec.text(r[0]),
+        "Pro_name": record_codec.text(r[1]),
+        "Pro_cost": r[2],
+        "Pro_salePrice": r[3],
+        "Pro_amount": r[4],
+        "Category": record_codec.text(r[5]),
+        "Pro_status": r[6]
+    }
 
 def unpack_product_log(data):
     """แปลง binary เป็น dict สำหรับ Product Log"""
     try:
-        r = struct.unpack(product_log_format, data)
+        r = record_codec.ProductLogRow(record_codec.PRODUCT_LOG.unpack(data))
         return {
-            "ts": r[0].decode('utf-8', errors='ignore').strip("\x00"),
-            "op_code": r[1],
-            "Pro_id": r[2].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_name": r[3].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_cost": r[4],
-            "Pro_salePrice": r[5],
-            "Pro_amount": r[6],
-            "Category": r[7].decode('utf-8', errors='ignore').strip("\x00"),
-            "Pro_status": r[8],
-            "User": r[9].decode('utf-8', errors='ignore').strip("\x00")
+            "ts": r.ts,
+            "op_code": r.op_code,
+            "Pro_id": r.pro_id,
+            "Pro_name": r.pro_name,
+            "Pro_cost": r.pro_cost,
+            "Pro_salePrice": r.pro_salePrice,
+            "Pro_amount": r.pro_amount,
+            "Category": r.category,
+            "Pro_status": r.status,
+            "User": r.user
         }
     except Exception as e:
         print(f"❌ เกิดข้อผิดพลาดในการอ่าน log: {e}")
@@ -239,8 +216,7 @@ def unpack_product_log(data):
 def pack_customer(c):
     """แปลง dict เป็น binary สำหรับ Customer"""
     try:
-        return struct.pack(
-            customer_format,
+        return record_codec.CUSTOMER.pack(
             c["Cust_id"].encode('utf-8').ljust(customer_max_lengths["Cust_id"], b"\x00"),
             c["Cust_name"].encode('utf-8').ljust(customer_max_lengths["Cust_name"], b"\x00"),
             c["Cust_tel"].encode('utf-8').ljust(customer_max_lengths["Cust_tel"], b"\x00"),
@@ -253,46 +229,32 @@ def pack_customer(c):
 def unpack_customer(data):
     """แปลง binary เป็น dict สำหรับ Customer"""
     try:
-        r = struct.unpack(customer_format, data)
-        return {
-            "Cust_id": r[0].decode('utf-8', errors='ignore').strip("\x00"),
-            "Cust_name": r[1].decode('utf-8', errors='ignore').strip("\x00"),
-            "Cust_tel": r[2].decode('utf-8', errors='ignore').strip("\x00"),
-            "Cust_status": r[3]
-        }
+        return customer_to_dict(record_codec.CUSTOMER.unpack(data))
     except Exception as e:
         print(f"❌ เกิดข้อผิดพลาดในการอ่านข้อมูลลูกค้า: {e}")
         return None
 
-def pack_customer_log(c, op_code, user="Admin"):
-    """แปลง dict เป็น binary สำหรับ Customer Log"""
-    try:
-        return struct.pack(
-            customer_log_format,
-            ts_now().encode('utf-8'),
-            int(op_code),
-            c["Cust_id"].encode('utf-8').ljust(customer_max_lengths["Cust_id"], b"\x00"),
-            c["Cust_name"].encode('utf-8').ljust(customer_max_lengths["Cust_name"], b"\x00"),
-            c["Cust_tel"].encode('utf-8').ljust(customer_max_lengths["Cust_tel"], b"\x00"),
-            int(c["Cust_status"]),
-            user.encode('utf-8').ljust(customer_max_lengths["User"], b"\x00")
-        )
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการสร้าง log ลูกค้า: {e}")
-        return None
+def customer_to_dict(r):
+    """แปลง tuple ที่ unpack แล้วเป็น dict สำหรับ Customer"""
+    return {
+        "Cust_id": record_codec.text(r[0]),
+        "Cust_name": record_codec.text(r[1]),
+        "Cust_tel": record_codec.text(r[2]),
+        "Cust_status": r[3]
+    }
 
 def unpack_customer_log(data):
     """แปลง binary เป็น dict สำหรับ Customer Log"""
     try:
-        r = struct.unpack(customer_log_format, data)
+        r = record_codec.CustomerLogRow(record_codec.CUSTOMER_LOG.unpack(data))
         return {
-            "ts": r[0].decode('utf-8', errors='ignore').strip("\x00"),
-            "op_code": r[1],
-            "Cust_id": r[2].decode('utf-8', errors='ignore').strip("\x00"),
-            "cust_name_after": r[3].decode('utf-8', errors='ignore').strip("\x00"),
-            "cust_tel_after": r[4].decode('utf-8', errors='ignore').strip("\x00"),
-            "cust_status_after": r[5],
-            "User": r[6].decode('utf-8', errors='ignore').strip("\x00")
+            "ts": r.ts,
+            "op_code": r.op_code,
+            "Cust_id": r.cust_id,
+            "cust_name_after": r.cust_name,
+            "cust_tel_after": r.cust_tel,
+            "cust_status_after": r.status,
+            "User": r.user
         }
     except Exception as e:
         print(f"❌ เกิดข้อผิดพลาดในการอ่าน log ลูกค้า: {e}")
@@ -300,24 +262,12 @@ def unpack_customer_log(data):
 
 # ====== Load/Save Product ======
 def load_products():
-    """โหลดข้อมูล Product จากไฟล์"""
+    """โหลดข้อมูล Product (ผ่าน storage engine)"""
     products = {}
     try:
-        if not os.path.exists(PRODUCT_FILE):
-            print("⚠️ ไม่พบไฟล์สินค้า")
-            return products
-        
-        with open(PRODUCT_FILE, "rb") as f:
-            while True:
-                data = f.read(product_size)
-                if not data:
-                    break
-                if len(data) != product_size:
-                    print(f"⚠️ พบข้อมูลที่เสียหาย (ขนาดไม่ถูกต้อง: {len(data)} bytes)")
-                    break
-                p = unpack_product(data)
-                if p:
-                    products[p["Pro_id"]] = p
+        for r in storage.get().products().values():
+            p = product_to_dict(r)
+            products[p["Pro_id"]] = p
         return products
     except PermissionError:
         print(f"❌ ไม่มีสิทธิ์อ่านไฟล์ {PRODUCT_FILE}")
@@ -329,57 +279,14 @@ def load_products():
         print(f"❌ เกิดข้อผิดพลาดในการโหลดสินค้า: {e}")
         return {}
 
-def save_products(products):
-    """บันทึกข้อมูล Product ลงไฟล์"""
-    try:
-        with open(PRODUCT_FILE, "wb") as f:
-            for p in products.values():
-                packed = pack_product(p)
-                if packed:
-                    f.write(packed)
-        return True
-    except PermissionError:
-        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {PRODUCT_FILE}")
-        return False
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการบันทึกสินค้า: {e}")
-        return False
-
-def log_product(op_code, product, user="Admin"):
-    """บันทึก log สำหรับ Product"""
-    try:
-        with open(PRODUCT_LOG_FILE, "ab") as f:
-            packed = pack_product_log(product, op_code, user)
-            if packed:
-                f.write(packed)
-        return True
-    except PermissionError:
-        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {PRODUCT_LOG_FILE}")
-        return False
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการบันทึก log: {e}")
-        return False
-
 # ====== Load/Save Customer ======
 def load_customers():
-    """โหลดข้อมูล Customer จากไฟล์"""
+    """โหลดข้อมูล Customer (ผ่าน storage engine)"""
     customers = {}
     try:
-        if not os.path.exists(CUSTOMER_FILE):
-            print("⚠️ ไม่พบไฟล์ลูกค้า")
-            return customers
-        
-        with open(CUSTOMER_FILE, "rb") as f:
-            while True:
-                data = f.read(customer_size)
-                if not data:
-                    break
-                if len(data) != customer_size:
-                    print(f"⚠️ พบข้อมูลที่เสียหาย (ขนาดไม่ถูกต้อง: {len(data)} bytes)")
-                    break
-                c = unpack_customer(data)
-                if c:
-                    customers[c["Cust_id"]] = c
+        for r in storage.get().customers():
+            c = customer_to_dict(r)
+            customers[c["Cust_id"]] = c
         return customers
     except PermissionError:
         print(f"❌ ไม่มีสิทธิ์อ่านไฟล์ {CUSTOMER_FILE}")
@@ -391,37 +298,6 @@ def load_customers():
         print(f"❌ เกิดข้อผิดพลาดในการโหลดลูกค้า: {e}")
         return {}
 
-def save_customers(customers):
-    """บันทึกข้อมูล Customer ลงไฟล์"""
-    try:
-        with open(CUSTOMER_FILE, "wb") as f:
-            for c in customers.values():
-                packed = pack_customer(c)
-                if packed:
-                    f.write(packed)
-        return True
-    except PermissionError:
-        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {CUSTOMER_FILE}")
-        return False
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการบันทึกลูกค้า: {e}")
-        return False
-
-def log_customer(op_code, customer, user="Admin"):
-    """บันทึก log สำหรับ Customer"""
-    try:
-        with open(CUSTOMER_LOG_FILE, "ab") as f:
-            packed = pack_customer_log(customer, op_code, user)
-            if packed:
-                f.write(packed)
-        return True
-    except PermissionError:
-        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {CUSTOMER_LOG_FILE}")
-        return False
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการบันทึก log ลูกค้า: {e}")
-        return False
-
 # ====== Product Functions ======
 def add_product():
     """เพิ่มสินค้าใหม่"""
@@ -482,24 +358,13 @@ def add_product():
         if user is None:
             user = "Admin"
         
-        # สร้างสินค้าใหม่
-        new_product = {
-            "Pro_id": pid,
-            "Pro_name": pname,
-            "Pro_cost": cost,
-            "Pro_salePrice": sale,
-            "Pro_amount": amt,
-            "Category": category,
-            "Pro_status": status
-        }
-        
-        products[pid] = new_product
-        
-        if save_products(products):
-            log_product(1, new_product, user)
-            print(f"✅ เพิ่มสินค้า {pid} สำเร็จ")
-        else:
-            print("❌ ไม่สามารถบันทึกสินค้าได้")
+        # บันทึกสินค้าใหม่ต่อท้าย product.dat (service ตรวจข้อมูลซ้ำอีกครั้งและเขียน log)
+        service.add_product(pid, pname, cost, sale, amt, category, status, user)
+        print(f"✅ เพิ่มสินค้า {pid} สำเร็จ")
+    except service.ServiceError as e:
+        print(f"❌ {e}")
+    except PermissionError:
+        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {PRODUCT_FILE}")
     except KeyboardInterrupt:
         print("\n⚠️ ยกเลิกการเพิ่มสินค้า")
     except Exception as e:
@@ -530,17 +395,11 @@ def delete_product():
             print("⚠️ ยกเลิกการลบ")
             return
         
-        deleted = products.pop(pid)
-        
-        if save_products(products):
-            deleted_log = deleted.copy()
-            deleted_log["Pro_status"] = 3
-            log_product(3, deleted_log)
-            print(f"🗑️ ลบสินค้า {pid} เรียบร้อย")
-        else:
-            # คืนค่าถ้าบันทึกไม่สำเร็จ
-            products[pid] = deleted
-            print("❌ ไม่สามารถลบสินค้าได้")
+        # service ลบผ่าน engine (ภายใต้ lock ของ engine เครื่องอื่นอาจขายสินค้าไประหว่างรอยืนยัน) และเขียน log
+        service.delete_product(pid, "Admin")
+        print(f"🗑️ ลบสินค้า {pid} เรียบร้อย")
+    except service.ServiceError as e:
+        print(f"❌ ไม่สามารถลบสินค้าได้: {e}")
     except KeyboardInterrupt:
         print("\n⚠️ ยกเลิกการลบสินค้า")
     except Exception as e:
@@ -574,25 +433,18 @@ def show_product_logs():
             return
         
         print("\n=== Product Logs ===")
-        with open(PRODUCT_LOG_FILE, "rb") as f:
-            count = 0
-            while True:
-                data = f.read(product_log_size)
-                if not data:
-                    break
-                if len(data) != product_log_size:
-                    print(f"⚠️ พบข้อมูล log ที่เสียหาย")
-                    break
-                log = unpack_product_log(data)
-                if log:
-                    print(f"{log['ts']} | Op:{log['op_code']} | {log['Pro_id']} | "
-                          f"{log['Pro_name']} | Cost:{log['Pro_cost']:.2f} | "
-                          f"Sale:{log['Pro_salePrice']:.2f} | Amt:{log['Pro_amount']} | "
-                          f"Cat:{log['Category']} | Status:{log['Pro_status']} | User:{log['User']}")
-                    count += 1
-            
-            if count == 0:
-                print("⚠️ ไม่มี log")
+        count = 0
+        for log in change_log.read_all(PRODUCT_LOG_FILE, record_codec.PRODUCT_LOG, record_codec.ProductLogRow):
+            print(f"{log.ts} | Op:{log.op_code} | {log.pro_id} | "
+                  f"{log.pro_name} | Cost:{log.pro_cost:.2f} | "
+                  f"Sale:{log.pro_salePrice:.2f} | Amt:{log.pro_amount} | "
+                  f"Cat:{log.category} | Status:{log.status} | User:{log.user}")
+            count += 1
+        if os.path.getsize(PRODUCT_LOG_FILE) % product_log_size:
+            print(f"⚠️ พบข้อมูล log ที่เสียหาย")
+
+        if count == 0:
+            print("⚠️ ไม่มี log")
     except PermissionError:
         print(f"❌ ไม่มีสิทธิ์อ่านไฟล์ {PRODUCT_LOG_FILE}")
     except Exception as e:
@@ -639,21 +491,13 @@ def add_customer():
         if user is None:
             user = "admin"
         
-        # สร้างลูกค้าใหม่
-        new_customer = {
-            "Cust_id": cid,
-            "Cust_name": cname,
-            "Cust_tel": ctel,
-            "Cust_status": status
-        }
-        
-        customers[cid] = new_customer
-        
-        if save_customers(customers):
-            log_customer(1, new_customer, user)
-            print(f"✅ เพิ่มลูกค้า {cid} สำเร็จ")
-        else:
-            print("❌ ไม่สามารถบันทึกลูกค้าได้")
+        # บันทึกลูกค้าใหม่ต่อท้าย customer.dat (service ตรวจข้อมูลซ้ำอีกครั้งและเขียน log)
+        service.add_customer(cid, cname, ctel, status, user)
+        print(f"✅ เพิ่มลูกค้า {cid} สำเร็จ")
+    except service.ServiceError as e:
+        print(f"❌ {e}")
+    except PermissionError:
+        print(f"❌ ไม่มีสิทธิ์เขียนไฟล์ {CUSTOMER_FILE}")
     except KeyboardInterrupt:
         print("\n⚠️ ยกเลิกการเพิ่มลูกค้า")
     except Exception as e:
@@ -684,17 +528,11 @@ def delete_customer():
             print("⚠️ ยกเลิกการลบ")
             return
         
-        deleted = customers.pop(cid)
-        
-        if save_customers(customers):
-            deleted_log = deleted.copy()
-            deleted_log["Cust_status"] = 2
-            log_customer(3, deleted_log)
-            print(f"🗑️ ลบลูกค้า {cid} เรียบร้อย")
-        else:
-            # คืนค่าถ้าบันทึกไม่สำเร็จ
-            customers[cid] = deleted
-            print("❌ ไม่สามารถลบลูกค้าได้")
+        # service ลบผ่าน engine (ภายใต้ lock ของ engine เครื่องอื่นอาจแก้ลูกค้าไประหว่างรอยืนยัน) และเขียน log
+        service.delete_customer(cid, "Admin")
+        print(f"🗑️ ลบลูกค้า {cid} เรียบร้อย")
+    except service.ServiceError as e:
+        print(f"❌ ไม่สามารถลบลูกค้าได้: {e}")
     except KeyboardInterrupt:
         print("\n⚠️ ยกเลิกการลบลูกค้า")
     except Exception as e:
@@ -726,24 +564,17 @@ def show_customer_logs():
             return
         
         print("\n=== Customer Logs ===")
-        with open(CUSTOMER_LOG_FILE, "rb") as f:
-            count = 0
-            while True:
-                data = f.read(customer_log_size)
-                if not data:
-                    break
-                if len(data) != customer_log_size:
-                    print(f"⚠️ พบข้อมูล log ที่เสียหาย")
-                    break
-                log = unpack_customer_log(data)
-                if log:
-                    print(f"{log['ts']} | Op:{log['op_code']} | {log['Cust_id']} | "
-                          f"{log['cust_name_after']} | Tel:{log['cust_tel_after']} | "
-                          f"Status:{log['cust_status_after']} | User:{log['User']}")
-                    count += 1
-            
-            if count == 0:
-                print("⚠️ ไม่มี log")
+        count = 0
+        for log in change_log.read_all(CUSTOMER_LOG_FILE, record_codec.CUSTOMER_LOG, record_codec.CustomerLogRow):
+            print(f"{log.ts} | Op:{log.op_code} | {log.cust_id} | "
+                  f"{log.cust_name} | Tel:{log.cust_tel} | "
+                  f"Status:{log.status} | User:{log.user}")
+            count += 1
+        if os.path.getsize(CUSTOMER_LOG_FILE) % customer_log_size:
+            print(f"⚠️ พบข้อมูล log ที่เสียหาย")
+
+        if count == 0:
+            print("⚠️ ไม่มี log")
     except PermissionError:
         print(f"❌ ไม่มีสิทธิ์อ่านไฟล์ {CUSTOMER_LOG_FILE}")
     except Exception as e:
@@ -0,0 +1,87 @@
+import atexit
+import os
+import random
+import threading
+import time
+import log_writer
+
+# ====== Audit policy for VIEW records ======
+# ADD / UPDATE / DELETE ถูก log ครบทุกครั้งเสมอ นโยบายนี้ใช้กับ VIEW (การอ่าน) เท่านั้น
+#   "full"       - log ทุก VIEW (แบบเดิม)
+#   "off"        - ไม่ log VIEW
+#   "sampled"    - log แบบสุ่ม VIEW_SAMPLE_PERCENT %
+#   "aggregated" - นับจำนวน VIEW ต่อ (log, user) แล้วเขียนเป็น record สรุปทุก AGGREGATE_SECONDS วินาที
+#                  (timer เบื้องหลังเขียนให้แม้เครื่องไม่มีการ VIEW ต่อ จึงเสียได้ไม่เกินหนึ่งช่วงถ้าโปรแกรมล่ม)
+# เลือกด้วย VIEW_AUDIT หรือ environment variable RETAIL_VIEW_AUDIT (และ RETAIL_VIEW_SAMPLE_PERCENT,
+# RETAIL_VIEW_AGGREGATE_SECONDS)
+MODES = ("full", "off", "sampled", "aggregated")
+VIEW_AUDIT = os.environ.get("RETAIL_VIEW_AUDIT", "full")
+VIEW_SAMPLE_PERCENT = float(os.environ.get("RETAIL_VIEW_SAMPLE_PERCENT", "10"))
+AGGREGATE_SECONDS = float(os.environ.get("RETAIL_VIEW_AGGREGATE_SECONDS", "300"))
+
+if VIEW_AUDIT not in MODES:
+    print(f"⚠️ Unknown view audit mode {VIEW_AUDIT!r} (choose one of {', '.join(MODES)}), using full")
+    VIEW_AUDIT = "full"
+
+_counts = {}     # (log file, user) -> จำนวน VIEW ที่ยังไม่ได้เขียน
+_emitters = {}   # log file -> fn(user, count) ที่เขียน record สรุป
+_window_start = time.monotonic()
+_timer = None    # threading.Timer ที่จะ flush เมื่อครบช่วง (มีเฉพาะตอนมี count ค้างอยู่)
+_lock = threading.Lock()
+
+
+def register_aggregate(log_file, emit):
+    """Set the function that writes one summary VIEW record for log_file"""
+    _emitters[log_file] = emit
+
+
+def audit_view(log_file, user):
+    """Return True if this VIEW should be written as a normal log record"""
+    if VIEW_AUDIT == "full":
+        return True
+    if VIEW_AUDIT == "off":
+        return False
+    if VIEW_AUDIT == "sampled":
+        return random.random() * 100 < VIEW_SAMPLE_PERCENT
+    key = (log_file, user)
+    with _lock:
+        _counts[key] = _counts.get(key, 0) + 1
+        due = time.monotonic() - _window_start >= AGGREGATE_SECONDS
+        if not due:
+            _schedule()
+    if due:
+        flush()
+    return False
+
+
+def _schedule():
+    """Start the timer that flushes at the end of the current window (caller holds _lock)"""
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(max(0.0, _window_start + AGGREGATE_SECONDS - time.monotonic()), flush)
+        _timer.daemon = True
+        _timer.start()
+
+
+def flush():
+    """Write the pending aggregated VIEW counters (timer / ตอนปิดโปรแกรม)"""
+    global _counts, _window_start, _timer
+    with _lock:
+        counts, _counts = _counts, {}
+        _window_start = time.monotonic()
+        if _timer is not None and _timer is not threading.current_thread():
+            _timer.cancel()
+        _timer = None
+    for (log_file, user), count in counts.items():
+        emit = _emitters.get(log_file)
+        if emit is not None:
+            emit(user, count)
+
+
+def _at_exit():
+    """Write the pending counters and wait until log_writer has them on disk"""
+    flush()
+    log_writer.flush()   # record สรุปไม่หายแม้ log_writer.shutdown จะทำงานไปก่อนแล้ว
+
+
+atexit.register(_at_exit)
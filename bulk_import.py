@@ -0,0 +1,124 @@
+import csv
+import json
+import sys
+import journal
+import log_writer
+import service
+
+# ====== Bulk import of products / customers ======
+# อ่านไฟล์ CSV (บรรทัดแรกเป็นหัวคอลัมน์) หรือ JSONL (หนึ่ง object ต่อบรรทัด) ทีละแถว
+# ตรวจแต่ละแถวด้วยกฎเดียวกับเมนู Add (service.product_record / customer_record)
+# แล้วเขียนทุกแถวที่ผ่านต่อท้ายไฟล์ในครั้งเดียว + log ADD เป็นชุดเดียว
+# ใช้: python bulk_import.py products catalogue.csv [user]
+#      python bulk_import.py customers customers.jsonl [user]
+PRODUCT_FIELDS = ["Pro_id", "Pro_name", "Pro_cost", "Pro_salePrice", "Pro_amount", "Category", "Pro_status"]
+CUSTOMER_FIELDS = ["Cust_id", "Cust_name", "Cust_tel", "Cust_status"]
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def read_rows(path):
+    """Stream (line number, row dict) from a CSV or JSONL file (row is None for an unreadable line)"""
+    if path.lower().endswith(JSONL_SUFFIXES):
+        with open(path, encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_no, row if isinstance(row, dict) else None
+        return
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if any((value or "").strip() for value in row.values() if isinstance(value, str)):
+                yield reader.line_num, row
+
+
+def _text(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value)
+
+
+def _number(row, key, kind, default=None):
+    value = row.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if default is None:
+            raise service.ServiceError(f"{key} is required")
+        return default
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise service.ServiceError(f"{key} must be a number")
+
+
+def parse_product(row):
+    return service.product_record(
+        _text(row, "Pro_id"), _text(row, "Pro_name"),
+        _number(row, "Pro_cost", float), _number(row, "Pro_salePrice", float),
+        _number(row, "Pro_amount", int), _text(row, "Category"),
+        _number(row, "Pro_status", int, 1))
+
+
+def parse_customer(row):
+    return service.customer_record(
+        _text(row, "Cust_id"), _text(row, "Cust_name"), _text(row, "Cust_tel"),
+        _number(row, "Cust_status", int, 1))
+
+
+IMPORTERS = {
+    "products": (parse_product, service.add_products),
+    "customers": (parse_customer, service.add_customers),
+}
+
+
+def import_file(kind, path, user="Admin"):
+    """
+    Import one file -> {"added": count, "duplicates": [ids], "errors": [(line, message)]}
+    Invalid rows are reported and skipped; the valid ones are still imported.
+    """
+    parse, add = IMPORTERS[kind]
+    records = []
+    errors = []
+    for line_no, row in read_rows(path):
+        if row is None:
+            errors.append((line_no, "not a JSON object"))
+            continue
+        try:
+            records.append(parse(row))
+        except service.ServiceError as e:
+            errors.append((line_no, str(e)))
+    added, duplicates = add(records, user)
+    return {"added": len(added), "duplicates": duplicates, "errors": errors}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in IMPORTERS:
+        print("Usage: python bulk_import.py products|customers <file.csv|file.jsonl> [user]")
+        print(f"  products columns : {', '.join(PRODUCT_FIELDS)}")
+        print(f"  customers columns: {', '.join(CUSTOMER_FIELDS)}")
+        return 2
+    kind, path = argv[0], argv[1]
+    user = argv[2] if len(argv) > 2 else "Admin"
+    try:
+        result = import_file(kind, path, user)
+    except FileNotFoundError:
+        print(f"❌ ไม่พบไฟล์ {path}")
+        return 1
+    except (OSError, csv.Error) as e:
+        print(f"❌ อ่านไฟล์ {path} ไม่ได้: {e}")
+        return 1
+    for line_no, message in result["errors"]:
+        print(f"⚠️ line {line_no}: {message}")
+    if result["duplicates"]:
+        print(f"⚠️ ข้าม id ที่มีอยู่แล้ว/ซ้ำในไฟล์ {len(result['duplicates'])} รายการ: {', '.join(result['duplicates'][:20])}")
+    print(f"✅ นำเข้า {kind} {result['added']} รายการ")
+    return 0
+
+
+if __name__ == "__main__":
+    journal.recover()
+    code = main(sys.argv[1:])
+    log_writer.shutdown()
+    sys.exit(code)
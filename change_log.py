@@ -0,0 +1,237 @@
+import os
+import bisect
+import glob
+import struct
+import zlib
+from datetime import date, datetime, timedelta
+import file_lock
+import journal
+import log_writer
+import record_codec
+
+# ====== Time-range queries on the change logs ======
+# product_change.bin / customer_change.bin เป็น log แบบ append-only record ขนาดคงที่
+# timestamp 19 bytes แรกของแต่ละ record เรียงตามเวลาเสมอ (เมื่อแทน "_" ด้วยช่องว่าง)
+# จึง binary search หา record แรก/สุดท้ายของช่วงเวลาได้เลย ไม่ต้องอ่านทั้งไฟล์
+# แต่ละเครื่องเขียน log เป็นชุด (log_writer) ชุดของอีกเครื่องอาจมีเวลาใหม่กว่าที่อยู่ในไฟล์แล้ว
+# append_in_order จึงแทรก record ให้ยังเรียงตามเวลาอยู่เสมอ
+TS_SIZE = 19
+
+# ====== Rotation ======
+# record เก่าถูกย้ายจากไฟล์ log หลัก (hot segment) ไปเป็น segment ที่บีบอัดแล้ว เช่น product_change.000001.seg
+# segment = header (ช่วงเวลาทั้งไฟล์) + block ละ BLOCK_RECORDS record บีบอัดด้วย zlib
+# การค้นตามเวลาข้าม segment/block ที่อยู่นอกช่วงได้จาก header โดยไม่ต้อง decompress
+# การต่อท้าย (log_writer) และ rotate ถือ exclusive lock ของไฟล์ log หลัก ผู้อ่านถือ shared lock
+# จึงไม่เห็นไฟล์ hot ที่ถูกแทนที่ไปครึ่งเดียว และสอง process ไม่ได้ชื่อ segment เดียวกัน
+ROTATE_BYTES = 1024 * 1024   # hot segment ใหญ่กว่านี้ -> rotate ทั้งไฟล์
+ROTATE_DAILY = True          # มี record ของวันก่อนหน้าอยู่ -> ย้ายไป segment
+BLOCK_RECORDS = 256
+SEGMENT_MAGIC = b"RSEG"
+SEGMENT_HEADER = struct.Struct("=4sI19s19s")   # magic, record size, first ts, last ts
+BLOCK_HEADER = struct.Struct("=19s19sII")       # first ts, last ts, record count, compressed size
+
+
+def time_key(value):
+    """Comparable bytes key of a datetime / date / timestamp string"""
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(value, date):
+        value = value.isoformat()
+    if isinstance(value, str):
+        value = value.encode()
+    return value.replace(b"_", b" ")
+
+
+class _Timestamps:
+    """Sequence view of the timestamps of a log file (อ่านทีละ record ตอน bisect)"""
+
+    def __init__(self, f, record_size, count):
+        self.f = f
+        self.record_size = record_size
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        self.f.seek(i * self.record_size)
+        return time_key(self.f.read(TS_SIZE))
+
+
+def find_range(path, codec, start=None, end=None):
+    """Record numbers [first, stop) of the entries with start <= timestamp < end"""
+    if not os.path.exists(path):
+        return 0, 0
+    count = os.path.getsize(path) // codec.size
+    with open(path, "rb") as f:
+        stamps = _Timestamps(f, codec.size, count)
+        first = bisect.bisect_left(stamps, time_key(start)) if start is not None else 0
+        stop = bisect.bisect_left(stamps, time_key(end), first) if end is not None else count
+    return first, stop
+
+
+def append_in_order(path, codec, records):
+    """
+    Append packed log records (one record per item) keeping the file sorted by
+    timestamp. Records that are older than the newest ones already written
+    (another till's batch) are merged into that tail, rewritten in one journal
+    transaction. The caller holds file_lock.exclusive(path).
+    """
+    if not records:
+        return
+    records = sorted(records, key=lambda r: time_key(r[:TS_SIZE]))
+    size = codec.size
+    count = os.path.getsize(path) // size if os.path.exists(path) else 0
+    with open(path, "ab+") as f:
+        # record แรกที่ใหม่กว่า record ที่เก่าที่สุดของชุดนี้ (ปกติ = ท้ายไฟล์ -> ต่อท้ายธรรมดา)
+        pos = bisect.bisect_right(_Timestamps(f, size, count), time_key(records[0][:TS_SIZE]))
+        if pos == count:
+            f.write(b"".join(records))
+            f.flush()
+            return
+        f.seek(pos * size)
+        tail = f.read((count - pos) * size)
+    merged = sorted([tail[i:i + size] for i in range(0, len(tail), size)] + records,
+                    key=lambda r: time_key(r[:TS_SIZE]))
+    with journal.Transaction() as tx:
+        tx.write(path, pos * size, b"".join(merged))
+
+
+def read_range(path, codec, start=None, end=None, row_type=None):
+    """Read only the log entries with start <= timestamp < end (archived segments included)"""
+    log_writer.flush()  # รวม record ที่ยังค้างอยู่ใน queue ของ log writer
+    start_key = time_key(start) if start is not None else None
+    end_key = time_key(end) if end is not None else None
+    rows = []
+    with file_lock.shared(path):
+        for seg_path in segment_paths(path):
+            rows.extend(_read_segment(seg_path, codec, start_key, end_key, row_type))
+        rows.extend(read_records(path, codec, *find_range(path, codec, start, end), row_type=row_type))
+    return rows
+
+
+def read_all(path, codec, row_type=None):
+    """Every entry of a log, oldest first (archived segments + hot segment)"""
+    return read_range(path, codec, row_type=row_type)
+
+
+def read_records(path, codec, first, stop, row_type=None):
+    """Read the records numbered [first, stop) with one seek"""
+    if first >= stop:
+        return []
+    with open(path, "rb") as f:
+        f.seek(first * codec.size)
+        data = f.read((stop - first) * codec.size)
+    return list(record_codec.iter_rows(data, codec, row_type))
+
+
+def day_bounds(day):
+    """(start, end) of one calendar day for find_range / read_range"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return day, day + timedelta(days=1)
+
+
+def read_day(path, codec, day, row_type=None):
+    """Log entries of one day, e.g. today's changes"""
+    return read_range(path, codec, *day_bounds(day), row_type=row_type)
+
+
+# ====== Archived segments ======
+def segment_paths(path):
+    """Archived segments of a log, oldest first"""
+    stem = os.path.splitext(path)[0]
+    return sorted(glob.glob(glob.escape(stem) + ".*.seg"))
+
+
+def _next_segment_path(path):
+    existing = segment_paths(path)
+    n = int(existing[-1].rsplit(".", 2)[-2]) + 1 if existing else 1
+    return f"{os.path.splitext(path)[0]}.{n:06d}.seg"
+
+
+def pack_segment(data, codec):
+    """Compress whole log records into the segment block format"""
+    blocks = []
+    block_size = BLOCK_RECORDS * codec.size
+    for pos in range(0, len(data), block_size):
+        chunk = data[pos:pos + block_size]
+        first = time_key(chunk[:TS_SIZE])
+        last = time_key(chunk[-codec.size:][:TS_SIZE])
+        packed = zlib.compress(chunk, 6)
+        blocks.append(BLOCK_HEADER.pack(first, last, len(chunk) // codec.size, len(packed)) + packed)
+    header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, codec.size,
+                                 time_key(data[:TS_SIZE]), time_key(data[-codec.size:][:TS_SIZE]))
+    return header + b"".join(blocks)
+
+
+def _overlaps(first, last, start_key, end_key):
+    return (start_key is None or last >= start_key) and (end_key is None or first < end_key)
+
+
+def _read_segment(seg_path, codec, start_key, end_key, row_type=None):
+    rows = []
+    with open(seg_path, "rb") as f:
+        header = f.read(SEGMENT_HEADER.size)
+        if len(header) != SEGMENT_HEADER.size:
+            return rows
+        magic, record_size, first, last = SEGMENT_HEADER.unpack(header)
+        if magic != SEGMENT_MAGIC or record_size != codec.size:
+            print(f"⚠️ Skipped unreadable log segment {seg_path}")
+            return rows
+        if not _overlaps(first, last, start_key, end_key):
+            return rows
+        while True:
+            block = f.read(BLOCK_HEADER.size)
+            if len(block) != BLOCK_HEADER.size:
+                break
+            first, last, count, length = BLOCK_HEADER.unpack(block)
+            if not _overlaps(first, last, start_key, end_key):
+                f.seek(length, os.SEEK_CUR)
+                continue
+            data = zlib.decompress(f.read(length))
+            for r in record_codec.iter_rows(data, codec, row_type):
+                key = time_key(r[0])
+                if (start_key is None or key >= start_key) and (end_key is None or key < end_key):
+                    rows.append(r)
+    return rows
+
+
+def rotate(path, codec, force=False):
+    """
+    Move old entries out of the hot log into a new compressed segment.
+    Entries from before today go when ROTATE_DAILY is set; everything goes when
+    the hot log reaches ROTATE_BYTES (or force=True). Returns the number of moved records.
+    """
+    # อ่าน -> เลือกชื่อ segment -> แทนที่ไฟล์ hot ทั้งหมดภายใต้ lock เดียว (ขนาดไฟล์อ่านใหม่หลังได้ lock)
+    with file_lock.exclusive(path):
+        if not os.path.exists(path):
+            return 0
+        data = record_codec.read_file(path)
+        count = len(data) // codec.size
+        cut = find_range(path, codec, None, date.today())[1] if ROTATE_DAILY else 0
+        if force or count * codec.size >= ROTATE_BYTES:
+            cut = count
+        if cut == 0:
+            return 0
+        # segment ใหม่และไฟล์ hot ที่เหลือถูกเขียนใน transaction เดียว (ไม่มี record ซ้ำ/หายถ้าเครื่องดับ)
+        with journal.Transaction() as tx:
+            tx.replace(_next_segment_path(path), pack_segment(data[:cut * codec.size], codec))
+            tx.replace(path, data[cut * codec.size:])
+    return cut
+
+
+def maybe_rotate(path, codec):
+    """Cheap check after an append: rotate only when the hot log is due"""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+    if size >= ROTATE_BYTES:
+        return rotate(path, codec)
+    if ROTATE_DAILY and size >= codec.size:
+        with open(path, "rb") as f:
+            oldest = time_key(f.read(TS_SIZE))
+        if oldest < time_key(date.today()):
+            return rotate(path, codec)
+    return 0
@@ -0,0 +1,180 @@
+"""
+Columnar read path for sale.dat: the whole file is mapped with mmap and read as
+columns (NumPy structured array, or array.array without NumPy).
+
+Scope: only the full scan in daily_totals.rebuild goes through here. The reports
+(Report.generate_report / Report.Sale_Report: per-day net total, max / min bill,
+discount and cancelled counts) read one day through the storage engine instead
+(sale_date.idx + daily_totals.idx for the file engine), which is cheaper than a
+whole-file scan and works the same on the memory / SQLite engines.
+"""
+import mmap
+import os
+import struct
+from array import array
+import record_codec
+
+try:
+    import numpy as np
+except ImportError:  # ไม่มี NumPy ก็ยังใช้งานได้ผ่าน array columns
+    np = None
+
+SALE_FILE = "sale.dat"
+
+# (name, struct code, numpy type, array typecode) ตามลำดับ field ของ record_codec.SALE (None = string field)
+SALE_FIELDS = [
+    ("sale_id", "10s", "S10", None),
+    ("cust_id", "10s", "S10", None),
+    ("sale_date", "10s", "S10", None),
+    ("net_price", "f", "=f4", "f"),
+    ("total_discount", "f", "=f4", "f"),
+    ("sale_status", "i", "=i4", "i"),
+]
+
+
+def _offsets(fields):
+    """Byte offset of each field (struct ใช้ native alignment จึงมี padding ก่อน float/int)"""
+    offsets, prefix = [], ""
+    for _, code, _, _ in fields:
+        prefix += code
+        offsets.append(struct.calcsize(prefix) - struct.calcsize(code))
+    return offsets
+
+
+class Table:
+    """Read-only columns of a fixed-size record file"""
+
+    def __init__(self, path, codec, fields):
+        self.fields = [name for name, _, _, _ in fields]
+        self._columns = {}
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.count = size // codec.size
+        if self.count == 0:
+            for name, _, fmt, typecode in fields:
+                if np is not None:
+                    self._columns[name] = np.empty(0, dtype=fmt)
+                else:
+                    self._columns[name] = [] if typecode is None else array(typecode)
+            return
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if np is not None:
+            dtype = np.dtype({"names": self.fields, "formats": [fmt for _, _, fmt, _ in fields],
+                              "offsets": _offsets(fields), "itemsize": codec.size})
+            data = np.frombuffer(mm, dtype=dtype, count=self.count)
+            for name in self.fields:
+                self._columns[name] = data[name]
+        else:
+            self._build_arrays(mm, fields, codec)
+            mm.close()
+
+    def _build_arrays(self, mm, fields, codec):
+        """Fallback without NumPy: one pass over the mapping into array columns"""
+        cols = [[] if typecode is None else array(typecode) for _, _, _, typecode in fields]
+        appends = [c.append for c in cols]
+        view = memoryview(mm)
+        try:
+            for r in codec.iter_unpack(view[:self.count * codec.size]):
+                for append, value in zip(appends, r):
+                    append(value)
+        finally:
+            view.release()
+        for (name, _, _, typecode), col in zip(fields, cols):
+            # string field ตัด \x00 ออกให้เหมือนกับ NumPy "S" dtype
+            self._columns[name] = [v.rstrip(b"\x00") for v in col] if typecode is None else col
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def record(self, i):
+        """Raw record tuple of one row (string fields as bytes, like record_codec.SALE.unpack)"""
+        return tuple(_value(self._columns[name][i]) for name in self.fields)
+
+
+def _value(v):
+    return v.item() if hasattr(v, "item") else v
+
+
+def open_sales(path=SALE_FILE):
+    return Table(path, record_codec.SALE, SALE_FIELDS)
+
+
+# ====== Column helpers (ทำงานได้ทั้ง NumPy และ array columns) ======
+def keys(column, key):
+    """
+    key(raw value) of every row as an int column. key is evaluated once per
+    distinct value, not once per row (sale_date มีค่าซ้ำกันมาก จึง parse แค่ไม่กี่ครั้ง)
+    """
+    if np is not None and isinstance(column, np.ndarray):
+        values, inverse = np.unique(column, return_inverse=True)
+        return np.array([key(v) for v in values], dtype=np.int64)[inverse.reshape(-1)]
+    cache = {}
+    out = array("q")
+    for v in column:
+        k = cache.get(v)
+        if k is None:
+            k = cache[v] = key(v)
+        out.append(k)
+    return out
+
+
+def floats(column):
+    """Writable float64 copy of a numeric column"""
+    if np is not None and isinstance(column, np.ndarray):
+        return column.astype(np.float64)
+    return [float(v) for v in column]
+
+
+def isin(column, values):
+    """Row numbers whose string value is in values"""
+    wanted = {v.encode() if isinstance(v, str) else v for v in values}
+    if np is not None and isinstance(column, np.ndarray):
+        return np.flatnonzero(np.isin(column, list(wanted))) if wanted else np.empty(0, dtype=np.intp)
+    return [i for i, v in enumerate(column) if v in wanted]
+
+
+def rows_where(column, skip_value, skip_rows=()):
+    """Row numbers whose value is not skip_value, leaving out skip_rows"""
+    if np is not None and isinstance(column, np.ndarray):
+        rows = np.flatnonzero(column != skip_value)
+        return np.setdiff1d(rows, np.asarray(list(skip_rows), dtype=np.intp), assume_unique=True)
+    skip_rows = set(skip_rows)
+    return [i for i, v in enumerate(column) if v != skip_value and i not in skip_rows]
+
+
+def group_totals(group, values, rows):
+    """
+    {group key: [count, sum, max row, min row]} of values[rows] grouped by group[rows].
+    The sum adds in row order; max / min keep the first row on ties.
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0:
+            return {}
+        k, v = group[rows], values[rows].astype(np.float64)
+        uniq, inverse = np.unique(k, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=v)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        # เรียงตาม (กลุ่ม, ค่า, ลำดับในไฟล์) แล้วหยิบตัวแรกของแต่ละกลุ่ม
+        max_rows = rows[np.lexsort((rows, -v, inverse))[starts]]
+        min_rows = rows[np.lexsort((rows, v, inverse))[starts]]
+        return {int(key): [int(n), float(s), int(hi), int(lo)]
+                for key, n, s, hi, lo in zip(uniq, counts, sums, max_rows, min_rows)}
+    out = {}
+    for i in rows:
+        day = out.get(group[i])
+        if day is None:
+            out[group[i]] = [1, float(values[i]), i, i]
+            continue
+        day[0] += 1
+        day[1] += values[i]
+        if values[i] > values[day[2]]:
+            day[2] = i
+        if values[i] < values[day[3]]:
+            day[3] = i
+    return out
@@ -0,0 +1,67 @@
+import sys
+import file_lock
+import journal
+import record_codec
+import storage
+
+# ====== Compaction of product.dat / customer.dat ======
+# การลบสินค้า/ลูกค้าทิ้ง record ไว้เป็น tombstone ในที่เดิม (ดู record_codec.is_deleted)
+# สินค้าใหม่ใช้ช่องของสินค้าที่ลบแล้วซ้ำได้ แต่ลูกค้าใหม่ต่อท้ายไฟล์เสมอ -> tombstone สะสมได้
+# compaction เขียนไฟล์ใหม่เฉพาะ record ที่ยังใช้อยู่ (ผ่าน journal) แต่ทำเมื่อ record ที่ลบแล้ว
+# มีอย่างน้อย MIN_DEAD ตัวและเกิน DEAD_RATIO ของทั้งไฟล์เท่านั้น
+# เรียกตอนปิดโปรแกรม (main.py), เป็นงานเบื้องหลังของ server.py หรือรันเอง: python compaction.py [--force]
+DEAD_RATIO = 0.25
+MIN_DEAD = 8
+DATA_FILES = {"product.dat": record_codec.PRODUCT, "customer.dat": record_codec.CUSTOMER}
+
+
+def dead_count(path, codec):
+    """(deleted records, all records) of a data file"""
+    rows = list(record_codec.read_rows(path, codec))
+    return sum(1 for r in rows if record_codec.is_deleted(codec, r)), len(rows)
+
+
+def needs_compaction(dead, total):
+    return dead >= MIN_DEAD and dead > total * DEAD_RATIO
+
+
+def compact(path, codec, force=False):
+    """
+    Rewrite one data file without its tombstones when the dead ratio passed the
+    threshold (or always with force) -> number of records removed.
+    The offset indexes notice the new file size and rebuild themselves.
+    """
+    with file_lock.exclusive(path):
+        rows = list(record_codec.read_rows(path, codec))
+        live = [r for r in rows if not record_codec.is_deleted(codec, r)]
+        dead = len(rows) - len(live)
+        if dead == 0 or not (force or needs_compaction(dead, len(rows))):
+            return 0
+        with journal.Transaction() as tx:
+            tx.replace(path, b"".join(codec.pack(*r) for r in live))
+    return dead
+
+
+def run(force=False):
+    """Compact every data file that needs it -> {path: records removed}"""
+    # storage แบบ memory / sqlite ไม่มีไฟล์ให้เขียนใหม่: สินค้าถูกลบจริง ส่วน tombstone ของลูกค้าเป็นแถวเล็ก ๆ
+    # ที่ถูกแทนที่เมื่อเพิ่มลูกค้า id เดิมอีกครั้ง
+    if storage.get().name != "file":
+        return {}
+    return {path: compact(path, codec, force) for path, codec in DATA_FILES.items()}
+
+
+def main(argv):
+    force = "--force" in argv
+    for path, codec in DATA_FILES.items():
+        dead, total = dead_count(path, codec)
+        print(f"{path}: {dead}/{total} deleted")
+    for path, removed in run(force).items():
+        if removed:
+            print(f"✅ {path}: ลบ record ที่ถูกลบแล้ว {removed} รายการออกจากไฟล์")
+    return 0
+
+
+if __name__ == "__main__":
+    journal.recover()
+    sys.exit(main(sys.argv[1:]))
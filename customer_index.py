@@ -0,0 +1,203 @@
+import file_lock
+import index_file
+import record_codec
+
+# ====== Sidecar index for customer.dat ======
+# customer.idx เก็บ Cust_name -> Cust_id และ Cust_id -> offset เพื่อไม่ต้อง scan customer.dat ทุกครั้ง
+# หลายเครื่องแก้ลูกค้าคนละคนพร้อมกันได้ (record lock) การตรวจ header + ต่อท้าย entry และการ rebuild
+# จึงทำภายใต้ exclusive lock ของ customer.idx
+CUSTOMER_FILE = "customer.dat"
+CUSTOMER_INDEX_FILE = "customer.idx"
+CUSTOMER_RECORD_SIZE = record_codec.CUSTOMER.size
+
+# entry: cust_name, cust_id, offset  (offset = -1 หมายถึงลบ cust_id นี้ออกจาก index)
+INDEX_ENTRY_STRUCT = "50s10sq"
+
+_by_id = {}      # Cust_id -> (Cust_name, offset)
+_by_name = {}    # Cust_name -> Cust_id ของ record แรกในไฟล์ที่ใช้ชื่อนี้
+_ids_by_name = {}   # Cust_name -> {Cust_id: offset} ของทุกคนที่ใช้ชื่อนี้ (ปกติมีคนเดียว)
+_loaded_header = None
+
+
+def _decode(raw):
+    return record_codec.text(raw).strip()
+
+
+def _refresh_name(name):
+    """Recompute which Cust_id a name points to (first record in file order) from the customers using it"""
+    ids = _ids_by_name.get(name)
+    if ids:
+        _by_name[name] = min(ids.items(), key=lambda kv: kv[1])[0]
+    else:
+        _by_name.pop(name, None)
+
+
+def _put(cust_id, name, offset):
+    """Point cust_id at (name, offset), moving it out of its old name's entry"""
+    old = _by_id.get(cust_id)
+    _by_id[cust_id] = (name, offset)
+    if old is not None and old[0] != name:
+        _drop_name(cust_id, old[0])
+    _ids_by_name.setdefault(name, {})[cust_id] = offset
+    _refresh_name(name)
+
+
+def _drop_name(cust_id, name):
+    ids = _ids_by_name.get(name)
+    if ids is not None:
+        ids.pop(cust_id, None)
+        if not ids:
+            del _ids_by_name[name]
+    _refresh_name(name)
+
+
+def _set_state(by_id):
+    global _by_id, _by_name, _ids_by_name
+    _by_id = by_id
+    _by_name = {}
+    _ids_by_name = {}
+    for cust_id, (name, offset) in sorted(by_id.items(), key=lambda kv: kv[1][1]):
+        _by_name.setdefault(name, cust_id)
+        _ids_by_name.setdefault(name, {})[cust_id] = offset
+
+
+def _save(stamp):
+    """Write the in-memory index to customer.idx stamped with the customer.dat it was built from"""
+    global _loaded_header
+    entries = [(name.encode(), cust_id.encode(), offset) for cust_id, (name, offset) in _by_id.items()]
+    index_file.write_entries(CUSTOMER_INDEX_FILE, INDEX_ENTRY_STRUCT, entries, CUSTOMER_FILE, stamp=stamp)
+    _loaded_header = index_file.read_header(CUSTOMER_INDEX_FILE)
+
+
+def rebuild():
+    """Scan customer.dat once and write a fresh customer.idx (deleted customers are left out)"""
+    with file_lock.exclusive(CUSTOMER_INDEX_FILE):
+        # stamp ก่อน scan: ถ้าเครื่องอื่นเขียน customer.dat ระหว่าง scan index จะถูกมองว่าเก่าและ rebuild อีกครั้ง
+        stamp = index_file.file_stamp(CUSTOMER_FILE)
+        by_id = {}
+        for i, r in enumerate(record_codec.read_rows(CUSTOMER_FILE, record_codec.CUSTOMER)):
+            if record_codec.is_deleted(record_codec.CUSTOMER, r):
+                continue
+            by_id.setdefault(_decode(r[0]), (_decode(r[1]), i * CUSTOMER_RECORD_SIZE))
+        _set_state(by_id)
+        _save(stamp)
+
+
+def _read_index():
+    """Load customer.idx into memory (replaying add/remove entries in order)"""
+    global _loaded_header
+    by_id = {}
+    with file_lock.shared(CUSTOMER_INDEX_FILE):
+        for raw_name, raw_id, offset in index_file.read_entries(CUSTOMER_INDEX_FILE, INDEX_ENTRY_STRUCT) or ():
+            cust_id = _decode(raw_id)
+            if offset < 0:
+                by_id.pop(cust_id, None)
+            else:
+                by_id[cust_id] = (_decode(raw_name), offset)
+        header = index_file.read_header(CUSTOMER_INDEX_FILE)
+    _set_state(by_id)
+    _loaded_header = header
+
+
+def load():
+    """Make sure the in-memory index matches customer.dat, rebuilding it when stale"""
+    header = index_file.read_header(CUSTOMER_INDEX_FILE)
+    if header is None or header != index_file.file_stamp(CUSTOMER_FILE):
+        rebuild()
+    elif header != _loaded_header:
+        _read_index()
+
+
+def lookup_name(cust_name):
+    """Return the Cust_id for a customer name, or None"""
+    load()
+    return _by_name.get(cust_name)
+
+
+def lookup_offset(cust_id):
+    """Return the byte offset of a customer record in customer.dat, or None"""
+    load()
+    entry = _by_id.get(cust_id)
+    return entry[1] if entry else None
+
+
+def ids():
+    """Set of every Cust_id in customer.dat"""
+    load()
+    return set(_by_id)
+
+
+# ====== Incremental maintenance (เรียกหลังจากเขียน customer.dat แล้ว) ======
+# ทั้งหมดเรียก _sync_before แล้วต่อท้าย entry ภายใต้ exclusive lock ของ customer.idx
+def _sync_before(size_delta):
+    """
+    Bring the in-memory index to the state of customer.idx before a write that
+    changed customer.dat by size_delta bytes. Returns False (after a full rebuild)
+    if the index was already stale, so the caller must not apply its delta again.
+    The caller holds the customer.idx lock.
+    """
+    header = index_file.read_header(CUSTOMER_INDEX_FILE)
+    size = index_file.file_stamp(CUSTOMER_FILE)[0]
+    if header is None or header[0] != size - size_delta:
+        rebuild()
+        return False
+    if header != _loaded_header:
+        _read_index()
+    return True
+
+
+def note_added(cust_id, cust_name):
+    """Record a customer appended at the end of customer.dat"""
+    note_added_many([(cust_id, cust_name)])
+
+
+def note_added_many(customers):
+    """Record [(cust_id, cust_name)] appended together (in this order) at the end of customer.dat"""
+    global _loaded_header
+    if not customers:
+        return
+    with file_lock.exclusive(CUSTOMER_INDEX_FILE):
+        if not _sync_before(len(customers) * CUSTOMER_RECORD_SIZE):
+            return
+        offset = index_file.file_stamp(CUSTOMER_FILE)[0] - len(customers) * CUSTOMER_RECORD_SIZE
+        entries = []
+        for cust_id, cust_name in customers:
+            _put(cust_id, cust_name, offset)
+            entries.append((cust_name.encode(), cust_id.encode(), offset))
+            offset += CUSTOMER_RECORD_SIZE
+        index_file.append_entries(CUSTOMER_INDEX_FILE, INDEX_ENTRY_STRUCT, entries, CUSTOMER_FILE)
+        _loaded_header = index_file.read_header(CUSTOMER_INDEX_FILE)
+
+
+def note_updated(cust_id, cust_name):
+    """Record a customer whose name may have changed in place"""
+    global _loaded_header
+    with file_lock.exclusive(CUSTOMER_INDEX_FILE):
+        if not _sync_before(0):
+            return
+        entry = _by_id.get(cust_id)
+        if entry is None:
+            rebuild()
+            return
+        offset = entry[1]
+        _put(cust_id, cust_name, offset)
+        index_file.append_entries(CUSTOMER_INDEX_FILE, INDEX_ENTRY_STRUCT,
+                                  [(cust_name.encode(), cust_id.encode(), offset)], CUSTOMER_FILE)
+        _loaded_header = index_file.read_header(CUSTOMER_INDEX_FILE)
+
+
+def note_deleted(cust_id):
+    """Record a customer tombstoned in place (no other record moves)"""
+    global _loaded_header
+    with file_lock.exclusive(CUSTOMER_INDEX_FILE):
+        if not _sync_before(0):
+            return
+        entry = _by_id.pop(cust_id, None)
+        if entry is None:
+            rebuild()
+            return
+        _drop_name(cust_id, entry[0])
+        # entry offset -1 = ลบ cust_id นี้ออกจาก index (ต่อท้าย customer.idx ไม่ต้องเขียนใหม่ทั้งไฟล์)
+        index_file.append_entries(CUSTOMER_INDEX_FILE, INDEX_ENTRY_STRUCT,
+                                  [(entry[0].encode(), cust_id.encode(), -1)], CUSTOMER_FILE)
+        _loaded_header = index_file.read_header(CUSTOMER_INDEX_FILE)
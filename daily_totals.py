@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+import columnar
+import file_lock
+import index_file
+import record_codec
+import sale_index
+import sale_ledger
+
+# ====== Daily sale aggregates ======
+# daily_totals.idx เก็บยอดรวมของแต่ละวัน (จำนวนบิล, ยอดสุทธิ, บิลแพงสุด/ถูกสุด) ไม่นับบิลที่ยกเลิก
+# sale / edit / delete อัปเดตเฉพาะวันที่เกี่ยวข้องตอน commit รายงาน "วันนี้" จึงอ่านแค่ตัวเลขไม่กี่ตัว
+# ยอดเป็นยอดหลังหัก void / คืนสินค้าใน sale_adjust.dat แล้ว (sale_ledger)
+SALE_FILE = "sale.dat"
+DAILY_TOTALS_FILE = "daily_totals.idx"
+SALE_RECORD_SIZE = record_codec.SALE.size
+
+# entry: day number, bills, total, max sale_id, max cust_id, max net, min sale_id, min cust_id, min net
+# entry พิเศษ LEDGER_KEY: bills = จำนวน record ของ sale_adjust.dat ที่นับรวมในยอดแล้ว
+# (ledger ต่อท้ายโดยไม่แก้ sale.dat -> header ของ sale.dat บอกไม่ได้ว่ามี void / คืนสินค้าใหม่)
+INDEX_ENTRY_STRUCT = "=iid10s10sd10s10sd"
+INDEX_MAGIC = b"RTO2"
+LEDGER_KEY = -2 ** 31
+
+# ทุกฟังก์ชันที่อ่าน/อัปเดตยอดทำภายใต้ _locked(): shared lock ของ sale.dat (ไม่มีบิลใหม่ระหว่างนั้น)
+# + exclusive lock ของ daily_totals.idx (ผู้อัปเดตทีละคน รวมถึง thread อ่านของ server.py ที่ catch up พร้อมกัน)
+_totals = {}    # day number (sale_index.date_key) -> {"bills", "total", "max", "min"}  (max/min = (sale_id, cust_id, net) หรือ None)
+_ledger_count = 0
+_loaded_header = None
+
+
+@contextmanager
+def _locked():
+    with file_lock.shared(SALE_FILE), file_lock.exclusive(DAILY_TOTALS_FILE):
+        yield
+
+
+def _empty():
+    return {"bills": 0, "total": 0.0, "max": None, "min": None}
+
+
+def _add_bill(totals, key, sale_id, cust_id, net_price, status):
+    """Count one bill into its day (cancelled bills, status 1, are not counted)"""
+    if status == 1:
+        return
+    day = totals.setdefault(key, _empty())
+    day["bills"] += 1
+    day["total"] += net_price
+    # เก็บบิลแรกในไฟล์ไว้ถ้ายอดเท่ากัน (เหมือน max()/min() แบบเดิม)
+    if day["max"] is None or net_price > day["max"][2]:
+        day["max"] = (sale_id, cust_id, net_price)
+    if day["min"] is None or net_price < day["min"][2]:
+        day["min"] = (sale_id, cust_id, net_price)
+
+
+def _save():
+    global _loaded_header
+    entries = [(LEDGER_KEY, _ledger_count, 0.0, b"", b"", 0.0, b"", b"", 0.0)]
+    for key, day in _totals.items():
+        max_id, max_cust, max_net = day["max"] or ("", "", 0.0)
+        min_id, min_cust, min_net = day["min"] or ("", "", 0.0)
+        entries.append((key, day["bills"], day["total"],
+                        max_id.encode(), max_cust.encode(), max_net,
+                        min_id.encode(), min_cust.encode(), min_net))
+    index_file.write_entries(DAILY_TOTALS_FILE, INDEX_ENTRY_STRUCT, entries, SALE_FILE, INDEX_MAGIC)
+    _loaded_header = index_file.read_header(DAILY_TOTALS_FILE, INDEX_MAGIC)
+
+
+def rebuild():
+    """Recompute every day from sale.dat (recovery command)"""
+    global _totals, _ledger_count
+    # shared lock: ไม่มีเครื่องไหนเพิ่ม/แก้บิลระหว่าง scan (ผู้เขียนอัปเดตยอดภายใต้ exclusive lock ของ sale.dat)
+    with _locked():
+        _ledger_count = sale_ledger.count()
+        # อ่านเป็น column (columnar): parse วันที่ครั้งเดียวต่อค่า และรวมยอดต่อวันทีละ column
+        sales = columnar.open_sales(SALE_FILE)
+        days = columnar.keys(sales["sale_date"], sale_index.date_key)
+        net = columnar.floats(sales["net_price"])
+        # บิลที่มี void / คืนสินค้า (มีไม่กี่บิล) หักลบทีละ record ก่อนรวม บิลที่ void ไม่ถูกนับ
+        voided = []
+        for i in columnar.isin(sales["sale_id"], sale_ledger.adjustments()):
+            r = sale_ledger.net_sale(sales.record(i))
+            if r is None:
+                voided.append(i)
+            else:
+                net[i] = r[3]
+        rows = columnar.rows_where(sales["sale_status"], 1, voided)
+        _totals = {key: {"bills": bills, "total": total, "max": _bill(sales, net, hi), "min": _bill(sales, net, lo)}
+                   for key, (bills, total, hi, lo) in columnar.group_totals(days, net, rows).items()}
+        _save()
+    return len(_totals)
+
+
+def _bill(sales, net, i):
+    """(sale_id, cust_id, net) of one row, like the max / min entries of _add_bill"""
+    return (record_codec.text(sales["sale_id"][i]).strip(), record_codec.text(sales["cust_id"][i]).strip(),
+            float(net[i]))
+
+
+def _read_index():
+    global _totals, _ledger_count, _loaded_header
+    totals = {}
+    for key, bills, total, max_id, max_cust, max_net, min_id, min_cust, min_net in \
+            index_file.read_entries(DAILY_TOTALS_FILE, INDEX_ENTRY_STRUCT, magic=INDEX_MAGIC):
+        if key == LEDGER_KEY:
+            _ledger_count = bills
+            continue
+        totals[key] = {
+            "bills": bills,
+            "total": total,
+            "max": (record_codec.text(max_id), record_codec.text(max_cust), max_net) if bills else None,
+            "min": (record_codec.text(min_id), record_codec.text(min_cust), min_net) if bills else None,
+        }
+    _totals = totals
+    _loaded_header = index_file.read_header(DAILY_TOTALS_FILE, INDEX_MAGIC)
+
+
+def load():
+    """Make sure the aggregates match sale.dat and sale_adjust.dat, rebuilding them when stale"""
+    with _locked():
+        header = index_file.read_header(DAILY_TOTALS_FILE, INDEX_MAGIC)
+        if header is None or header != index_file.file_stamp(SALE_FILE):
+            rebuild()
+            return
+        if header != _loaded_header:
+            _read_index()
+        _catch_up()
+
+
+def get(sale_date):
+    """Aggregates of one day: {"bills", "total", "max", "min"}"""
+    with _locked():
+        load()
+        return dict(_totals.get(sale_index.date_key(sale_date), _empty()))
+
+
+# ====== Incremental maintenance (เรียกหลังจาก commit การเขียน sale.dat แล้ว) ======
+def _sync_before(size_delta):
+    """
+    Bring the in-memory aggregates to the state before a write that changed
+    sale.dat by size_delta bytes. Returns False (after a full rebuild) if they
+    were already stale, so the caller must not apply its change again.
+    """
+    header = index_file.read_header(DAILY_TOTALS_FILE, INDEX_MAGIC)
+    size = index_file.file_stamp(SALE_FILE)[0]
+    if header is None or header[0] != size - size_delta:
+        rebuild()
+        return False
+    if header != _loaded_header:
+        _read_index()
+    return True
+
+
+def note_added(sale_date, sale_id, cust_id, net_price, status):
+    """Count a sale appended to sale.dat"""
+    with _locked():
+        if not _sync_before(SALE_RECORD_SIZE):
+            return
+        _add_bill(_totals, sale_index.date_key(sale_date), sale_id, cust_id, net_price, status)
+        _save()
+
+
+def _add_sale(totals, key, r):
+    """Count one sale.dat record after its adjustments (a voided bill is not counted)"""
+    r = sale_ledger.net_sale(r)
+    if r is not None:
+        _add_bill(totals, key, record_codec.text(r[0]).strip(), record_codec.text(r[1]).strip(), r[3], r[5])
+
+
+def _recount(keys):
+    for key in keys:
+        _totals.pop(key, None)
+        for _, r in sale_index.read_day(key):
+            _add_sale(_totals, key, r)
+
+
+def _catch_up():
+    """Recompute the days of voids / returns appended to sale_adjust.dat since the aggregates were saved"""
+    global _ledger_count
+    count = sale_ledger.count()
+    if count == _ledger_count:
+        return
+    if count < _ledger_count:
+        rebuild()
+        return
+    days = {sale_index.date_key(d) for d in sale_ledger.dates_after(_ledger_count)}
+    _ledger_count = count
+    _recount(days)
+    _save()
+
+
+def recompute(sale_dates, size_delta=0):
+    """Recompute only the given days from their records (after an edit or delete)"""
+    with _locked():
+        if not _sync_before(size_delta):
+            return
+        _recount({sale_index.date_key(d) for d in sale_dates})
+        _save()
+
+
+if __name__ == "__main__":
+    print(f"✅ Rebuilt {DAILY_TOTALS_FILE}: {rebuild()} day(s)")
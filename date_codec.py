@@ -0,0 +1,91 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+# ====== Date decoding (ใช้ร่วมกันทุก module) ======
+# วันที่ใน sale.dat (10 bytes) และ timestamp ใน log (19 bytes) ซ้ำกันมาก
+# จึง cache ผลการแปลงโดยใช้ field ดิบเป็น key และมี fast path สำหรับรูปแบบมาตรฐาน
+# ไม่ต้องวน strptime หลายรูปแบบทุก record
+SALE_DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%d%m%Y"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _decode(raw):
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="ignore")
+    return raw.strip().strip("\x00").strip()
+
+
+def _iso_date(s):
+    """Fast path for canonical YYYY-MM-DD, or None"""
+    if len(s) == 10 and s[4] == "-" and s[7] == "-" and s[:4].isdigit() and s[5:7].isdigit() and s[8:].isdigit():
+        try:
+            d = date(int(s[:4]), int(s[5:7]), int(s[8:]))
+        except ValueError:
+            return None
+        return d.replace(year=d.year - 543) if d.year > 2500 else d
+    return None
+
+
+def _parse_slow(s):
+    """Multi-format sale date parser (รองรับหลายรูปแบบและปี พ.ศ.)"""
+    for fmt in SALE_DATE_FORMATS:
+        try:
+            dt = datetime.strptime(s, fmt)
+            if dt.year > 2500:
+                dt = dt.replace(year=dt.year - 543)
+            return dt.date()
+        except Exception:
+            continue
+    # แบบไม่มีตัวคั่น DDMMYYYY
+    s2 = ''.join(ch for ch in s if ch.isdigit())
+    if len(s2) == 8:
+        day = int(s2[:2]); month = int(s2[2:4]); year = int(s2[4:])
+        if year > 2500: year -= 543
+        return datetime(year, month, day).date()
+    return None
+
+
+@lru_cache(maxsize=4096)
+def parse_date(raw):
+    """แปลง sale_date (bytes จากไฟล์หรือ str) เป็น date object หรือ None"""
+    try:
+        s = _decode(raw)
+        if not s:
+            return None
+        return _iso_date(s) or _parse_slow(s)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(raw):
+    """แปลง timestamp ของ log ("YYYY-MM-DD HH:MM:SS" หรือคั่นด้วย _) เป็น datetime หรือ None"""
+    try:
+        s = _decode(raw)
+        if (len(s) == 19 and s[4] == "-" and s[7] == "-" and s[10] in " _"
+                and s[13] == ":" and s[16] == ":"):
+            try:
+                return datetime(int(s[:4]), int(s[5:7]), int(s[8:10]),
+                                int(s[11:13]), int(s[14:16]), int(s[17:]))
+            except ValueError:
+                pass
+        return datetime.strptime(s.replace("_", " "), TIMESTAMP_FORMAT)
+    except Exception:
+        return None
+
+
+# ====== Integer day numbers ======
+# index ใช้เลขวัน (date.toordinal()) แทนข้อความ การเปรียบเทียบวันจึงเป็นการเทียบ int
+# วันที่ที่อ่านไม่ได้ทั้งหมดจะอยู่ในเลขวัน 0
+UNKNOWN_DAY = 0
+
+
+def day_number(value):
+    """Day number of a date / datetime / raw sale_date (UNKNOWN_DAY if it cannot be parsed)"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        value = parse_date(value)
+    return value.toordinal() if value else UNKNOWN_DAY
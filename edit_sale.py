@@ -1,7 +1,6 @@
-import struct
-from datetime import date
 from prettytable import PrettyTable
-import os
+import record_codec
+import service
 
 SALE_FILE = "sale.dat"
 SALE_DETAIL_FILE = "sale_detail.dat"
@@ -9,133 +8,20 @@ PRODUCT_FILE = "product.dat"
 CUSTOMER_FILE = "customer.dat"
 
 # Struct format
-SALE_STRUCT = "10s10s10sffi"  # sale_id, cust_id, sale_date, net_price, total_discount, sale_status
-SALE_DETAIL_STRUCT = "10s13siff"  # sale_id, pro_id, amount, sale_price, discount
-PRODUCT_STRUCT = "13s20sffi12si"
-CUSTOMER_STRUCT = "10s50s10si"  # pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status
+SALE_STRUCT = record_codec.SALE.format  # sale_id, cust_id, sale_date, net_price, total_discount, sale_status
+SALE_DETAIL_STRUCT = record_codec.SALE_DETAIL.format  # sale_id, pro_id, amount, sale_price, discount
+PRODUCT_STRUCT = record_codec.PRODUCT.format  # pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status
+CUSTOMER_STRUCT = record_codec.CUSTOMER.format  # cust_id, cust_name, cust_tel, cust_status
 
-# Helper functions to pack/unpack
-def pack_sale(record):
-    return struct.pack(SALE_STRUCT, record["sale_id"].encode(), record["cust_id"].encode(),
-                       record["sale_date"].encode(), record["net_price"], record["total_discount"], record["sale_status"])
-
-def unpack_sale(data):
-    r = struct.unpack(SALE_STRUCT, data)
-    return {
-        "sale_id": r[0].decode().strip('\x00'),
-        "cust_id": r[1].decode().strip('\x00'),
-        "sale_date": r[2].decode().strip('\x00'),
-        "net_price": r[3],
-        "total_discount": r[4],
-        "sale_status": r[5]
-    }
-
-def pack_sale_detail(record):
-    return struct.pack(SALE_DETAIL_STRUCT, record["sale_id"].encode(), record["pro_id"].encode(),
-                       record["amount"], record["sale_price"], record["discount"])
-
-def unpack_sale_detail(data):
-    r = struct.unpack(SALE_DETAIL_STRUCT, data)
-    return {
-        "sale_id": r[0].decode().strip('\x00'),
-        "pro_id": r[1].decode().strip('\x00'),
-        "amount": r[2],
-        "sale_price": r[3],
-        "discount": r[4]
-    }
-
-def pack_product(record):
-    return struct.pack(PRODUCT_STRUCT, record[0], record[1], record[2], record[3],
-                       record[4], record[5], record[6])
-
-def unpack_product(data):
-    r = struct.unpack(PRODUCT_STRUCT, data)
-    return {
-        "pro_id": r[0].decode().strip('\x00'),
-        "pro_name": r[1].decode().strip('\x00'),
-        "pro_cost": r[2],
-        "pro_salePrice": r[3],
-        "pro_amount": r[4],
-        "category": r[5].decode().strip('\x00'),
-        "status": r[6]
-    }
-
-# Load all sale
-def load_sales():
-    sales = []
-    if os.path.exists(SALE_FILE):
-        with open(SALE_FILE,"rb") as f:
-            while True:
-                data = f.read(struct.calcsize(SALE_STRUCT))
-                if not data: break
-                sales.append(unpack_sale(data))
-    return sales
-
-# Load all sale_detail
-def load_sale_details():
-    details = []
-    if os.path.exists(SALE_DETAIL_FILE):
-        with open(SALE_DETAIL_FILE,"rb") as f:
-            while True:
-                data = f.read(struct.calcsize(SALE_DETAIL_STRUCT))
-                if not data: break
-                details.append(unpack_sale_detail(data))
-    return details
-
-# Load all products
+# Load all products / customers (ผ่าน service)
 def load_products():
-    products = {}
-    if os.path.exists(PRODUCT_FILE):
-        with open(PRODUCT_FILE,"rb") as f:
-            while True:
-                data = f.read(struct.calcsize(PRODUCT_STRUCT))
-                if not data: break
-                prod = unpack_product(data)
-                products[prod["pro_id"]] = prod
-    return products
+    return {p["Pro_id"]: p for p in service.list_products()}
 
 def load_customers():
-    customers = {}
-    if os.path.exists(CUSTOMER_FILE):
-        record_size = struct.calcsize(CUSTOMER_STRUCT)
-        with open(CUSTOMER_FILE, "rb") as f:
-            while True:
-                data = f.read(record_size)
-                if not data:
-                    break
-                if len(data) != record_size:
-                    continue
-                r = struct.unpack(CUSTOMER_STRUCT, data)
-                cust_id = r[0].decode().strip('\x00')
-                cust_name = r[1].decode().strip('\x00')
-                customers[cust_id] = cust_name
-    return customers
-
-# Save sale
-def save_sales(sales):
-    with open(SALE_FILE,"wb") as f:
-        for s in sales:
-            f.write(pack_sale(s))
-
-# Save sale_detail
-def save_sale_details(details):
-    with open(SALE_DETAIL_FILE,"wb") as f:
-        for d in details:
-            f.write(pack_sale_detail(d))
-
-# Save products
-def save_products(products):
-    with open(PRODUCT_FILE,"wb") as f:
-        for p in products.values():
-            f.write(pack_product((
-                p["pro_id"].encode(), p["pro_name"].encode(), p["pro_cost"], p["pro_salePrice"],
-                p["pro_amount"], p["category"].encode(), p["status"]
-            )))
+    return {c["Cust_id"]: c["Cust_name"] for c in service.list_customers()}
 
 # Update sale function
 def update_sale():
-    sales = load_sales()
-    details = load_sale_details()
     products = load_products()
     customers = load_customers()
 
@@ -143,7 +29,12 @@ def update_sale():
     while True:
         sale_date_input = input("Enter sale date to display (YYYY-MM-DD): ").strip()
         if sale_date_input:
-            filtered_sales = [s for s in sales if s["sale_date"]==sale_date_input]
+            # อ่านเฉพาะ sale ของวันนั้น (หัก void / คืนสินค้าแล้ว บิลที่ void แล้วไม่แสดงให้แก้)
+            try:
+                filtered_sales = [s for s in service.sales_of_day(sale_date_input) if s["sale_date"]==sale_date_input]
+            except service.ServiceError as e:
+                print(e)
+                continue
             if filtered_sales:
                 break
             else:
@@ -155,19 +46,26 @@ def update_sale():
     table = PrettyTable(["sale_id","customer_name","sale_date","net_price","total_discount","sale_status"])
     for s in filtered_sales:
         cust_name = customers.get(s["cust_id"],"-")
-        table.add_row([s["sale_id"],cust_name,s["sale_date"],s["net_price"],s["total_discount"],s["sale_status"]])
+        table.add_row([s["sale_id"],cust_name,s["sale_date"],s["net_price"],s["total_discount"],s["status"]])
     print("\n--- Sales ---")
     print(table)
 
     # เลือก sale_id
     while True:
         sale_id = input("Enter sale_id to update: ").strip()
-        sale_record = next((s for s in sales if s["sale_id"]==sale_id), None)
+        sale_record = next((s for s in filtered_sales if s["sale_id"]==sale_id), None)
         if sale_record:
             break
         else:
             print("sale_id not found.")
 
+    # บิลที่มีการคืนสินค้าแล้วแก้ไม่ได้ (service.update_sale ก็ปฏิเสธ) บอกก่อนให้กรอกข้อมูล
+    if not service.can_edit_sale(sale_id):
+        print("This sale has returned items and cannot be edited.")
+        return
+
+    sale_details = sale_record["lines"]
+
     # --- Update sale fields ---
     new_cust = input(f"Enter new cust_id (leave blank to keep {sale_record['cust_id']}): ").strip()
     if new_cust: sale_record['cust_id'] = new_cust
@@ -175,43 +73,21 @@ def update_sale():
     new_date = input(f"Enter new sale_date (YYYY-MM-DD, leave blank to keep {sale_record['sale_date']}): ").strip()
     if new_date: sale_record['sale_date'] = new_date
 
-    old_status = sale_record["sale_status"]  # เก็บสถานะเดิมไว้ก่อน
     while True:
-        new_status = input(f"Enter sale_status (0=sold,1=canceled, leave blank to keep {sale_record['sale_status']}): ").strip()
+        new_status = input(f"Enter sale_status (0=sold,1=canceled, leave blank to keep {sale_record['status']}): ").strip()
         if not new_status:
             break
         if new_status in ("0", "1"):
-            sale_record['sale_status'] = int(new_status)
+            sale_record['status'] = int(new_status)
             break
         print("Invalid input, enter 0 or 1.")
 
-    # ✅ ถ้าสถานะเปลี่ยนเป็น 1 (Canceled) จากเดิมไม่ใช่ 1 -> คืนสินค้ากลับสต๊อก
-    if sale_record["sale_status"] == 1 and old_status != 1:
-        print(f"\nSale {sale_id} canceled — returning products to stock...")
-        for d in details:
-            if d["sale_id"] == sale_id:
-                pro_id = d["pro_id"]
-                amount = d["amount"]
-                if pro_id in products:
-                    old_amount = products[pro_id]["pro_amount"]  # จำนวนเดิมก่อนคืนของ
-                    products[pro_id]["pro_amount"] += amount      # คืนของเข้าสต๊อก
-
-                    # ✅ ถ้าก่อนคืนของ สินค้าหมดสต๊อก (old_amount == 0) → เปลี่ยนสถานะเป็น 1
-                    if old_amount == 0:
-                        products[pro_id]["status"] = 1
-
-                    print(f"  - Returned {amount} of {pro_id} ({products[pro_id]['pro_name']}) to stock.")
-        print("All products have been returned to stock.\n")
-
-
     # --- Update sale_detail ---
-    sale_details = [d for d in details if d["sale_id"]==sale_id]
-
     while True:
         table_detail = PrettyTable(["product id","product name","amount","sale price","discount"])
         for d in sale_details:
             pro_info = products.get(d["pro_id"]) 
-            pro_name = pro_info["pro_name"] if pro_info else "-"  
+            pro_name = pro_info["Pro_name"] if pro_info else "-"  
             table_detail.add_row([d["pro_id"], pro_name, d["amount"], d["sale_price"], d["discount"]])
         print("\n--- Sale Details ---")
         print(table_detail)
@@ -236,17 +112,12 @@ def update_sale():
                 except:
                     print("Invalid number.")
 
-            # ปรับ stock ใน product
+            # จำนวนเปลี่ยน -> คิดราคาใหม่จากราคาขายปัจจุบัน (เหมือน service.update_sale)
+            # stock พอหรือไม่ service ตรวจจากค่าล่าสุดตอนบันทึก
             prod = products[pro_id]
-            diff = new_amount - detail["amount"]
-            if prod["pro_amount"] - diff <0:
-                print(f"Not enough stock to increase amount. Available: {prod['pro_amount']}")
-                continue
-            prod["pro_amount"] -= diff
-
-            # ปรับ sale_price อัตโนมัติ
-            detail["amount"] = new_amount
-            detail["sale_price"] = prod["pro_salePrice"] * new_amount
+            if new_amount != detail["amount"]:
+                detail["amount"] = new_amount
+                detail["sale_price"] = prod["Pro_salePrice"] * new_amount
 
             # discount
             while True:
@@ -274,9 +145,9 @@ def update_sale():
             while True:
                 try:
                     amt = int(input(f"Enter amount of {new_pro_id}: "))
-                    if amt>0 and amt <= prod["pro_amount"]:
+                    if amt>0 and amt <= prod["Pro_amount"]:
                         break
-                    print(f"Amount must be 1-{prod['pro_amount']}")
+                    print(f"Amount must be 1-{prod['Pro_amount']}")
                 except:
                     print("Invalid number.")
 
@@ -290,25 +161,27 @@ def update_sale():
 
             # เพิ่มใน sale_detail
             sale_details.append({
-                "sale_id": sale_id,
                 "pro_id": new_pro_id,
                 "amount": amt,
-                "sale_price": prod["pro_salePrice"]*amt,
+                "sale_price": prod["Pro_salePrice"]*amt,
                 "discount": disc
             })
-            prod["pro_amount"] -= amt
 
         elif choice=="3":
             break
         else:
             print("Invalid choice, enter 1,2,3.")
 
-    # ปรับ net_price และ total_discount
-    sale_record["net_price"] = sum(d["sale_price"] for d in sale_details)
-    sale_record["total_discount"] = sum(d["discount"] for d in sale_details)
-
-    # บันทึก
-    save_sales(sales)
-    save_sale_details([d for d in details if d["sale_id"]!=sale_id]+sale_details)
-    save_products(products)
-    print("Sale updated successfully.")
+    # service ตรวจข้อมูล คิดยอดบิล แล้วให้ storage engine บันทึก sale / sale_detail / stock พร้อมกัน
+    # โดยปรับ stock จากค่าล่าสุด + ส่วนต่างของบิลนี้ (เครื่องอื่นอาจขายสินค้าตัวเดียวกันไประหว่างที่แก้บิลอยู่)
+    try:
+        saved = service.update_sale(sale_id, sale_date_input, sale_record["cust_id"], sale_record["sale_date"],
+                                    sale_record["status"], [(d["pro_id"], d["amount"], d["discount"]) for d in sale_details])
+    except service.ServiceError as e:
+        print(f"{e}. Sale not updated.")
+        return
+    state = "canceled" if saved["status"] == 1 else "sold"
+    print(f"Sale {sale_id} updated ({state}): net price {saved['net_price']}, discount {saved['total_discount']}")
+    for pro_id, amount in saved["stock"].items():
+        name = products[pro_id]["Pro_name"] if pro_id in products else pro_id
+        print(f"- {name}: {amount} in stock")
@@ -0,0 +1,142 @@
+import os
+import threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: ไม่มี fcntl -> lock ทั้งหมดเป็น no-op (ใช้งานได้ทีละโปรแกรมเหมือนเดิม)
+    fcntl = None
+
+# ====== Cross-process advisory locks ======
+# หลายเครื่องคิดเงิน (หลาย process ของ main.py / server.py) ใช้ไฟล์ข้อมูลชุดเดียวกัน
+#   shared    - ผู้อ่าน อ่านพร้อมกันได้
+#   exclusive - ผู้เขียน ทีละคน
+#   records   - lock เฉพาะช่วง byte ของ record ที่แก้ -> ขายสินค้าคนละตัวพร้อมกันได้
+# lock ถูกวางบนไฟล์ <ไฟล์ข้อมูล>.lock ไม่ใช่ไฟล์ข้อมูลเอง เพราะ POSIX lock ของ process จะหลุดทั้งหมด
+# เมื่อปิด fd ใดๆ ของไฟล์นั้น (โค้ดส่วนอื่นเปิด/ปิด product.dat ตลอด) ไฟล์ .lock เปิดครั้งเดียวและไม่ปิด
+# byte range ใน .lock ตรงกับ byte range ในไฟล์ข้อมูล (length 0 = ทั้งไฟล์ รวมส่วนที่จะ append)
+#
+# POSIX lock เป็นของทั้ง process ไม่ใช่ของ thread: thread อื่นใน process เดียวกัน (log_writer, thread อ่าน
+# ของ server.py) จึงต้องรอกันเองผ่าน _held / _cond ก่อนถึง fcntl
+#   - thread เดียวกัน lock ซ้อน: ได้เฉพาะเมื่อ lock ชั้นนอกครอบช่วงและ mode แล้ว (no-op) ไม่งั้น LockError
+#   - ต่าง thread: รอจนไม่มี thread อื่นถือช่วงที่ทับกัน (shared ช่วงเดียวกันถือพร้อมกันได้)
+#   - shared lock ของหลาย thread บนช่วงเดียวกันนับจำนวนไว้ ปล่อย fcntl เมื่อ thread สุดท้ายออก
+LOCK_SUFFIX = ".lock"
+ENABLED = fcntl is not None
+
+_fds = {}        # path -> fd ของไฟล์ .lock
+_held = {}       # path -> {thread id: [ranges, exclusive, depth]} ที่ถืออยู่ใน process นี้
+_shared = {}     # (path, offset, length) -> จำนวน thread ที่ถือ shared lock ช่วงนั้น
+_acquiring = {}  # path -> threading.Lock: ขอ shared lock จาก fcntl ทีละ thread (นับ _shared ให้ถูก)
+_fds_lock = threading.Lock()
+_cond = threading.Condition()
+
+
+class LockError(RuntimeError):
+    """A nested lock asks for ranges or a mode the enclosing lock of the same thread does not hold"""
+
+
+def _fd(path):
+    with _fds_lock:
+        fd = _fds.get(path)
+        if fd is None:
+            fd = _fds[path] = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+            _acquiring[path] = threading.Lock()
+        return fd
+
+
+def _mode(exclusive):
+    return "exclusive" if exclusive else "shared"
+
+
+def _overlap(a, b):
+    a_end = a[0] + a[1] if a[1] else float("inf")
+    b_end = b[0] + b[1] if b[1] else float("inf")
+    return a[0] < b_end and b[0] < a_end
+
+
+def _covers(held, ranges, exclusive):
+    held_ranges, held_exclusive, _ = held
+    if exclusive and not held_exclusive:
+        return False
+    return (0, 0) in held_ranges or set(ranges) <= held_ranges
+
+
+def _conflicts(held, ranges, exclusive):
+    held_ranges, held_exclusive, _ = held
+    return any(_overlap(a, b) and (exclusive or held_exclusive or a != b)
+               for a in held_ranges for b in ranges)
+
+
+@contextmanager
+def _lock(path, ranges, exclusive):
+    """
+    Hold fcntl locks on [(offset, length)] of path for the with-block.
+    A nested lock of the same thread must be covered by the one it holds
+    (LockError otherwise); other threads of this process wait like other processes do.
+    """
+    ranges = sorted(set(ranges))
+    me = threading.get_ident()
+    with _cond:
+        holders = _held.setdefault(path, {})
+        mine = holders.get(me)
+        if mine is not None:
+            if not _covers(mine, ranges, exclusive):
+                raise LockError(f"{path}: nested {_mode(exclusive)} lock of {ranges} is not covered "
+                                f"by the held {_mode(mine[1])} lock of {sorted(mine[0])}")
+            mine[2] += 1
+            nested = True
+        else:
+            while any(_conflicts(held, ranges, exclusive) for held in holders.values()):
+                _cond.wait()
+            mine = holders[me] = [set(ranges), exclusive, 1]
+            nested = False
+    taken = []
+    try:
+        if ENABLED and not nested:
+            fd = _fd(path)
+            if exclusive:
+                # เรียงตาม offset เสมอ เพื่อไม่ให้สอง process รอกันเป็นวง (deadlock)
+                for offset, length in ranges:
+                    fcntl.lockf(fd, fcntl.LOCK_EX, length, offset)
+                    taken.append((offset, length))
+            else:
+                with _acquiring[path]:
+                    for offset, length in ranges:
+                        key = (path, offset, length)
+                        if not _shared.get(key):
+                            fcntl.lockf(fd, fcntl.LOCK_SH, length, offset)
+                        _shared[key] = _shared.get(key, 0) + 1
+                        taken.append((offset, length))
+        yield
+    finally:
+        if taken and exclusive:
+            for offset, length in reversed(taken):
+                fcntl.lockf(_fds[path], fcntl.LOCK_UN, length, offset)
+        elif taken:
+            with _acquiring[path]:
+                for offset, length in reversed(taken):
+                    key = (path, offset, length)
+                    _shared[key] -= 1
+                    if not _shared[key]:
+                        del _shared[key]
+                        fcntl.lockf(_fds[path], fcntl.LOCK_UN, length, offset)
+        with _cond:
+            mine[2] -= 1
+            if not mine[2]:
+                del holders[me]
+                _cond.notify_all()
+
+
+def shared(path):
+    """Shared (reader) lock on a whole file"""
+    return _lock(path, [(0, 0)], False)
+
+
+def exclusive(path):
+    """Exclusive (writer) lock on a whole file"""
+    return _lock(path, [(0, 0)], True)
+
+
+def records(path, offsets, record_size, exclusive=True):
+    """Lock only the records starting at the given byte offsets"""
+    return _lock(path, [(offset, record_size) for offset in offsets], exclusive)
@@ -0,0 +1,83 @@
+import os
+import struct
+import tempfile
+import file_lock
+
+# ====== Sidecar index files ======
+# ไฟล์ index จะมี header เก็บ (size, mtime_ns) ของไฟล์ข้อมูลตอนที่ index ถูกสร้าง
+# ถ้าไม่ตรงกับไฟล์ข้อมูลปัจจุบันแปลว่า index เก่า (stale) และต้อง rebuild
+# magic บอก format ของ entry: ถ้าเปลี่ยน format ให้ใช้ magic ใหม่ ไฟล์เก่าจะถูกมองว่าไม่มี index และ rebuild
+# การเขียน index ถือ exclusive lock ของไฟล์ index (หลายเครื่องไม่เขียนทับ/แทรก entry ของกันและกัน)
+HEADER_STRUCT = "=4sqq"  # magic, source size, source mtime_ns
+HEADER_SIZE = struct.calcsize(HEADER_STRUCT)
+MAGIC = b"RIDX"
+
+
+def file_stamp(path):
+    """Return (size, mtime_ns) of a file, or (0, 0) if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (0, 0)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def read_header(index_path, magic=MAGIC):
+    """Return the (size, mtime_ns) stamp stored in an index file, or None"""
+    try:
+        with open(index_path, "rb") as f:
+            data = f.read(HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(data) != HEADER_SIZE:
+        return None
+    found, size, mtime_ns = struct.unpack(HEADER_STRUCT, data)
+    if found != magic:
+        return None
+    return (size, mtime_ns)
+
+
+def read_entries(index_path, entry_struct, source_path=None, magic=MAGIC):
+    """Read all entries of an index file, or None if it is missing or stale
+    (pass source_path=None to skip the staleness check)"""
+    header = read_header(index_path, magic)
+    if header is None:
+        return None
+    if source_path is not None and header != file_stamp(source_path):
+        return None
+    with file_lock.shared(index_path), open(index_path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        data = f.read()
+    size = struct.calcsize(entry_struct)
+    usable = len(data) - len(data) % size
+    return list(struct.iter_unpack(entry_struct, memoryview(data)[:usable]))
+
+
+def write_entries(index_path, entry_struct, entries, source_path, magic=MAGIC, stamp=None):
+    """
+    Replace an index file with the given entries (atomic rename). stamp is the
+    (size, mtime_ns) of source_path the entries were built from (default: now).
+    """
+    packer = struct.Struct(entry_struct)
+    with file_lock.exclusive(index_path):
+        # ชื่อไฟล์ชั่วคราวไม่ซ้ำกัน (โฟลเดอร์เดียวกับ index เพื่อให้ rename เป็น atomic)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(index_path) + ".",
+                                        suffix=".tmp", dir=os.path.dirname(index_path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(struct.pack(HEADER_STRUCT, magic, *(stamp or file_stamp(source_path))))
+                f.write(b"".join(packer.pack(*e) for e in entries))
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def append_entries(index_path, entry_struct, entries, source_path, magic=MAGIC):
+    """Append entries to an existing index file and re-stamp its header"""
+    packer = struct.Struct(entry_struct)
+    with file_lock.exclusive(index_path), open(index_path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        f.write(b"".join(packer.pack(*e) for e in entries))
+        f.seek(0)
+        f.write(struct.pack(HEADER_STRUCT, magic, *file_stamp(source_path)))
@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+import zlib
+import file_lock
+
+# ====== Write-ahead journal ======
+# การแก้ไขที่แตะหลายไฟล์ (sale.dat, sale_detail.dat, product.dat) จะถูกบันทึกลง journal ก่อน
+# fsync journal ครั้งเดียว แล้วค่อยเขียนลงไฟล์จริงแบบ positioned write
+# ถ้าเครื่องดับระหว่างเขียน ตอนเปิดโปรแกรมใหม่ recover() จะเขียนซ้ำจาก journal ให้ครบ
+JOURNAL_FILE = "journal.wal"
+
+# op header: op code, path length, offset (หรือ size สำหรับ truncate / crc สำหรับ commit), data length
+OP_STRUCT = struct.Struct("=cHqI")
+OP_WRITE = b"W"
+OP_TRUNCATE = b"T"
+OP_COMMIT = b"C"
+
+# มี journal ไฟล์เดียว: commit จากหลาย thread (เช่น log writer ที่ rotate log) ต้องทำทีละอัน
+# และจากหลาย process (file_lock บน journal.wal)
+_commit_lock = threading.RLock()
+
+
+class Transaction:
+    """
+    A group of file changes applied all-or-nothing.
+    Every op is idempotent (write bytes at an absolute offset / truncate to a size)
+    so replaying a committed journal twice gives the same files.
+    """
+
+    def __init__(self):
+        self.ops = []       # (op code, path, offset, data)
+        self._sizes = {}    # path -> size of the file after the ops recorded so far
+        self._after = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def size(self, path):
+        """Size the file will have once the recorded ops are applied"""
+        if path not in self._sizes:
+            self._sizes[path] = os.path.getsize(path) if os.path.exists(path) else 0
+        return self._sizes[path]
+
+    def write(self, path, offset, data):
+        data = bytes(data)
+        self._sizes[path] = max(self.size(path), offset + len(data))
+        self.ops.append((OP_WRITE, path, offset, data))
+
+    def append(self, path, data):
+        """Write data at the end of the file, returns the offset it will land at"""
+        offset = self.size(path)
+        self.write(path, offset, data)
+        return offset
+
+    def truncate(self, path, size):
+        self.size(path)
+        self._sizes[path] = size
+        self.ops.append((OP_TRUNCATE, path, size, b""))
+
+    def replace(self, path, data):
+        """Replace the whole content of a file"""
+        self.write(path, 0, data)
+        self.truncate(path, len(data))
+
+    def after_commit(self, fn):
+        """Run fn once the changes are on disk (e.g. to update a sidecar index)"""
+        self._after.append(fn)
+
+    def commit(self):
+        if not self.ops:
+            for fn in self._after:
+                fn()
+            return
+        body = b"".join(_pack_op(*op) for op in self.ops)
+        with _commit_lock, file_lock.exclusive(JOURNAL_FILE):
+            with open(JOURNAL_FILE, "wb") as f:
+                f.write(body + OP_STRUCT.pack(OP_COMMIT, 0, zlib.crc32(body), 0))
+                f.flush()
+                os.fsync(f.fileno())
+            _apply(self.ops)
+            _clear()
+        self.ops = []
+        for fn in self._after:
+            fn()
+
+
+def _pack_op(op, path, offset, data):
+    raw_path = path.encode("utf-8")
+    return OP_STRUCT.pack(op, len(raw_path), offset, len(data)) + raw_path + data
+
+
+def _apply(ops):
+    """Apply ops to their files, then fsync every touched file once"""
+    files = {}
+    try:
+        for op, path, offset, data in ops:
+            f = files.get(path)
+            if f is None:
+                if not os.path.exists(path):
+                    open(path, "wb").close()
+                f = files[path] = open(path, "r+b")
+            if op == OP_WRITE:
+                f.seek(offset)
+                f.write(data)
+            elif op == OP_TRUNCATE:
+                f.truncate(offset)
+        for f in files.values():
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def _clear():
+    with open(JOURNAL_FILE, "wb") as f:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_committed(data):
+    """Parse a journal -> list of ops, or None if it has no valid commit record"""
+    ops = []
+    pos = 0
+    while pos + OP_STRUCT.size <= len(data):
+        op, path_len, offset, data_len = OP_STRUCT.unpack_from(data, pos)
+        if op == OP_COMMIT:
+            return ops if zlib.crc32(data[:pos]) == offset else None
+        start = pos + OP_STRUCT.size
+        end = start + path_len + data_len
+        if op not in (OP_WRITE, OP_TRUNCATE) or end > len(data):
+            return None
+        path = data[start:start + path_len].decode("utf-8")
+        ops.append((op, path, offset, data[start + path_len:end]))
+        pos = end
+    return None
+
+
+def recover():
+    """
+    Finish a transaction interrupted by a crash (call once at startup).
+    A committed journal is replayed, an incomplete one is discarded.
+    Returns the number of replayed ops.
+    """
+    if not os.path.exists(JOURNAL_FILE):
+        return 0
+    # process อื่นอาจกำลัง commit อยู่: รอให้เสร็จก่อน journal ที่เขียนไม่ครบของเขาไม่ใช่ของค้าง
+    with _commit_lock, file_lock.exclusive(JOURNAL_FILE):
+        with open(JOURNAL_FILE, "rb") as f:
+            data = f.read()
+        if not data:
+            return 0
+        ops = _read_committed(data)
+        if ops:
+            _apply(ops)
+            print(f"🔁 Recovered {len(ops)} pending change(s) from {JOURNAL_FILE}")
+        else:
+            print(f"⚠️ Discarded an incomplete transaction in {JOURNAL_FILE}")
+        _clear()
+    return len(ops or [])
@@ -0,0 +1,123 @@
+import atexit
+import queue
+import threading
+import time
+import change_log
+import file_lock
+import record_codec
+
+# ====== Background audit log writer ======
+# log record (product_change.bin / customer_change.bin) ถูกส่งเข้า queue แล้วให้ thread เบื้องหลัง
+# เขียนเป็นชุด (เปิดไฟล์ครั้งเดียวต่อชุด) งาน interactive จึงไม่ต้องรอ open/write/flush ทุก operation
+QUEUE_SIZE = 10000       # queue เต็ม -> ผู้เขียนรอ (backpressure) แทนการทิ้ง record
+BATCH_RECORDS = 512      # เขียนเมื่อครบจำนวนนี้ ...
+FLUSH_INTERVAL = 0.5     # ... หรือเมื่อ record แรกของชุดรอครบกี่วินาที
+SYNC = False             # True = เขียนทันทีใน thread ที่เรียก (ใช้ตอนทดสอบ)
+
+# codec ของแต่ละ log: ข้อมูลหนึ่งก้อนที่ส่งมาอาจมีหลาย record ต่อกัน (แยกด้วยขนาด record)
+LOG_CODECS = {
+    "product_change.bin": record_codec.PRODUCT_LOG,
+    "customer_change.bin": record_codec.CUSTOMER_LOG,
+}
+# log ที่ต้อง rotate หลังเขียน (ดู change_log.maybe_rotate)
+ROTATED_LOGS = {"product_change.bin"}
+
+_FLUSH = object()
+_STOP = object()
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_thread = None
+_lock = threading.Lock()
+
+
+def set_sync(sync=True):
+    """Switch between background (False) and synchronous (True) writing"""
+    global SYNC
+    if sync:
+        flush()
+    SYNC = sync
+
+
+def split(path, data):
+    """Packed log records of path (one or more) -> one bytes per record"""
+    size = LOG_CODECS[path].size
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _append(batch):
+    """Append [(path, records)] grouping the records of each file into one write"""
+    by_path = {}
+    for path, data in batch:
+        by_path.setdefault(path, []).extend(split(path, data))
+    for path, records in by_path.items():
+        codec = LOG_CODECS[path]
+        try:
+            # lock เดียวกับ change_log.rotate: ไม่มี record ที่ต่อท้ายระหว่าง rotate แล้วหายไป
+            with file_lock.exclusive(path):
+                change_log.append_in_order(path, codec, records)
+                if path in ROTATED_LOGS:
+                    change_log.maybe_rotate(path, codec)
+        except Exception as e:
+            print(f"❌ Error writing {len(records)} log record(s) to {path}: {e}")
+
+
+def _run():
+    while True:
+        item = _queue.get()
+        batch = [] if item is _FLUSH or item is _STOP else [item]
+        taken = 1
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while item is not _FLUSH and item is not _STOP and len(batch) < BATCH_RECORDS:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = _queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            taken += 1
+            if item is not _FLUSH and item is not _STOP:
+                batch.append(item)
+        _append(batch)
+        for _ in range(taken):
+            _queue.task_done()
+        if item is _STOP:
+            return
+
+
+def _start():
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="log-writer", daemon=True)
+            _thread.start()
+
+
+def write(path, data):
+    """Queue packed log records for path, one or more (written immediately when SYNC)"""
+    if SYNC:
+        _append([(path, data)])
+        return
+    _start()
+    _queue.put((path, data))
+
+
+def flush():
+    """Wait until every queued record is on disk (เรียกก่อนอ่าน log)"""
+    if _thread is None or not _thread.is_alive() or threading.current_thread() is _thread:
+        return
+    _queue.put(_FLUSH)
+    _queue.join()
+
+
+def shutdown():
+    """Drain the queue and stop the writer thread (เรียกตอนปิดโปรแกรม)"""
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        return
+    _queue.put(_STOP)
+    _thread.join()
+    _thread = None
+
+
+# สคริปต์ที่ไม่ได้เรียก shutdown() เองก็ยังไม่เสีย record ที่ค้างใน queue
+atexit.register(shutdown)
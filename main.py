@@ -5,6 +5,13 @@ import update_view_cust
 import add_del_pd_cs
 import edit_sale
 import Report
+import journal
+import log_writer
+import audit_policy
+import compaction
+
+# ทำ transaction ที่ค้างจากการปิดโปรแกรมกลางคันให้เสร็จก่อนเริ่มใช้งาน
+journal.recover()
 
 while True:
     print("\n" + "="*50)
@@ -146,4 +153,14 @@ while True:
         print("\n\nGoodbye!")
         break
     except Exception as e:
-        print(f"Unexpected error: {e}")
\ No newline at end of file
+        print(f"Unexpected error: {e}")
+
+# เก็บกวาด record ที่ลบแล้ว (tombstone) ออกจาก product.dat / customer.dat เมื่อสะสมเกินเกณฑ์
+try:
+    compaction.run()
+except Exception as e:
+    print("⚠️ Compaction skipped:", e)
+
+# เขียน audit log ที่ยังค้างใน queue (รวมถึงตัวนับ VIEW แบบ aggregated) ให้ครบก่อนปิดโปรแกรม
+audit_policy.flush()
+log_writer.shutdown()
\ No newline at end of file
@@ -0,0 +1,277 @@
+import os
+import time
+import file_lock
+import record_codec
+
+# ====== Record-addressed access to product.dat ======
+# product.dat เป็นไฟล์ fixed-size record จึงอ่าน/เขียนทีละ record ได้ด้วย offset
+PRODUCT_FILE = "product.dat"
+PRODUCT_RECORD_SIZE = record_codec.PRODUCT.size
+
+# offset index: Pro_id -> byte offset ของ record ใน product.dat (ไม่รวมสินค้าที่ลบแล้ว)
+# free slots: offset ของ record ที่ลบแล้ว (tombstone) ให้ add_records ใช้ซ้ำก่อนต่อท้ายไฟล์
+_offset_index = {}
+_free_slots = []
+_index_stamp = None
+
+# snapshot cache: record (tuple) ของทุกสินค้าจากการอ่าน product.dat ครั้งล่าสุด + stamp ของไฟล์ตอนนั้น
+# ใช้ซ้ำได้ข้ามบิล/ข้ามคำขอ ตราบใดที่ (size, mtime) ยังเท่าเดิม -> เช็คว่ามีสินค้า/ดูราคาเป็นแค่ dict lookup
+# ไฟล์ที่เพิ่งถูกเขียนไม่ถึง RACY_NS: process อื่นอาจเขียนซ้ำใน tick เดียวกันโดย mtime ไม่เปลี่ยน -> ยังไม่ใช้ซ้ำ
+# (stock ที่ใช้ตัดสินจริงอ่านใหม่ภายใต้ record lock ตอน commit เสมอ ดู service.commit_cart)
+RACY_NS = 10 ** 9
+_cache = None
+_cache_stamp = None
+
+
+def _file_stamp(path=PRODUCT_FILE):
+    """Return (size, mtime_ns) of the file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _decode_id(raw):
+    return record_codec.text(raw).strip()
+
+
+def _is_dead(r):
+    return record_codec.is_deleted(record_codec.PRODUCT, r)
+
+
+def build_index():
+    """Scan product.dat once and map every live Pro_id to its record offset (and collect the free slots)"""
+    global _offset_index, _free_slots, _index_stamp
+    index = {}
+    free = []
+    with open(PRODUCT_FILE, "rb") as f:
+        data = f.read()
+    for i, r in enumerate(record_codec.iter_rows(data, record_codec.PRODUCT)):
+        if _is_dead(r):
+            free.append(i * PRODUCT_RECORD_SIZE)
+            continue
+        # ถ้า id ซ้ำให้ใช้ record แรก (เหมือนการค้นหาแบบเดิม)
+        index.setdefault(_decode_id(r[0]), i * PRODUCT_RECORD_SIZE)
+    _offset_index = index
+    _free_slots = free
+    _index_stamp = _file_stamp()
+    return _offset_index
+
+
+def _cached_records():
+    """{Pro_id: (offset, record tuple)} from the cache, re-reading product.dat only when it changed"""
+    global _offset_index, _free_slots, _index_stamp, _cache, _cache_stamp
+    if _cache is not None and _cache_stamp is not None and _cache_stamp == _file_stamp():
+        return _cache
+    records = {}
+    free = []
+    # shared lock: ไม่อ่านระหว่างที่เครื่องอื่นกำลังเขียน product.dat ใหม่ทั้งไฟล์ (compaction)
+    with file_lock.shared(PRODUCT_FILE):
+        stamp = _file_stamp()
+        for i, r in enumerate(record_codec.read_rows(PRODUCT_FILE, record_codec.PRODUCT)):
+            if _is_dead(r):
+                free.append(i * PRODUCT_RECORD_SIZE)
+                continue
+            pro_id = _decode_id(r[0])
+            if pro_id not in records:
+                records[pro_id] = (i * PRODUCT_RECORD_SIZE, r)
+    # ได้ offset ของทุกสินค้ามาแล้ว จึงใช้เป็น index ได้เลย
+    _offset_index = {pro_id: offset for pro_id, (offset, _) in records.items()}
+    _free_slots = free
+    _index_stamp = stamp
+    racy = stamp is None or time.time_ns() - stamp[1] < RACY_NS
+    _cache, _cache_stamp = records, None if racy else stamp
+    return records
+
+
+def snapshot():
+    """
+    Every product -> {Pro_id: (offset, list record)} (first record of each id).
+    The lists are the caller's own copies (a sale reserves stock in them);
+    product.dat itself is only read when it changed since the last snapshot.
+    """
+    return {pro_id: (offset, list(r)) for pro_id, (offset, r) in _cached_records().items()}
+
+
+def get_index():
+    """Return the offset index, rebuilding it when product.dat changed on disk"""
+    if _index_stamp is None or _index_stamp != _file_stamp():
+        return build_index()
+    return _offset_index
+
+
+def find_offset(pro_id):
+    """Return the byte offset of a product record, or None if not found"""
+    return get_index().get(pro_id)
+
+
+def read_product(pro_id):
+    """Read one product record by Pro_id -> (offset, list record) or (None, None)"""
+    offset = find_offset(pro_id)
+    if offset is None:
+        return None, None
+    fd = os.open(PRODUCT_FILE, os.O_RDONLY)
+    try:
+        data = os.pread(fd, PRODUCT_RECORD_SIZE, offset)
+    finally:
+        os.close(fd)
+    if len(data) != PRODUCT_RECORD_SIZE:
+        return None, None
+    record = list(record_codec.PRODUCT.unpack(data))
+    # record ที่ offset นี้ต้องเป็นสินค้าตัวเดิมที่ยังไม่ถูกลบ ถ้าไม่ใช่แปลว่า index เก่า -> สร้างใหม่แล้วลองอีกครั้ง
+    if _decode_id(record[0]) != pro_id or _is_dead(record):
+        if build_index().get(pro_id) in (None, offset):
+            return None, None
+        return read_product(pro_id)
+    return offset, record
+
+
+def _restamp():
+    global _index_stamp
+    _index_stamp = _file_stamp()
+
+
+def write_records(updates, sync=True, tx=None):
+    """
+    Write packed records in place with positioned writes.
+    updates is an iterable of (offset, record) where record is a 7-field sequence;
+    offset None means append as a new record. Only the touched records hit the disk.
+    With a journal transaction (tx) the writes are only recorded and happen on commit.
+    """
+    global _index_stamp
+    if tx is not None:
+        index = get_index()
+        for offset, record in updates:
+            data = record_codec.PRODUCT.pack(*record)
+            if offset is None:
+                offset = tx.append(PRODUCT_FILE, data)
+                index.setdefault(_decode_id(record[0]), offset)
+            else:
+                tx.write(PRODUCT_FILE, offset, data)
+        tx.after_commit(_restamp)
+        return
+    flags = os.O_RDWR | os.O_CREAT
+    fd = os.open(PRODUCT_FILE, flags, 0o644)
+    try:
+        index = get_index()
+        end = os.fstat(fd).st_size
+        for offset, record in updates:
+            data = record_codec.PRODUCT.pack(*record)
+            if offset is None:
+                offset = end
+                end += PRODUCT_RECORD_SIZE
+                index.setdefault(_decode_id(record[0]), offset)
+            os.pwrite(fd, data, offset)
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    # เขียนแบบ in-place ไม่ทำให้ offset เปลี่ยน จึงใช้ index เดิมต่อได้
+    _index_stamp = _file_stamp()
+
+
+def _take_free_slot(fd):
+    """Pop a free slot that is still a tombstone on disk (another till may have reused it), or None"""
+    while _free_slots:
+        offset = _free_slots.pop(0)
+        data = os.pread(fd, PRODUCT_RECORD_SIZE, offset)
+        if len(data) == PRODUCT_RECORD_SIZE and _is_dead(record_codec.PRODUCT.unpack(data)):
+            return offset
+    return None
+
+
+def add_records(records, tx=None):
+    """
+    Store new product records -> their offsets. The slots of deleted products are
+    reused first; the rest are appended with a single write.
+    The caller holds the exclusive lock on product.dat.
+    With a journal transaction (tx) the writes happen on commit.
+    """
+    index = get_index()
+    offsets = []
+    writes = []
+    fd = os.open(PRODUCT_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        end = tx.size(PRODUCT_FILE) if tx is not None else os.fstat(fd).st_size
+        tail = []
+        for record in records:
+            data = record_codec.PRODUCT.pack(*record)
+            offset = _take_free_slot(fd)
+            if offset is None:
+                offset = end + len(tail) * PRODUCT_RECORD_SIZE
+                tail.append(data)
+            else:
+                writes.append((offset, data))
+            offsets.append(offset)
+        if tail:
+            writes.append((end, b"".join(tail)))
+        if tx is None:
+            for offset, data in writes:
+                os.pwrite(fd, data, offset)
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    def note():
+        for offset, record in zip(offsets, records):
+            index.setdefault(_decode_id(record[0]), offset)
+        _restamp()
+
+    if tx is None:
+        note()
+    else:
+        for offset, data in writes:
+            tx.write(PRODUCT_FILE, offset, data)
+        tx.after_commit(note)
+    return offsets
+
+
+def delete_record(offset, record, tx=None):
+    """Mark a product as deleted in place (one positioned write) and free its slot for add_records"""
+    dead = list(record)
+    dead[6] = record_codec.PRODUCT_DELETED
+    write_records([(offset, dead)], tx=tx)
+
+    def free():
+        _offset_index.pop(_decode_id(dead[0]), None)
+        if offset not in _free_slots:
+            _free_slots.append(offset)
+            _free_slots.sort()
+
+    if tx is None:
+        free()
+    else:
+        tx.after_commit(free)
+
+
+def aggregate(lines):
+    """Sum (pro_id, amount) pairs into {pro_id: total amount}"""
+    totals = {}
+    for pro_id, amount in lines:
+        totals[pro_id] = totals.get(pro_id, 0) + amount
+    return totals
+
+
+def return_stock(lines, tx=None):
+    """
+    Put stock back for many (pro_id, amount) lines at once (void / return of a bill).
+    Amounts are aggregated per Pro_id, each product record is read and written once,
+    and a sold-out product (status 2) becomes available again. Returns
+    {pro_id: new amount}; ids that are not in product.dat are skipped.
+    """
+    totals = aggregate(lines)
+    updates = []
+    result = {}
+    for pro_id, amount in totals.items():
+        offset, record = read_product(pro_id)
+        if record is None:
+            continue
+        record[4] += amount
+        if record[6] == 2 and record[4] > 0:
+            record[6] = 1
+        updates.append((offset, record))
+        result[pro_id] = record[4]
+    if updates:
+        write_records(updates, tx=tx)
+    return result
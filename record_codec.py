@@ -0,0 +1,161 @@
+import struct
+
+# ====== Record formats (ใช้ร่วมกันทุก module) ======
+# precompile struct ครั้งเดียว แทนการเรียก struct.calcsize/unpack ด้วย format string ทุก record
+PRODUCT = struct.Struct("13s20sffi12si")           # pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status
+SALE = struct.Struct("10s10s10sffi")               # sale_id, cust_id, sale_date, net_price, total_discount, sale_status
+SALE_DETAIL = struct.Struct("10s13siff")           # sale_id, pro_id, amount, sale_price, discount
+CUSTOMER = struct.Struct("10s50s10si")             # cust_id, cust_name, cust_tel, cust_status
+PRODUCT_LOG = struct.Struct("19si13s20sffi12si20s")  # ts, op_code, product fields..., user
+CUSTOMER_LOG = struct.Struct("19si10s50s10si20s")    # ts, op_code, customer fields..., user
+SALE_ADJUST = struct.Struct("10s10s13siffi19s")      # sale_id, sale_date, pro_id, amount, sale_price, discount, kind, ts
+STOCK_MOVE = struct.Struct("q13sii10s")              # ts (ns), pro_id, kind, qty (+ เข้า / - ออก), ref (sale_id)
+
+# ====== Tombstones ======
+# ลบ product / customer = เปลี่ยน status ของ record เป็นค่า "ลบแล้ว" ในที่เดิม (ไม่เขียนไฟล์ใหม่ทั้งไฟล์)
+# record เหล่านี้ยังอยู่ในไฟล์จนกว่า compaction.py จะเก็บกวาด ทุกที่ที่อ่านไฟล์จึงต้องข้ามมัน
+PRODUCT_DELETED = 3      # Pro_status 3 = Discontinued (log DELETE ของสินค้าก็ใช้ค่านี้)
+CUSTOMER_DELETED = 2     # Cust_status 2 (log DELETE ของลูกค้าใช้ค่านี้, 0 = Cancel ยังเป็นลูกค้าอยู่)
+_STATUS_FIELD = {PRODUCT: (6, PRODUCT_DELETED), CUSTOMER: (3, CUSTOMER_DELETED)}
+
+
+def text(raw):
+    """Decode a fixed-size string field (bytes padded with NUL)"""
+    return raw.decode("utf-8", errors="ignore").strip("\x00")
+
+
+def fixed(value, size):
+    """Encode a string into a NUL padded field of exactly size bytes"""
+    return str(value).encode("utf-8").ljust(size, b"\x00")[:size]
+
+
+# ====== Lazy rows ======
+# row เก็บ tuple ที่ unpack แล้วไว้เฉย ๆ และจะ decode string เฉพาะ field ที่ถูกเรียกใช้
+def _text_field(i):
+    return property(lambda self: text(self._r[i]))
+
+
+def _field(i):
+    return property(lambda self: self._r[i])
+
+
+class _Row:
+    __slots__ = ("_r",)
+    codec = None
+
+    def __init__(self, r):
+        self._r = r
+
+    def __getitem__(self, i):
+        return self._r[i]
+
+    @property
+    def raw(self):
+        return self._r
+
+    def pack(self):
+        return self.codec.pack(*self._r)
+
+
+class ProductRow(_Row):
+    __slots__ = ()
+    codec = PRODUCT
+    pro_id = _text_field(0)
+    pro_name = _text_field(1)
+    pro_cost = _field(2)
+    pro_salePrice = _field(3)
+    pro_amount = _field(4)
+    category = _text_field(5)
+    status = _field(6)
+
+
+class SaleRow(_Row):
+    __slots__ = ()
+    codec = SALE
+    sale_id = _text_field(0)
+    cust_id = _text_field(1)
+    sale_date = _text_field(2)
+    net_price = _field(3)
+    total_discount = _field(4)
+    status = _field(5)
+
+
+class SaleDetailRow(_Row):
+    __slots__ = ()
+    codec = SALE_DETAIL
+    sale_id = _text_field(0)
+    pro_id = _text_field(1)
+    amount = _field(2)
+    sale_price = _field(3)
+    discount = _field(4)
+
+
+class CustomerRow(_Row):
+    __slots__ = ()
+    codec = CUSTOMER
+    cust_id = _text_field(0)
+    cust_name = _text_field(1)
+    cust_tel = _text_field(2)
+    status = _field(3)
+
+
+class ProductLogRow(_Row):
+    __slots__ = ()
+    codec = PRODUCT_LOG
+    ts = _text_field(0)
+    op_code = _field(1)
+    pro_id = _text_field(2)
+    pro_name = _text_field(3)
+    pro_cost = _field(4)
+    pro_salePrice = _field(5)
+    pro_amount = _field(6)
+    category = _text_field(7)
+    status = _field(8)
+    user = _text_field(9)
+
+
+class CustomerLogRow(_Row):
+    __slots__ = ()
+    codec = CUSTOMER_LOG
+    ts = _text_field(0)
+    op_code = _field(1)
+    cust_id = _text_field(2)
+    cust_name = _text_field(3)
+    cust_tel = _text_field(4)
+    status = _field(5)
+    user = _text_field(6)
+
+
+# ====== Bulk reading ======
+def iter_rows(data, codec, row_type=None):
+    """Iterate the complete records of a buffer without copying it (trailing partial record is ignored)"""
+    view = memoryview(data)
+    usable = len(view) - len(view) % codec.size
+    rows = codec.iter_unpack(view[:usable])
+    return rows if row_type is None else map(row_type, rows)
+
+
+def read_file(path):
+    """Read a whole data file in one call, b'' if it does not exist"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def read_rows(path, codec, row_type=None):
+    """Iterate all records of a data file (raw tuples, or row_type objects)"""
+    return iter_rows(read_file(path), codec, row_type)
+
+
+def is_deleted(codec, r):
+    """True if a product / customer record is a tombstone"""
+    field, deleted = _STATUS_FIELD[codec]
+    return r[field] == deleted
+
+
+def live_rows(path, codec, row_type=None):
+    """Like read_rows for product.dat / customer.dat, skipping deleted (tombstoned) records"""
+    rows = (r for r in iter_rows(read_file(path), codec) if not is_deleted(codec, r))
+    return rows if row_type is None else map(row_type, rows)
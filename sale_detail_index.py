@@ -0,0 +1,170 @@
+import file_lock
+import index_file
+import journal
+import record_codec
+
+# ====== sale_id index for sale_detail.dat ======
+# sale_detail.idx เก็บ sale_id -> (offset ของบรรทัดแรก, จำนวนบรรทัดที่ติดกัน)
+# การดึงรายการสินค้าของบิลเดียวจึง seek ครั้งเดียวแทนการ scan sale_detail.dat ทั้งไฟล์
+SALE_DETAIL_FILE = "sale_detail.dat"
+SALE_FILE = "sale.dat"   # lock ของ sale.dat คุม sale_detail.dat ด้วย
+SALE_DETAIL_INDEX_FILE = "sale_detail.idx"
+SALE_DETAIL_RECORD_SIZE = record_codec.SALE_DETAIL.size
+
+# entry: sale_id, first offset, count (entry ที่ต่อกันของ sale_id เดียวกันจะถูกรวมตอนโหลด)
+INDEX_ENTRY_STRUCT = "10sqq"
+
+_ranges = {}    # sale_id -> [[first offset, count], ...] เรียงตาม offset
+_loaded_header = None
+
+
+def _add(ranges, sale_id, offset, count):
+    runs = ranges.setdefault(sale_id, [])
+    if runs and runs[-1][0] + runs[-1][1] * SALE_DETAIL_RECORD_SIZE == offset:
+        runs[-1][1] += count
+    else:
+        runs.append([offset, count])
+
+
+def _save():
+    global _loaded_header
+    entries = [(sale_id.encode(), offset, count)
+               for sale_id, runs in _ranges.items() for offset, count in runs]
+    index_file.write_entries(SALE_DETAIL_INDEX_FILE, INDEX_ENTRY_STRUCT, entries, SALE_DETAIL_FILE)
+    _loaded_header = index_file.read_header(SALE_DETAIL_INDEX_FILE)
+
+
+def rebuild():
+    """Scan sale_detail.dat once and write a fresh sale_detail.idx"""
+    global _ranges
+    # shared lock: ไม่มีเครื่องไหนเขียนบิลระหว่าง scan (ผู้เขียนอัปเดต index ภายใต้ exclusive lock ของ sale.dat)
+    with file_lock.shared(SALE_FILE):
+        ranges = {}
+        for i, r in enumerate(record_codec.read_rows(SALE_DETAIL_FILE, record_codec.SALE_DETAIL)):
+            _add(ranges, record_codec.text(r[0]), i * SALE_DETAIL_RECORD_SIZE, 1)
+        _ranges = ranges
+        _save()
+
+
+def _read_index():
+    global _ranges, _loaded_header
+    ranges = {}
+    for raw_id, offset, count in index_file.read_entries(SALE_DETAIL_INDEX_FILE, INDEX_ENTRY_STRUCT):
+        _add(ranges, record_codec.text(raw_id), offset, count)
+    _ranges = ranges
+    _loaded_header = index_file.read_header(SALE_DETAIL_INDEX_FILE)
+
+
+def load():
+    """Make sure the in-memory index matches sale_detail.dat, rebuilding it when stale"""
+    header = index_file.read_header(SALE_DETAIL_INDEX_FILE)
+    if header is None or header != index_file.file_stamp(SALE_DETAIL_FILE):
+        rebuild()
+    elif header != _loaded_header:
+        _read_index()
+
+
+def lookup(sale_id):
+    """Return [(first offset, count)] of the sale_detail lines of one sale"""
+    load()
+    return [tuple(run) for run in _ranges.get(sale_id, [])]
+
+
+def read_lines(sale_id):
+    """Read the sale_detail lines of one sale -> [(offset, raw record tuple)]"""
+    out = []
+    ranges = lookup(sale_id)
+    if not ranges:
+        return out
+    with open(SALE_DETAIL_FILE, "rb") as f:
+        for first, count in ranges:
+            f.seek(first)
+            data = f.read(count * SALE_DETAIL_RECORD_SIZE)
+            for n, r in enumerate(record_codec.iter_rows(data, record_codec.SALE_DETAIL)):
+                out.append((first + n * SALE_DETAIL_RECORD_SIZE, r))
+    return out
+
+
+def replace_lines(sale_id, lines, tx=None):
+    """
+    Replace all sale_detail lines of one sale with packed records, keeping them
+    where the sale's lines were. Same number of lines -> written in place;
+    otherwise only the part of the file from the sale onwards is rewritten
+    and later offsets in the index are shifted.
+    """
+    own = tx is None
+    if own:
+        tx = journal.Transaction()
+    ranges = lookup(sale_id)
+    new = b"".join(lines)
+
+    if len(ranges) == 1 and ranges[0][1] == len(lines):
+        tx.write(SALE_DETAIL_FILE, ranges[0][0], new)
+        tx.after_commit(_save)
+    else:
+        with open(SALE_DETAIL_FILE, "rb") as f:
+            data = f.read()
+        pos = ranges[0][0] if ranges else len(data)
+        pieces = []
+        start = pos
+        for first, count in ranges:
+            pieces.append(data[start:first])
+            if first == pos:
+                pieces.append(new)
+            start = first + count * SALE_DETAIL_RECORD_SIZE
+        pieces.append(data[start:])
+        if not ranges:
+            pieces.append(new)
+        tail = b"".join(pieces)
+        tx.write(SALE_DETAIL_FILE, pos, tail)
+        tx.truncate(SALE_DETAIL_FILE, pos + len(tail))
+
+        def moved(offset):
+            removed = sum(count * SALE_DETAIL_RECORD_SIZE for first, count in ranges if first < offset)
+            return offset - removed + (len(new) if offset > pos else 0)
+
+        def reindex():
+            global _ranges
+            shifted = {}
+            for sid, runs in _ranges.items():
+                if sid == sale_id:
+                    continue
+                for offset, count in runs:
+                    _add(shifted, sid, moved(offset), count)
+            if lines:
+                _add(shifted, sale_id, pos, len(lines))
+            _ranges = shifted
+            _save()
+
+        tx.after_commit(reindex)
+    if own:
+        tx.commit()
+
+
+# ====== Incremental maintenance (เรียกหลังจากเขียน sale_detail.dat แล้ว) ======
+def _sync_before(size_delta):
+    """
+    Bring the in-memory index to the state of sale_detail.idx before a write that
+    changed sale_detail.dat by size_delta bytes. Returns False (after a full rebuild)
+    if the index was already stale, so the caller must not apply its delta again.
+    """
+    header = index_file.read_header(SALE_DETAIL_INDEX_FILE)
+    size = index_file.file_stamp(SALE_DETAIL_FILE)[0]
+    if header is None or header[0] != size - size_delta:
+        rebuild()
+        return False
+    if header != _loaded_header:
+        _read_index()
+    return True
+
+
+def note_appended(sale_id, count=1):
+    """Record count sale_detail lines of one sale appended at the end of sale_detail.dat"""
+    global _loaded_header
+    if not _sync_before(count * SALE_DETAIL_RECORD_SIZE):
+        return
+    offset = index_file.file_stamp(SALE_DETAIL_FILE)[0] - count * SALE_DETAIL_RECORD_SIZE
+    _add(_ranges, sale_id, offset, count)
+    index_file.append_entries(SALE_DETAIL_INDEX_FILE, INDEX_ENTRY_STRUCT,
+                              [(sale_id.encode(), offset, count)], SALE_DETAIL_FILE)
+    _loaded_header = index_file.read_header(SALE_DETAIL_INDEX_FILE)
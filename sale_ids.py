@@ -0,0 +1,71 @@
+import os
+import struct
+import threading
+import file_lock
+import record_codec
+
+# ====== Sale id allocator ======
+# sale_id.seq เก็บเลขถัดไปที่ยังไม่เคยแจก แต่ละ process (เครื่องคิดเงิน) จองเลขไปทีละ BLOCK_SIZE
+# แล้วแจกจาก memory -> การขายปกติไม่ต้องอ่าน sale.dat / ไฟล์ใดๆ เพื่อหา id
+# เลขไม่ถอยหลังแม้บิลท้ายไฟล์ถูกลบ และไม่ซ้ำข้ามเครื่อง (จองภายใต้ file_lock)
+# เลขที่จองแล้วแต่ยังไม่ได้ใช้ตอนปิดโปรแกรมจะถูกข้ามไป (id มีช่องว่างได้ แต่ไม่ซ้ำ)
+SEQ_FILE = "sale_id.seq"
+SALE_FILE = "sale.dat"
+SEQ_STRUCT = struct.Struct("=4sq")
+SEQ_MAGIC = b"RSEQ"
+BLOCK_SIZE = 100
+
+PREFIX = "s"
+MIN_DIGITS = 3                                          # s001 ... s999 แล้วต่อด้วย s1000 ...
+MAX_NUMBER = 10 ** (10 - len(PREFIX)) - 1               # sale_id เป็น field 10 bytes
+
+_next = 0   # block ที่จองไว้: [_next, _end)
+_end = 0
+_lock = threading.Lock()
+
+
+def format_id(number):
+    return PREFIX + str(number).zfill(MIN_DIGITS)
+
+
+def parse_id(sale_id):
+    """Number of a sale id ("s012" -> 12), or None if it is not one of ours"""
+    digits = sale_id[len(PREFIX):]
+    return int(digits) if sale_id.startswith(PREFIX) and digits.isdigit() else None
+
+
+def _scan_max():
+    """Highest sale id number in sale.dat (used once, when sale_id.seq does not exist yet)"""
+    numbers = (parse_id(record_codec.text(r[0])) for r in record_codec.read_rows(SALE_FILE, record_codec.SALE))
+    return max((n for n in numbers if n is not None), default=0)
+
+
+def reserve(count=BLOCK_SIZE):
+    """Take count numbers from sale_id.seq -> the first one (durable before it returns)"""
+    with file_lock.exclusive(SEQ_FILE):
+        fd = os.open(SEQ_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            data = os.pread(fd, SEQ_STRUCT.size, 0)
+            if len(data) == SEQ_STRUCT.size and data[:4] == SEQ_MAGIC:
+                first = SEQ_STRUCT.unpack(data)[1]
+            else:
+                first = _scan_max() + 1
+            if first + count - 1 > MAX_NUMBER:
+                raise OverflowError(f"sale id numbers are used up (max {format_id(MAX_NUMBER)})")
+            os.pwrite(fd, SEQ_STRUCT.pack(SEQ_MAGIC, first + count), 0)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return first
+
+
+def next_id():
+    """Next unique sale id ("s013") from this process's block"""
+    global _next, _end
+    with _lock:
+        if _next >= _end:
+            _next = reserve(BLOCK_SIZE)
+            _end = _next + BLOCK_SIZE
+        number = _next
+        _next += 1
+    return format_id(number)
@@ -0,0 +1,190 @@
+import bisect
+import date_codec
+import file_lock
+import index_file
+import journal
+import record_codec
+
+# ====== Date index for sale.dat ======
+# sale_date.idx เก็บช่วงของ record ที่มีวันที่เดียวกัน (เลขวัน, first offset, count) เรียงตามวันที่
+# รายงาน/แก้ไขของวันเดียวจึงอ่านแค่ช่วงของวันนั้น ไม่ต้อง scan sale.dat ทั้งไฟล์
+SALE_FILE = "sale.dat"
+SALE_DATE_INDEX_FILE = "sale_date.idx"
+SALE_RECORD_SIZE = record_codec.SALE.size
+
+# entry: เลขวัน (date_codec.day_number), offset ของ record แรกในช่วง, จำนวน record ที่ติดกัน
+INDEX_ENTRY_STRUCT = "=iqq"
+INDEX_MAGIC = b"RDAY"  # format เดิมเก็บวันที่เป็นข้อความ 10 bytes -> ไฟล์เก่าจะถูก rebuild อัตโนมัติ
+
+_ranges = []    # [(day number, first offset, count)] เรียงตาม (day number, offset)
+_loaded_header = None
+
+
+def parse_sale_date(s):
+    """แปลง string วันที่ของ sale เป็น date object (รองรับหลายรูปแบบและปี พ.ศ.) หรือ None"""
+    return date_codec.parse_date(s)
+
+
+def date_key(sale_date):
+    """Index key of a sale date: its day number (date_codec.UNKNOWN_DAY if it cannot be parsed)"""
+    return date_codec.day_number(sale_date)
+
+
+def _save():
+    global _loaded_header
+    index_file.write_entries(SALE_DATE_INDEX_FILE, INDEX_ENTRY_STRUCT, _ranges, SALE_FILE, INDEX_MAGIC)
+    _loaded_header = index_file.read_header(SALE_DATE_INDEX_FILE, INDEX_MAGIC)
+
+
+def rebuild():
+    """Scan sale.dat once and write a fresh sale_date.idx"""
+    global _ranges
+    # shared lock: ไม่มีเครื่องไหนเพิ่ม/แก้บิลระหว่าง scan (ผู้เขียนอัปเดต index ภายใต้ exclusive lock ของ sale.dat)
+    with file_lock.shared(SALE_FILE):
+        ranges = []
+        for i, r in enumerate(record_codec.read_rows(SALE_FILE, record_codec.SALE)):
+            key = date_key(r[2])  # date_codec cache ตาม field ดิบ จึง parse ครั้งเดียวต่อค่าที่ไม่ซ้ำกัน
+            offset = i * SALE_RECORD_SIZE
+            if ranges and ranges[-1][0] == key and ranges[-1][1] + ranges[-1][2] * SALE_RECORD_SIZE == offset:
+                ranges[-1][2] += 1
+            else:
+                ranges.append([key, offset, 1])
+        _ranges = sorted(tuple(r) for r in ranges)
+        _save()
+
+
+def _read_index():
+    global _ranges, _loaded_header
+    _ranges = index_file.read_entries(SALE_DATE_INDEX_FILE, INDEX_ENTRY_STRUCT, magic=INDEX_MAGIC)
+    _loaded_header = index_file.read_header(SALE_DATE_INDEX_FILE, INDEX_MAGIC)
+
+
+def load():
+    """Make sure the in-memory ranges match sale.dat, rebuilding them when stale"""
+    header = index_file.read_header(SALE_DATE_INDEX_FILE, INDEX_MAGIC)
+    if header is None or header != index_file.file_stamp(SALE_FILE):
+        rebuild()
+    elif header != _loaded_header:
+        _read_index()
+
+
+def lookup(sale_date):
+    """Return [(first offset, count)] of the records of one day, in file order"""
+    load()
+    key = date_key(sale_date)
+    i = bisect.bisect_left(_ranges, (key,))
+    out = []
+    while i < len(_ranges) and _ranges[i][0] == key:
+        out.append(_ranges[i][1:])
+        i += 1
+    return out
+
+
+def read_day(sale_date):
+    """Read only the sales of one day -> [(offset, raw record tuple)]"""
+    out = []
+    # shared lock: ไม่อ่านระหว่างที่เครื่องอื่นกำลังเพิ่ม/ลบบิล (offset ใน index จะไม่ตรง)
+    with file_lock.shared(SALE_FILE):
+        ranges = lookup(sale_date)
+        if not ranges:
+            return out
+        with open(SALE_FILE, "rb") as f:
+            for first, count in ranges:
+                f.seek(first)
+                data = f.read(count * SALE_RECORD_SIZE)
+                for n, r in enumerate(record_codec.iter_rows(data, record_codec.SALE)):
+                    out.append((first + n * SALE_RECORD_SIZE, r))
+    return out
+
+
+def _read_at(offset, size):
+    with open(SALE_FILE, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def write_sale(offset, data, tx=None):
+    """Overwrite one packed sale record in place and keep the date index in step"""
+    own = tx is None
+    if own:
+        tx = journal.Transaction()
+    old_date = record_codec.SALE.unpack(_read_at(offset, SALE_RECORD_SIZE))[2]
+    new_date = record_codec.SALE.unpack(data)[2]
+    tx.write(SALE_FILE, offset, data)
+    tx.after_commit(lambda: note_moved(offset, old_date, new_date))
+    if own:
+        tx.commit()
+
+
+# ====== Incremental maintenance (เรียกหลังจากเขียน sale.dat แล้ว) ======
+def _sync_before(size_delta):
+    """
+    Bring the in-memory ranges to the state of sale_date.idx before a write that
+    changed sale.dat by size_delta bytes. Returns False (after a full rebuild)
+    if the index was already stale, so the caller must not apply its delta again.
+    """
+    header = index_file.read_header(SALE_DATE_INDEX_FILE, INDEX_MAGIC)
+    size = index_file.file_stamp(SALE_FILE)[0]
+    if header is None or header[0] != size - size_delta:
+        rebuild()
+        return False
+    if header != _loaded_header:
+        _read_index()
+    return True
+
+
+def _insert(key, offset):
+    """Add one record to the ranges, merging it with a neighbouring range of the same day"""
+    i = bisect.bisect_left(_ranges, (key, offset))
+    if i > 0:
+        k, first, count = _ranges[i - 1]
+        if k == key and first + count * SALE_RECORD_SIZE == offset:
+            _ranges[i - 1] = (k, first, count + 1)
+            if i < len(_ranges) and _ranges[i][0] == key and _ranges[i][1] == offset + SALE_RECORD_SIZE:
+                _ranges[i - 1] = (k, first, count + 1 + _ranges[i][2])
+                del _ranges[i]
+            return
+    if i < len(_ranges) and _ranges[i][0] == key and _ranges[i][1] == offset + SALE_RECORD_SIZE:
+        _ranges[i] = (key, offset, _ranges[i][2] + 1)
+        return
+    _ranges.insert(i, (key, offset, 1))
+
+
+def _remove(key, offset):
+    """Take one record out of the range that holds it (splitting the range if needed)"""
+    i = bisect.bisect_right(_ranges, (key, offset, float("inf"))) - 1
+    if i < 0:
+        return False
+    k, first, count = _ranges[i]
+    end = first + count * SALE_RECORD_SIZE
+    if k != key or not first <= offset < end:
+        return False
+    parts = []
+    if offset > first:
+        parts.append((key, first, (offset - first) // SALE_RECORD_SIZE))
+    if offset + SALE_RECORD_SIZE < end:
+        parts.append((key, offset + SALE_RECORD_SIZE, (end - offset) // SALE_RECORD_SIZE - 1))
+    _ranges[i:i + 1] = parts
+    return True
+
+
+def note_appended(sale_date):
+    """Record a sale appended at the end of sale.dat"""
+    if not _sync_before(SALE_RECORD_SIZE):
+        return
+    offset = index_file.file_stamp(SALE_FILE)[0] - SALE_RECORD_SIZE
+    _insert(date_key(sale_date), offset)
+    _save()
+
+
+def note_moved(offset, old_date, new_date):
+    """Record a sale rewritten in place (its sale_date may have changed)"""
+    if not _sync_before(0):
+        return
+    old_key, new_key = date_key(old_date), date_key(new_date)
+    if old_key != new_key:
+        if not _remove(old_key, offset):
+            rebuild()
+            return
+        _insert(new_key, offset)
+    _save()
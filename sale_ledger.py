@@ -0,0 +1,127 @@
+from datetime import datetime
+import index_file
+import record_codec
+
+# ====== Sale adjustments ledger ======
+# ยกเลิกบิล (void) และคืนสินค้าบางรายการ (return) ไม่แก้ sale.dat / sale_detail.dat อีกต่อไป
+# แต่ต่อท้าย record หนึ่งตัวใน sale_adjust.dat ที่อ้าง sale_id ของบิลเดิม (append-only จึงมีประวัติครบ)
+# ทุกที่ที่อ่านบิล (storage แบบ file, daily_totals, รายงาน) หักลบ record เหล่านี้ตอนอ่านผ่าน net_sale / net_lines
+# engine memory / sqlite เก็บ record แบบเดียวกันในที่ของตัวเอง และหักลบด้วย apply_sale / apply_lines ชุดเดียวกัน
+ADJUST_FILE = "sale_adjust.dat"
+ADJUST_RECORD_SIZE = record_codec.SALE_ADJUST.size
+VOID = 1      # ยกเลิกทั้งบิล (sale_price / discount = ยอดสุทธิ / ส่วนลดของบิลตอนยกเลิก)
+RETURN = 2    # คืน pro_id จำนวน amount (sale_price / discount = ส่วนที่หักออกจากบิล)
+
+_cache = None         # sale_id -> [adjustment record] ตามลำดับที่บันทึก
+_cache_stamp = None
+
+
+def _key(raw):
+    return record_codec.text(raw).strip()
+
+
+def adjustments():
+    """{sale_id: [adjustment records]}, re-read only when sale_adjust.dat changed"""
+    global _cache, _cache_stamp
+    # ไฟล์ต่อท้ายอย่างเดียว ทุกการบันทึกทำให้ขนาดเปลี่ยน -> stamp ใช้ตรวจได้เสมอ
+    stamp = index_file.file_stamp(ADJUST_FILE)
+    if _cache is None or stamp != _cache_stamp:
+        by_sale = {}
+        for r in record_codec.read_rows(ADJUST_FILE, record_codec.SALE_ADJUST):
+            by_sale.setdefault(_key(r[0]), []).append(r)
+        _cache, _cache_stamp = by_sale, stamp
+    return _cache
+
+
+def count():
+    """Number of records in sale_adjust.dat"""
+    return index_file.file_stamp(ADJUST_FILE)[0] // ADJUST_RECORD_SIZE
+
+
+def dates_after(n):
+    """Raw sale_date of every adjustment recorded after the first n"""
+    data = record_codec.read_file(ADJUST_FILE)[n * ADJUST_RECORD_SIZE:]
+    return {r[1] for r in record_codec.iter_rows(data, record_codec.SALE_ADJUST)}
+
+
+def is_void(sale_id):
+    return any(r[6] == VOID for r in adjustments().get(sale_id, ()))
+
+
+def item_amount(lines, pro_id):
+    """Units of pro_id on the lines of one bill (a product may sit on more than one line)"""
+    return sum(r[2] for r in lines if _key(r[1]) == pro_id)
+
+
+def remove_item(lines, pro_id, amount):
+    """
+    Take amount of pro_id off the lines of one bill, line by line until it is used up
+    (price and discount shrink in proportion, a line that reaches 0 is dropped)
+    -> (kept lines, returned [(pro_id, amount taken)])
+    """
+    kept, left = [], amount
+    for r in lines:
+        if left <= 0 or _key(r[1]) != pro_id:
+            kept.append(tuple(r))
+            continue
+        taken = min(left, r[2])
+        left -= taken
+        if taken < r[2]:
+            ratio = (r[2] - taken) / r[2]
+            kept.append((r[0], r[1], r[2] - taken, r[3] * ratio, r[4] * ratio))
+    taken = amount - left
+    return kept, [(pro_id, taken)] if taken else []
+
+
+def apply_lines(lines, adjusted):
+    """sale_detail lines of a bill with the returns among its adjustments taken off (in the order recorded)"""
+    for r in adjusted:
+        if r[6] == RETURN:
+            lines = remove_item(lines, _key(r[2]), r[3])[0]
+    return lines
+
+
+def apply_amounts(net_price, total_discount, adjusted):
+    """(net_price, total_discount) of a bill after its adjustments, or None if it was voided"""
+    if not adjusted:
+        return net_price, total_discount
+    if any(r[6] == VOID for r in adjusted):
+        return None
+    # RETURN เก็บราคาเต็มและส่วนลดที่หักออกจากบิล และยอดสุทธิ = ราคา - ส่วนลด (เหมือนตอนขาย)
+    returns = [r for r in adjusted if r[6] == RETURN]
+    return net_price - sum(r[4] - r[5] for r in returns), total_discount - sum(r[5] for r in returns)
+
+
+def apply_sale(r, adjusted):
+    """A sale record after its adjustments, or None if the bill was voided"""
+    if not adjusted:
+        return r
+    amounts = apply_amounts(r[3], r[4], adjusted)
+    return None if amounts is None else (r[0], r[1], r[2], amounts[0], amounts[1], r[5])
+
+
+def net_lines(sale_id, lines):
+    """sale_detail lines of a bill with its returns in sale_adjust.dat taken off"""
+    return apply_lines(lines, adjustments().get(sale_id, ()))
+
+
+def net_sale(r):
+    """A sale.dat record after its adjustments, or None if the bill was voided"""
+    return apply_sale(r, adjustments().get(_key(r[0])))
+
+
+def record(kind, sale_id, sale_date, pro_id="", amount=0, sale_price=0.0, discount=0.0):
+    """One adjustment record (SALE_ADJUST fields) stamped with the current time"""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return (sale_id.encode(), record_codec.fixed(sale_date, 10), pro_id.encode(),
+            amount, sale_price, discount, kind, ts.encode())
+
+
+def pack(kind, sale_id, sale_date, pro_id="", amount=0, sale_price=0.0, discount=0.0):
+    """One packed adjustment record stamped with the current time"""
+    return record_codec.SALE_ADJUST.pack(*record(kind, sale_id, sale_date, pro_id, amount, sale_price, discount))
+
+
+def append(data, tx):
+    """Record packed adjustments as part of a journal transaction (the caller holds the sale.dat lock)"""
+    tx.append(ADJUST_FILE, data)
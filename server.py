@@ -0,0 +1,365 @@
+import asyncio
+import functools
+import json
+import math
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+import compaction
+import journal
+import log_writer
+import service
+
+# ====== HTTP/JSON server for several checkout tills ======
+# ทุกเครื่องคิดเงินเรียก server ตัวเดียวที่ถือข้อมูลร้าน (product.dat / sale.dat / customer.dat ...)
+# - คำสั่งที่แก้ไฟล์ (POST / PATCH / DELETE) ถูกส่งเข้า queue ของ writer task ตัวเดียว จึงทำทีละคำสั่งตามลำดับ
+#   (เช่นสองเครื่องขายสินค้าชิ้นสุดท้ายพร้อมกัน -> เครื่องที่สองได้ "Stock not enough")
+#   writer task รันคำสั่งใน thread ของตัวเอง (_write_pool) event loop จึงไม่หยุดรอการเขียน
+# - คำขออ่าน (GET) รันใน thread pool (read) พร้อมกันได้หลายคำขอ ไม่ต้องรอคิวของ writer
+#   และรายงานที่ช้าไม่ทำให้เครื่องอื่นค้าง (file_lock กันไม่ให้อ่านระหว่างที่ writer เขียนไฟล์เดียวกันอยู่)
+# - ทุก COMPACT_SECONDS ส่ง compaction ของ product.dat / customer.dat เข้า queue เดียวกัน (ไม่ชนกับการเขียน)
+# ใช้ stdlib อย่างเดียว (asyncio.start_server + HTTP/1.1 แบบย่อ) รัน: python server.py [port]
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BODY = 1 << 20
+COMPACT_SECONDS = 600
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+ROUTES = []      # [(method, compiled path pattern, handler)]
+_writes = None   # asyncio.Queue ของ (fn, args, kwargs, future) ที่รอ writer task
+_write_pool = None  # thread เดียวที่ writer task ใช้รันคำสั่งเขียน
+_writer_task = None
+_compact_task = None
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def route(method, path):
+    """Register an async handler(params, query, data) for METHOD /path/{param}"""
+    pattern = re.compile(re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path))
+
+    def register(handler):
+        ROUTES.append((method, pattern, handler))
+        return handler
+    return register
+
+
+# ====== Single writer ======
+async def _writer():
+    loop = asyncio.get_running_loop()
+    while True:
+        fn, args, kwargs, future = await _writes.get()
+        try:
+            result = await loop.run_in_executor(_write_pool, functools.partial(fn, *args, **kwargs))
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+        finally:
+            _writes.task_done()
+
+
+async def submit(fn, *args, **kwargs):
+    """Run a mutating service call on the writer task and wait for its result"""
+    future = asyncio.get_running_loop().create_future()
+    await _writes.put((fn, args, kwargs, future))
+    return await future
+
+
+async def read(fn, *args, **kwargs):
+    """Run a read-only service call on the thread pool (concurrently with other reads)"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+async def _compactor():
+    """Background job: compact the data files (only when enough records are deleted)"""
+    while True:
+        await asyncio.sleep(COMPACT_SECONDS)
+        try:
+            await submit(compaction.run)
+        except Exception as e:
+            print("⚠️ compaction failed:", e)
+
+
+# ====== Request helpers ======
+def _field(data, key, kind=str, default=None, required=True):
+    value = data.get(key, default)
+    if value is None:
+        if required:
+            raise HTTPError(400, f"{key} is required")
+        return None
+    if kind in (int, float) and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise HTTPError(400, f"{key} must be a number")
+    # json.loads รับ NaN / Infinity ได้ ต้องปฏิเสธก่อนแปลง (int(inf) -> OverflowError = 500)
+    if isinstance(value, float) and not math.isfinite(value):
+        raise HTTPError(400, f"{key} must be a finite number")
+    if kind is int and value != int(value):
+        raise HTTPError(400, f"{key} must be an integer")
+    if kind is str and not isinstance(value, str):
+        raise HTTPError(400, f"{key} must be a string")
+    return kind(value)
+
+
+def _items(data, required=True):
+    """Body "items": [{"pro_id", "amount", "discount"}] -> [(pro_id, amount, discount)]"""
+    items = data.get("items")
+    if items is None and not required:
+        return None
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        raise HTTPError(400, "items must be a list of {pro_id, amount, discount}")
+    return [(_field(i, "pro_id"), _field(i, "amount", int), _field(i, "discount", float, 0)) for i in items]
+
+
+def _date_param(query):
+    return query.get("date")  # None = วันนี้
+
+
+def _required_date(query):
+    sale_date = _date_param(query)
+    if sale_date is None:
+        raise HTTPError(400, "date is required (?date=YYYY-MM-DD)")
+    return sale_date
+
+
+# ====== Products ======
+@route("GET", "/products")
+async def get_products(params, query, data):
+    return 200, await read(service.list_products)
+
+
+@route("GET", "/products/{pro_id}")
+async def get_product(params, query, data):
+    return 200, await read(service.get_product, params["pro_id"])
+
+
+@route("POST", "/products")
+async def post_product(params, query, data):
+    product = await submit(
+        service.add_product,
+        _field(data, "Pro_id"), _field(data, "Pro_name"),
+        _field(data, "Pro_cost", float), _field(data, "Pro_salePrice", float),
+        _field(data, "Pro_amount", int), _field(data, "Category"),
+        _field(data, "Pro_status", int, 1), _field(data, "User", str, "Admin"))
+    return 201, product
+
+
+@route("PATCH", "/products/{pro_id}")
+async def patch_product(params, query, data):
+    product = await submit(
+        service.update_product, params["pro_id"], _field(data, "User"),
+        _field(data, "Pro_name", required=False), _field(data, "Pro_cost", float, required=False),
+        _field(data, "Pro_salePrice", float, required=False), _field(data, "Pro_amount", int, required=False),
+        _field(data, "Category", required=False), _field(data, "Pro_status", int, required=False))
+    return 200, product
+
+
+@route("DELETE", "/products/{pro_id}")
+async def delete_product(params, query, data):
+    return 200, await submit(service.delete_product, params["pro_id"], _field(data, "User", str, "Admin"))
+
+
+# ====== Customers ======
+@route("GET", "/customers")
+async def get_customers(params, query, data):
+    return 200, await read(service.list_customers)
+
+
+@route("GET", "/customers/{cust_id}")
+async def get_customer(params, query, data):
+    return 200, await read(service.get_customer, params["cust_id"])
+
+
+@route("POST", "/customers")
+async def post_customer(params, query, data):
+    customer = await submit(
+        service.add_customer,
+        _field(data, "Cust_id"), _field(data, "Cust_name"), _field(data, "Cust_tel"),
+        _field(data, "Cust_status", int, 1), _field(data, "User", str, "admin"))
+    return 201, customer
+
+
+@route("PATCH", "/customers/{cust_id}")
+async def patch_customer(params, query, data):
+    customer = await submit(
+        service.update_customer, params["cust_id"], _field(data, "User"),
+        _field(data, "Cust_name", required=False), _field(data, "Cust_tel", required=False),
+        _field(data, "Cust_status", int, required=False))
+    return 200, customer
+
+
+# ====== Sales / reports ======
+@route("GET", "/sales")
+async def get_sales(params, query, data):
+    return 200, await read(service.sales_of_day, _date_param(query))
+
+
+@route("POST", "/sales")
+async def post_sale(params, query, data):
+    """Body: {"cust_id" or "cust_name", "items": [{"pro_id", "amount", "discount"}]}"""
+    cust_id = _field(data, "cust_id", required=False)
+    if cust_id is None:
+        cust_id = await read(service.find_customer, _field(data, "cust_name"))
+        if cust_id is None:
+            raise HTTPError(400, "Customer not found")
+    return 201, await submit(service.create_sale, cust_id, _items(data))
+
+
+@route("PATCH", "/sales/{sale_id}")
+async def patch_sale(params, query, data):
+    """Edit a bill: ?date=YYYY-MM-DD, body {"cust_id", "sale_date", "status", "items"} (all optional)"""
+    sale = await submit(
+        service.update_sale, params["sale_id"], _required_date(query),
+        _field(data, "cust_id", required=False), _field(data, "sale_date", required=False),
+        _field(data, "status", int, required=False), _items(data, required=False))
+    return 200, sale
+
+
+@route("DELETE", "/sales/{sale_id}")
+async def delete_sale(params, query, data):
+    returned = await submit(service.void_sale, params["sale_id"], _required_date(query))
+    return 200, {"sale_id": params["sale_id"], "returned_stock": returned}
+
+
+@route("DELETE", "/sales/{sale_id}/{pro_id}")
+async def delete_sale_item(params, query, data):
+    """Return part of a bill: ?date=YYYY-MM-DD, body {"amount"}"""
+    amount = _field(data, "amount", int)
+    if amount <= 0:
+        raise HTTPError(400, "amount must be greater than 0")
+    removed = await submit(service.remove_sale_item, params["sale_id"], _required_date(query),
+                           params["pro_id"], amount)
+    if not removed:
+        raise HTTPError(400, f"Sale {params['sale_id']} does not have {amount} of {params['pro_id']}")
+    return 200, {"sale_id": params["sale_id"], "pro_id": params["pro_id"], "returned": amount}
+
+
+@route("GET", "/reports/daily")
+async def get_daily_report(params, query, data):
+    return 200, await read(service.daily_summary, _date_param(query))
+
+
+# ====== HTTP ======
+async def dispatch(method, target, body):
+    """Route one request -> (status, JSON-able payload)"""
+    url = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    path = url.path.rstrip("/") or "/"
+    try:
+        allowed = False
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "Body is not valid JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+            params = {k: unquote(v) for k, v in match.groupdict().items()}
+            return await handler(params, query, data)
+        if allowed:
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        raise HTTPError(404, f"No route for {path}")
+    except HTTPError as e:
+        return e.status, {"error": str(e)}
+    except service.NotFound as e:
+        return 404, {"error": str(e)}
+    except service.ServiceError as e:
+        return 400, {"error": str(e)}
+    except Exception as e:
+        print(f"❌ Unexpected error in {method} {path}: {e}")
+        return 500, {"error": "Internal server error"}
+
+
+async def _respond(writer, status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def handle(reader, writer):
+    """Serve the requests of one connection (keep-alive until the client closes)"""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3:
+                await _respond(writer, 400, {"error": "Bad request line"}, False)
+                break
+            method, target, version = parts
+            headers = {}
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY:
+                await _respond(writer, 413 if length > MAX_BODY else 400, {"error": "Bad Content-Length"}, False)
+                break
+            body = await reader.readexactly(length) if length else b""
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            status, payload = await dispatch(method.upper(), target, body)
+            await _respond(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start(host=HOST, port=PORT):
+    """Start the writer task and the listening socket -> asyncio Server (port 0 = any free port)"""
+    global _writes, _write_pool, _writer_task, _compact_task
+    _writes = asyncio.Queue()
+    _write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+    _writer_task = asyncio.create_task(_writer())
+    _compact_task = asyncio.create_task(_compactor())
+    return await asyncio.start_server(handle, host, port)
+
+
+async def serve(host=HOST, port=PORT):
+    server = await start(host, port)
+    print(f"🛒 Retail shop server on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        _compact_task.cancel()
+        _writer_task.cancel()
+        _write_pool.shutdown()
+
+
+if __name__ == "__main__":
+    # ทำ transaction ที่ค้างจากการปิดโปรแกรมกลางคันให้เสร็จก่อนรับคำสั่ง
+    journal.recover()
+    try:
+        asyncio.run(serve(HOST, int(sys.argv[1]) if len(sys.argv) > 1 else PORT))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        log_writer.shutdown()
@@ -0,0 +1,110 @@
+import asyncio
+import http.client
+import json
+import sys
+import threading
+from datetime import date
+import server
+import storage
+
+# ====== Local client for server.py ======
+# request() คือ client แบบง่ายที่สคริปต์ของเครื่องคิดเงินเรียก server ได้ (stdlib http.client)
+# รัน python server_client.py -> เปิด server บน port ว่างใน thread เบื้องหลัง แล้วเรียกทุก route หนึ่งรอบ
+# (ใช้ข้อมูลสำเนาใน memory engine จาก product/customer ของร้าน ไฟล์ .dat จริงจึงไม่ถูกแก้)
+CHECK_PRODUCT = "ZZ-CHECK"
+CHECK_CUSTOMER = "ZZCHECK"
+
+
+def request(method, path, body=None, host=server.HOST, port=server.PORT):
+    """Send one request to the server -> (status, decoded JSON payload)"""
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        conn.close()
+
+
+def start_background(host=server.HOST, port=0):
+    """Start server.py in a daemon thread -> the port it listens on (port 0 = any free port)"""
+    started = threading.Event()
+    bound = {}
+
+    async def run():
+        srv = await server.start(host, port)
+        bound["port"] = srv.sockets[0].getsockname()[1]
+        started.set()
+        async with srv:
+            await srv.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(run(),), name="server", daemon=True).start()
+    if not started.wait(10):
+        raise RuntimeError("server did not start")
+    return bound["port"]
+
+
+def self_check(port, host=server.HOST):
+    """Call every route once and compare the status codes -> number of failed checks"""
+    failed = 0
+    today = date.today().isoformat()
+
+    def check(method, path, body=None, expect=200):
+        nonlocal failed
+        status, payload = request(method, path, body, host, port)
+        if status != expect:
+            failed += 1
+        print(f"{'✅' if status == expect else '❌'} {method} {path} -> {status} (expected {expect})")
+        return payload
+
+    check("GET", "/products")
+    check("POST", "/products", {"Pro_id": CHECK_PRODUCT, "Pro_name": "Check item", "Pro_cost": 10,
+                                "Pro_salePrice": 20, "Pro_amount": 5, "Category": "SMG"}, 201)
+    check("POST", "/products", {"Pro_id": CHECK_PRODUCT}, 400)
+    check("PATCH", f"/products/{CHECK_PRODUCT}", {"User": "check", "Pro_cost": float("nan")}, 400)
+    check("GET", f"/products/{CHECK_PRODUCT}")
+    check("PATCH", f"/products/{CHECK_PRODUCT}", {"User": "check", "Pro_salePrice": 25})
+    check("GET", "/customers")
+    check("POST", "/customers", {"Cust_id": CHECK_CUSTOMER, "Cust_name": "check till", "Cust_tel": "0800000000"}, 201)
+    check("GET", f"/customers/{CHECK_CUSTOMER}")
+    check("PATCH", f"/customers/{CHECK_CUSTOMER}", {"User": "check", "Cust_tel": "0811111111"})
+    sale = check("POST", "/sales", {"cust_id": CHECK_CUSTOMER,
+                                    "items": [{"pro_id": CHECK_PRODUCT, "amount": 3, "discount": 0}]}, 201)
+    sale_id = sale["sale_id"] if isinstance(sale, dict) and "sale_id" in sale else "none"
+    check("POST", "/sales", {"cust_id": CHECK_CUSTOMER,
+                             "items": [{"pro_id": CHECK_PRODUCT, "amount": 99, "discount": 0}]}, 400)
+    check("GET", f"/sales?date={today}")
+    check("PATCH", f"/sales/{sale_id}?date={today}",
+          {"items": [{"pro_id": CHECK_PRODUCT, "amount": 2, "discount": 0}]})
+    check("PATCH", f"/sales/{sale_id}?date={today}", {"status": 7}, 400)
+    check("GET", f"/reports/daily?date={today}")
+    check("DELETE", f"/sales/{sale_id}/{CHECK_PRODUCT}?date={today}", {"amount": 1})
+    check("DELETE", f"/sales/{sale_id}/{CHECK_PRODUCT}?date={today}", {"amount": 9}, 400)
+    check("DELETE", f"/sales/{sale_id}?date={today}")
+    check("DELETE", f"/sales/{sale_id}?date={today}", expect=404)
+    check("DELETE", f"/sales/{sale_id}", expect=400)
+    check("DELETE", f"/products/{CHECK_PRODUCT}", {"User": "check"})
+    check("GET", f"/products/{CHECK_PRODUCT}", expect=404)
+    check("GET", "/nope", expect=404)
+    check("PUT", "/products", expect=405)
+    return failed
+
+
+def main(argv):
+    # สำเนาใน memory: route ที่เขียนข้อมูลไม่แตะไฟล์ของร้าน
+    shop = storage.get()
+    copy = storage.MemoryStorage()
+    copy.add_products(list(shop.products().values()))
+    copy.add_customers(shop.customers())
+    storage.use(copy)
+    port = start_background()
+    print(f"🛒 server on http://{server.HOST}:{port} (memory copy of the shop data)")
+    failed = self_check(port)
+    print("✅ all routes ok" if not failed else f"❌ {failed} check(s) failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,411 @@
+from datetime import date, datetime
+import record_codec
+import date_codec
+import storage
+
+# ====== Service layer ======
+# ฟังก์ชันในนี้รับค่าเป็น argument และคืนผลลัพธ์ (ไม่มี input()/print())
+# เมนู CLI เป็นแค่ตัวรับค่าแล้วเรียกฟังก์ชันเหล่านี้ สคริปต์หรือ server ก็เรียกได้โดยตรง
+# ข้อมูลไม่ถูกต้อง -> raise ServiceError พร้อมข้อความที่แสดงให้ผู้ใช้ได้เลย
+# ข้อมูลทั้งหมดอ่าน/เขียนผ่าน storage.get() (ไฟล์ .dat, SQLite หรือ memory ตาม storage.ENGINE)
+# engine เป็นผู้ดูแลการเขียนพร้อมกันหลายเครื่องคิดเงิน (file lock / transaction ของ SQLite)
+SALE_FILE = "sale.dat"
+SALE_DETAIL_FILE = "sale_detail.dat"
+CUSTOMER_FILE = "customer.dat"
+PRODUCT_LOG_FILE = "product_change.bin"
+CUSTOMER_LOG_FILE = "customer_change.bin"
+
+PRODUCT_CATEGORIES = ["Pistol", "Shotgun", "Rifle", "SMG"]
+PRODUCT_MAX_LENGTHS = {"Pro_id": 13, "Pro_name": 20, "Category": 12, "User": 20}
+CUSTOMER_MAX_LENGTHS = {"Cust_id": 10, "Cust_name": 50, "Cust_tel": 10, "User": 20}
+PRODUCT_STATUSES = (1, 2)
+CUSTOMER_STATUSES = (0, 1)
+
+OP_ADD, OP_UPDATE, OP_DELETE, OP_VIEW = 1, 2, 3, 4
+
+# engine ปฏิเสธการเขียน (เช่น stock ไม่พอตอน commit) ด้วย error ตัวเดียวกัน
+ServiceError = storage.StorageError
+
+
+class NotFound(ServiceError):
+    """The sale / product / customer asked for does not exist"""
+
+
+def _check_text(label, value, max_len):
+    value = str(value).strip()
+    if not value:
+        raise ServiceError(f"{label} is required")
+    if len(value.encode("utf-8")) > max_len:
+        raise ServiceError(f"{label} is longer than {max_len} bytes")
+    return value
+
+
+def _log(path, codec, op_code, record, user):
+    _log_many(path, codec, op_code, [record], user)
+
+
+def _log_many(path, codec, op_code, records, user):
+    """Write one log record per data record as a single change-log append"""
+    ts = record_codec.fixed(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 19)
+    user = record_codec.fixed(user, 20)
+    storage.get().append_log(path, b"".join(codec.pack(ts, op_code, *record, user) for record in records))
+
+
+# ====== Sales ======
+def find_customer(cust_name):
+    """Cust_id of a customer name, or None"""
+    return storage.get().find_customer(cust_name.lower())
+
+
+def quote_line(products, pro_id, amount):
+    """Price of amount x pro_id against a product snapshot (raises if it cannot be sold)"""
+    if pro_id not in products:
+        raise ServiceError(f"Product {pro_id} not found")
+    if not isinstance(amount, int) or amount <= 0:
+        raise ServiceError("Amount must be greater than 0.")
+    record = products[pro_id]
+    if amount > record[4]:
+        raise ServiceError(f"Stock not enough! Available: {record[4]}")
+    return record[3] * float(amount)
+
+
+def reserve_line(cart, products, pro_id, amount, discount):
+    """Add one line to a cart and take its stock from the snapshot (nothing is written yet)"""
+    sale_price = quote_line(products, pro_id, amount)
+    if not 0 <= discount <= sale_price:
+        raise ServiceError("Discount must be between 0 and sale price.")
+    record = products[pro_id]
+    record[4] -= amount
+    if record[4] == 0:
+        record[6] = 2
+    line = {"pro_id": pro_id, "amount": amount, "sale_price": sale_price, "discount": float(discount)}
+    cart.append(line)
+    return line
+
+
+def commit_cart(cust_id, cart, products=None, sale_date=None, status=0):
+    """
+    Save a whole basket as one transaction: the sale header, every sale_detail line
+    and the stock of every product in it. Stock is checked again by the engine at
+    commit, so two tills cannot sell the same unit. Returns the saved sale as a dict.
+    """
+    if not cart:
+        raise ServiceError("Cart is empty, sale not saved.")
+    sale_date = sale_date or str(date.today())
+    total_price = sum(d["sale_price"] for d in cart)
+    total_discount = sum(d["discount"] for d in cart)
+    net_price = total_price - total_discount
+    lines = [(d["pro_id"], d["amount"], d["sale_price"], d["discount"]) for d in cart]
+    sale_id, saved = storage.get().commit_sale(cust_id, sale_date, lines, status)
+    if products is not None:
+        products.update(saved)
+    return {"sale_id": sale_id, "cust_id": cust_id, "sale_date": sale_date,
+            "net_price": net_price, "total_discount": total_discount,
+            "status": status, "lines": list(cart)}
+
+
+def create_sale(cust_id, items, sale_date=None):
+    """
+    Sell items [(pro_id, amount, discount), ...] to a customer in one bill.
+    Every line is checked against the current stock before anything is written.
+    """
+    if storage.get().get_customer(cust_id) is None:
+        raise ServiceError(f"Customer {cust_id} not found")
+    products = storage.get().products()
+    cart = []
+    for pro_id, amount, discount in items:
+        reserve_line(cart, products, pro_id, amount, discount)
+    return commit_cart(cust_id, cart, products, sale_date)
+
+
+def void_sale(sale_id, sale_date):
+    """Void a whole bill and put its stock back -> {pro_id: new stock amount}"""
+    returned = storage.get().void_sale(sale_id, sale_date)
+    if returned is None:
+        raise NotFound(f"Sale {sale_id} not found on {sale_date}")
+    return returned
+
+
+def remove_sale_item(sale_id, sale_date, pro_id, amount):
+    """
+    Take amount of one product off a bill and put it back in stock.
+    Returns False if the bill no longer has that much of it (another till changed it).
+    """
+    removed = storage.get().remove_sale_item(sale_id, sale_date, pro_id, amount)
+    if removed is None:
+        raise NotFound(f"Sale {sale_id} not found on {sale_date}")
+    return removed
+
+
+def can_edit_sale(sale_id):
+    """False if the bill has returned items (update_sale refuses it)"""
+    return storage.get().can_edit_sale(sale_id)
+
+
+def update_sale(sale_id, sale_date, cust_id=None, new_date=None, status=None, items=None):
+    """
+    Edit one bill: customer, date, status (1 = cancelled, its stock goes back; 0 takes it out again) and/or
+    its lines [(pro_id, amount, discount), ...]. A line whose amount did not change keeps
+    the price on the bill, the others are priced at the current sale price. The engine
+    moves the stock difference in the same transaction. Returns the saved sale as a dict,
+    with "stock": {pro_id: new stock amount} of the products it moved.
+    """
+    engine = storage.get()
+    sale_date = _day(sale_date).isoformat()
+    sale = next((r for r in engine.sales_of_day(sale_date) if record_codec.text(r[0]) == sale_id), None)
+    if sale is None:
+        raise NotFound(f"Sale {sale_id} not found on {sale_date}")
+    if not engine.can_edit_sale(sale_id):
+        raise ServiceError("This sale has returned items and cannot be edited")
+    if cust_id is None:
+        cust_id = record_codec.text(sale[1])
+    elif engine.get_customer(cust_id) is None:
+        raise ServiceError(f"Customer {cust_id} not found")
+    new_date = record_codec.text(sale[2]) if new_date is None else _day(new_date).isoformat()
+    status = sale[5] if status is None else status
+    if status not in (0, 1):
+        raise ServiceError("sale_status must be 0 or 1")
+    old_lines = engine.sale_lines(sale_id)
+    if items is None:
+        lines = [(record_codec.text(r[1]), r[2], r[3], r[4]) for r in old_lines]
+    else:
+        if not items:
+            raise ServiceError("A sale needs at least one product.")
+        lines = []
+        for pro_id, amount, discount in items:
+            if not isinstance(amount, int) or amount <= 0:
+                raise ServiceError("Amount must be greater than 0.")
+            same = next((r for r in old_lines if record_codec.text(r[1]) == pro_id and r[2] == amount), None)
+            if same is not None:
+                old_lines.remove(same)
+                sale_price = same[3]
+            else:
+                product = engine.get_product(pro_id)
+                if product is None:
+                    raise ServiceError(f"Product {pro_id} not found")
+                sale_price = product[3] * float(amount)
+            if not 0 <= discount <= sale_price:
+                raise ServiceError("Discount must be between 0 and sale price.")
+            lines.append((pro_id, amount, sale_price, float(discount)))
+    # stock พอหรือไม่ engine ตรวจอีกครั้งตอนบันทึก (จากค่าล่าสุด ไม่ใช่ค่าที่อ่านไว้ตอนนี้)
+    total_discount = sum(line[3] for line in lines)
+    net_price = sum(line[2] for line in lines) - total_discount
+    record = (sale_id.encode(), cust_id.encode(), new_date.encode(), net_price, total_discount, status)
+    changed = engine.update_sale(sale_id, sale_date, record, lines)
+    if changed is None:
+        raise NotFound(f"Sale {sale_id} not found on {sale_date}")
+    return {"sale_id": sale_id, "cust_id": cust_id, "sale_date": new_date,
+            "net_price": net_price, "total_discount": total_discount, "status": status,
+            "lines": [{"pro_id": pro_id, "amount": amount, "sale_price": sale_price, "discount": discount}
+                      for pro_id, amount, sale_price, discount in lines],
+            "stock": {pro_id: r[4] for pro_id, r in changed.items()}}
+
+
+# ====== Products / customers ======
+def _product_dict(r):
+    return {"Pro_id": record_codec.text(r[0]), "Pro_name": record_codec.text(r[1]),
+            "Pro_cost": r[2], "Pro_salePrice": r[3], "Pro_amount": r[4],
+            "Category": record_codec.text(r[5]), "Pro_status": r[6]}
+
+
+def list_products():
+    """Every product (first record of each Pro_id)"""
+    return [_product_dict(record) for record in storage.get().products().values()]
+
+
+def get_product(pro_id):
+    """One product by Pro_id"""
+    record = storage.get().get_product(pro_id)
+    if record is None:
+        raise NotFound(f"Product {pro_id} not found")
+    return _product_dict(record)
+
+
+def product_record(pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status=1):
+    """Validate the fields of a new product -> record list ready to pack"""
+    pro_id = _check_text("Pro_id", pro_id, PRODUCT_MAX_LENGTHS["Pro_id"])
+    pro_name = _check_text("Pro_name", pro_name, PRODUCT_MAX_LENGTHS["Pro_name"])
+    category = next((c for c in PRODUCT_CATEGORIES if c.lower() == str(category).strip().lower()), None)
+    if category is None:
+        raise ServiceError(f"Category must be one of {'/'.join(PRODUCT_CATEGORIES)}")
+    if status not in PRODUCT_STATUSES:
+        raise ServiceError("Pro_status must be 1 or 2")
+    if min(pro_cost, pro_salePrice, pro_amount) < 0:
+        raise ServiceError("Cost, sale price and amount cannot be negative")
+    return [pro_id.encode(), pro_name.encode(), float(pro_cost), float(pro_salePrice),
+            int(pro_amount), category.encode(), int(status)]
+
+
+def add_product(pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status=1, user="Admin"):
+    """Add a new product and log it -> the saved record"""
+    record = product_record(pro_id, pro_name, pro_cost, pro_salePrice, pro_amount, category, status)
+    added, _ = storage.get().add_products([record])
+    if not added:
+        raise ServiceError(f"Pro_id {record_codec.text(record[0])} already exists")
+    _log(PRODUCT_LOG_FILE, record_codec.PRODUCT_LOG, OP_ADD, record, user)
+    return _product_dict(record)
+
+
+def update_product(pro_id, user, pro_name=None, pro_cost=None, pro_salePrice=None,
+                   pro_amount=None, category=None, status=None):
+    """Change the given fields of one product in place and log it -> the saved record"""
+    current = get_product(pro_id)
+    fields = {"Pro_name": pro_name, "Pro_cost": pro_cost, "Pro_salePrice": pro_salePrice,
+              "Pro_amount": pro_amount, "Category": category, "Pro_status": status}
+    current.update((k, v) for k, v in fields.items() if v is not None)
+    record = product_record(pro_id, current["Pro_name"], current["Pro_cost"], current["Pro_salePrice"],
+                            current["Pro_amount"], current["Category"], current["Pro_status"])
+    if not storage.get().update_product(record):
+        raise NotFound(f"Product {pro_id} not found")
+    _log(PRODUCT_LOG_FILE, record_codec.PRODUCT_LOG, OP_UPDATE, record, user)
+    return _product_dict(record)
+
+
+def delete_product(pro_id, user):
+    """Delete one product and log it -> the deleted record"""
+    record = storage.get().delete_product(pro_id)
+    if record is None:
+        raise NotFound(f"Product {pro_id} not found")
+    record = list(record)
+    record[6] = record_codec.PRODUCT_DELETED   # log แบบเดียวกับเมนูลบสินค้า
+    _log(PRODUCT_LOG_FILE, record_codec.PRODUCT_LOG, OP_DELETE, record, user)
+    return _product_dict(record)
+
+
+def add_products(records, user="Admin"):
+    """
+    Add many product records (from product_record) with one write and one batch
+    of ADD log records. Ids that already exist or repeat in records are
+    skipped -> (added records, skipped Pro_ids)
+    """
+    added, skipped = storage.get().add_products(records)
+    if added:
+        _log_many(PRODUCT_LOG_FILE, record_codec.PRODUCT_LOG, OP_ADD, added, user)
+    return added, skipped
+
+
+def _customer_dict(r):
+    return {"Cust_id": record_codec.text(r[0]), "Cust_name": record_codec.text(r[1]),
+            "Cust_tel": record_codec.text(r[2]), "Cust_status": r[3]}
+
+
+def list_customers():
+    """Every customer record"""
+    return [_customer_dict(r) for r in storage.get().customers()]
+
+
+def get_customer(cust_id):
+    """One customer by Cust_id"""
+    record = storage.get().get_customer(cust_id)
+    if record is None:
+        raise NotFound(f"Customer ID {cust_id} not found.")
+    return _customer_dict(record)
+
+
+def customer_record(cust_id, cust_name, cust_tel, status=1):
+    """Validate the fields of a new customer -> record tuple ready to pack"""
+    cust_id = _check_text("Cust_id", cust_id, CUSTOMER_MAX_LENGTHS["Cust_id"])
+    cust_name = _check_text("Cust_name", cust_name, CUSTOMER_MAX_LENGTHS["Cust_name"])
+    cust_tel = _check_text("Cust_tel", cust_tel, CUSTOMER_MAX_LENGTHS["Cust_tel"])
+    if status not in CUSTOMER_STATUSES:
+        raise ServiceError("Cust_status must be 0 or 1")
+    return (cust_id.encode(), cust_name.encode(), cust_tel.encode(), int(status))
+
+
+def add_customer(cust_id, cust_name, cust_tel, status=1, user="admin"):
+    """Add a new customer and log it -> the saved record"""
+    record = customer_record(cust_id, cust_name, cust_tel, status)
+    added, _ = storage.get().add_customers([record])
+    if not added:
+        raise ServiceError(f"Cust_id {record_codec.text(record[0])} already exists")
+    _log(CUSTOMER_LOG_FILE, record_codec.CUSTOMER_LOG, OP_ADD, record, user)
+    return _customer_dict(record)
+
+
+def add_customers(records, user="admin"):
+    """
+    Add many customer records (from customer_record) with one write and one batch
+    of ADD log records. Ids that already exist or repeat in records are
+    skipped -> (added records, skipped Cust_ids)
+    """
+    added, skipped = storage.get().add_customers(records)
+    if added:
+        _log_many(CUSTOMER_LOG_FILE, record_codec.CUSTOMER_LOG, OP_ADD, added, user)
+    return added, skipped
+
+
+def update_customer(cust_id, user, cust_name=None, cust_tel=None, status=None):
+    """Change the given fields of one customer in place and log it -> the saved record"""
+    if cust_name is not None:
+        cust_name = _check_text("Cust_name", cust_name, CUSTOMER_MAX_LENGTHS["Cust_name"])
+    if cust_tel is not None:
+        cust_tel = _check_text("Cust_tel", cust_tel, CUSTOMER_MAX_LENGTHS["Cust_tel"])
+    if status is not None and status not in CUSTOMER_STATUSES:
+        raise ServiceError("Cust_status must be 0 or 1")
+    r = storage.get().update_customer(cust_id, cust_name, cust_tel, status)
+    if r is None:
+        raise NotFound(f"Customer ID {cust_id} not found.")
+    _log(CUSTOMER_LOG_FILE, record_codec.CUSTOMER_LOG, OP_UPDATE, r, user)
+    return _customer_dict(r)
+
+
+def delete_customer(cust_id, user):
+    """Delete one customer and log it -> the deleted record"""
+    record = storage.get().delete_customer(cust_id)
+    if record is None:
+        raise NotFound(f"Customer ID {cust_id} not found.")
+    record = list(record)
+    record[3] = record_codec.CUSTOMER_DELETED   # log แบบเดียวกับเมนูลบลูกค้า
+    _log(CUSTOMER_LOG_FILE, record_codec.CUSTOMER_LOG, OP_DELETE, record, user)
+    return _customer_dict(record)
+
+
+# ====== Reports ======
+def _bill(totals_entry):
+    if totals_entry is None:
+        return None
+    sale_id, cust_id, net_price = totals_entry
+    return {"sale_id": sale_id, "cust_id": cust_id, "net_price": net_price}
+
+
+def _day(day):
+    if day is None:
+        return date.today()
+    parsed = date_codec.parse_date(day) if isinstance(day, (str, bytes)) else day
+    if parsed is None:
+        raise ServiceError(f"Invalid date: {day}")
+    return parsed
+
+
+def daily_summary(day=None):
+    """Sales counters of one day (default today)"""
+    day = _day(day)
+    totals = storage.get().day_totals(day)
+    return {
+        "date": day.isoformat(),
+        "bills": totals["bills"],
+        "total": totals["total"],
+        "average": totals["total"] / totals["bills"] if totals["bills"] else 0,
+        "max": _bill(totals["max"]),
+        "min": _bill(totals["min"]),
+    }
+
+
+def sales_of_day(day=None):
+    """Every bill of one day with its lines (cancelled bills included, see status)"""
+    bills = []
+    engine = storage.get()
+    for r in engine.sales_of_day(_day(day)):
+        sale_id = record_codec.text(r[0])
+        bills.append({
+            "sale_id": sale_id,
+            "cust_id": record_codec.text(r[1]),
+            "sale_date": record_codec.text(r[2]),
+            "net_price": r[3],
+            "total_discount": r[4],
+            "status": r[5],
+            "lines": [{"pro_id": record_codec.text(d[1]), "amount": d[2],
+                       "sale_price": d[3], "discount": d[4]}
+                      for d in engine.sale_lines(sale_id)],
+        })
+    return bills
@@ -0,0 +1,204 @@
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+import date_codec
+import file_lock
+import index_file
+import journal
+import record_codec
+
+# ====== Stock movement ledger ======
+# ทุกการเปลี่ยน stock ต่อท้าย movement หนึ่ง record ต่อสินค้าใน stock_moves.dat (record เดิมไม่ถูกแก้)
+#   SALE ขาย / RETURN คืนจากบิล / ADJUST แก้จำนวนหรือลบสินค้า / RECEIVE รับสินค้าเข้า (เพิ่มสินค้าใหม่)
+# Pro_amount ใน product.dat คือ stock ปัจจุบันที่ materialize ไว้ เขียนใน journal transaction เดียวกับ movement
+# ทุก CHECKPOINT_EVERY movement จะบันทึก stock ของทุกสินค้า + ตำแหน่งใน ledger ลง stock_checkpoint.dat
+# stock ณ เวลาใดๆ = checkpoint ล่าสุดก่อนเวลานั้น + movement หลัง checkpoint จนถึงเวลานั้น (stock_at)
+# ผู้เขียนถือ lock() ตั้งแต่ append จน commit: lock ตัวสุดท้ายเสมอ (ต่อจาก record lock ของ product.dat / sale.dat)
+MOVES_FILE = "stock_moves.dat"
+CHECKPOINT_FILE = "stock_checkpoint.dat"
+PRODUCT_FILE = "product.dat"
+MOVE_SIZE = record_codec.STOCK_MOVE.size
+CHECKPOINT_EVERY = 1000
+
+SALE = 1
+RETURN = 2
+ADJUST = 3
+RECEIVE = 4
+KIND_NAMES = {SALE: "SALE", RETURN: "RETURN", ADJUST: "ADJUST", RECEIVE: "RECEIVE"}
+
+# checkpoint: header ตามด้วย entry ของทุกสินค้า
+CHECKPOINT_HEADER = struct.Struct("=4sqqi")   # magic, จำนวน movement ที่รวมแล้ว, ts (ns), จำนวนสินค้า
+CHECKPOINT_ENTRY = struct.Struct("=13si")     # pro_id, amount
+CHECKPOINT_MAGIC = b"SCHK"
+
+_headers = []          # [(position, ts, entries offset, count)] จาก stock_checkpoint.dat
+_headers_stamp = None
+
+
+def lock():
+    """Exclusive lock on the ledger; hold it from append() until the transaction commits"""
+    return file_lock.exclusive(MOVES_FILE)
+
+
+def count():
+    """Number of movements in stock_moves.dat"""
+    return index_file.file_stamp(MOVES_FILE)[0] // MOVE_SIZE
+
+
+def checkpoints():
+    """[(ledger position, ts ns, entries offset, product count)] in the order they were taken"""
+    global _headers, _headers_stamp
+    stamp = index_file.file_stamp(CHECKPOINT_FILE)
+    if stamp == _headers_stamp:
+        return _headers
+    headers = []
+    size = stamp[0]
+    if size:
+        with open(CHECKPOINT_FILE, "rb") as f:
+            pos = 0
+            while pos + CHECKPOINT_HEADER.size <= size:
+                f.seek(pos)
+                magic, position, ts, n = CHECKPOINT_HEADER.unpack(f.read(CHECKPOINT_HEADER.size))
+                end = pos + CHECKPOINT_HEADER.size + n * CHECKPOINT_ENTRY.size
+                if magic != CHECKPOINT_MAGIC or end > size:
+                    break
+                headers.append((position, ts, pos + CHECKPOINT_HEADER.size, n))
+                pos = end
+    _headers, _headers_stamp = headers, stamp
+    return headers
+
+
+def _read_checkpoint(header):
+    _, _, offset, n = header
+    with open(CHECKPOINT_FILE, "rb") as f:
+        f.seek(offset)
+        data = f.read(n * CHECKPOINT_ENTRY.size)
+    return {record_codec.text(raw).strip(): amount for raw, amount in CHECKPOINT_ENTRY.iter_unpack(data)}
+
+
+def current_stock():
+    """{pro_id: Pro_amount} of every product in product.dat (the materialized column)"""
+    stock = {}
+    for r in record_codec.live_rows(PRODUCT_FILE, record_codec.PRODUCT):
+        stock.setdefault(record_codec.text(r[0]).strip(), r[4])
+    return stock
+
+
+def _checkpoint_data():
+    stock = current_stock()
+    data = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, count(), time.time_ns(), len(stock))
+    return data + b"".join(CHECKPOINT_ENTRY.pack(pro_id.encode(), amount) for pro_id, amount in stock.items())
+
+
+def checkpoint():
+    """Save the stock of every product with the ledger position it matches (caller holds lock())"""
+    with journal.Transaction() as tx:
+        tx.append(CHECKPOINT_FILE, _checkpoint_data())
+
+
+def _maybe_checkpoint():
+    headers = checkpoints()
+    if not headers or count() - headers[-1][0] >= CHECKPOINT_EVERY:
+        checkpoint()
+
+
+def rows(moves):
+    """STOCK_MOVE records of movements [(pro_id, kind, qty, ref)] stamped with the current time (qty 0 is skipped)"""
+    ts = time.time_ns()
+    return [(ts, pro_id.encode(), kind, qty, ref.encode()) for pro_id, kind, qty, ref in moves if qty]
+
+
+def append(tx, moves):
+    """
+    Record movements [(pro_id, kind, qty, ref)] in a journal transaction
+    (qty 0 is skipped). The caller holds lock() until tx commits.
+    """
+    if not any(m[2] for m in moves):
+        return
+    if not checkpoints() and not tx.size(CHECKPOINT_FILE):
+        # ledger เริ่มใหม่: stock ตั้งต้นมาจาก product.dat ก่อน movement แรก
+        # เขียนใน tx ของผู้เรียก: rollback แล้ว checkpoint ก็ไม่ค้างอยู่โดยไม่มี movement
+        tx.append(CHECKPOINT_FILE, _checkpoint_data())
+    tx.append(MOVES_FILE, b"".join(record_codec.STOCK_MOVE.pack(*r) for r in rows(moves)))
+    tx.after_commit(_maybe_checkpoint)
+
+
+def _time_ns(when):
+    return when if isinstance(when, int) else int(when.timestamp() * 10 ** 9)
+
+
+def stock_at(when):
+    """
+    Stock of every product at a moment (datetime or ns since the epoch) -> {pro_id: amount},
+    replayed from the nearest checkpoint taken at or before it. None if the ledger
+    does not reach back that far.
+    """
+    t = _time_ns(when)
+    base = None
+    for header in checkpoints():
+        if header[1] > t:
+            break
+        base = header
+    if base is None:
+        return None
+    stock = _read_checkpoint(base)
+    chunk = CHECKPOINT_EVERY * MOVE_SIZE
+    with open(MOVES_FILE, "rb") if os.path.exists(MOVES_FILE) else open(os.devnull, "rb") as f:
+        f.seek(base[0] * MOVE_SIZE)
+        while True:
+            data = f.read(chunk)
+            for ts, raw_id, kind, qty, ref in record_codec.iter_rows(data, record_codec.STOCK_MOVE):
+                # ledger ต่อท้ายภายใต้ lock จึงเรียงตามเวลา: เจอ movement หลังเวลาที่ถามก็หยุดได้
+                if ts > t:
+                    return stock
+                pro_id = record_codec.text(raw_id).strip()
+                stock[pro_id] = stock.get(pro_id, 0) + qty
+            if len(data) < chunk:
+                return stock
+
+
+def verify():
+    """Replay the ledger to now and compare with product.dat -> {pro_id: (replayed, in product.dat)} that differ"""
+    with lock():
+        replayed = stock_at(time.time_ns())
+        if replayed is None:
+            return {}
+        stock = current_stock()
+    return {pro_id: (replayed.get(pro_id, 0), stock.get(pro_id, 0))
+            for pro_id in set(replayed) | set(stock) if replayed.get(pro_id, 0) != stock.get(pro_id, 0)}
+
+
+def main(argv):
+    if argv and argv[0] == "--checkpoint":
+        with lock():
+            checkpoint()
+        print(f"✅ checkpoint at movement {count()}")
+        return 0
+    if argv and argv[0] == "--verify":
+        diff = verify()
+        for pro_id, (replayed, stored) in sorted(diff.items()):
+            print(f"❌ {pro_id}: ledger {replayed} / product.dat {stored}")
+        if not diff:
+            print(f"✅ stock ใน product.dat ตรงกับ ledger ({count()} movements, {len(checkpoints())} checkpoints)")
+        return 1 if diff else 0
+    if argv:
+        when = date_codec.parse_timestamp(" ".join(argv).encode())
+        if when is None:
+            print("❌ ใช้รูปแบบเวลา YYYY-MM-DD HH:MM:SS")
+            return 2
+    else:
+        when = datetime.now()
+    stock = stock_at(when)
+    if stock is None:
+        print(f"⚠️ ไม่มี checkpoint ก่อน {when} (ledger เริ่มหลังเวลานั้น)")
+        return 1
+    for pro_id, amount in sorted(stock.items()):
+        print(f"{pro_id:13} {amount}")
+    return 0
+
+
+if __name__ == "__main__":
+    journal.recover()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,1140 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import change_log
+import customer_index
+import daily_totals
+import date_codec
+import file_lock
+import journal
+import log_writer
+import product_store
+import record_codec
+import sale_detail_index
+import sale_ids
+import sale_index
+import sale_ledger
+import stock_ledger
+
+# ====== Storage engines ======
+# service / เมนู CLI / server / bulk import อ่านและเขียนข้อมูลร้านผ่าน storage.get() ตัวเดียว
+#   "file"   - ไฟล์ fixed-size record เดิม (product.dat, sale.dat, ... พร้อม index / lock / journal)
+#   "sqlite" - ฐานข้อมูล SQLite ไฟล์เดียว มี index บน id, วันที่ขาย และชื่อลูกค้า
+#   "memory" - dict/list ใน process (ทดสอบ/ทดลอง ข้อมูลหายเมื่อปิดโปรแกรม)
+# เลือก engine ด้วย ENGINE หรือ environment variable RETAIL_STORAGE (และ RETAIL_SQLITE_PATH)
+# record ที่ส่งเข้า-ออกทุก engine เป็นลำดับ field ตาม record_codec (field ข้อความเป็น bytes)
+# และถูกตัด/ปัดแบบเดียวกับตอน pack ลงไฟล์ ผลลัพธ์จึงเหมือนกันไม่ว่าใช้ engine ไหน
+# ทุก engine ไม่ลบ/แก้บิลตอน void หรือคืนสินค้า แต่บันทึก adjustment (sale_ledger) แล้วหักตอนอ่าน
+# และบันทึก movement ของ stock ทุกครั้งที่ Pro_amount เปลี่ยน (stock_ledger) ประวัติจึงไม่หายเมื่อเปลี่ยน engine
+ENGINE = os.environ.get("RETAIL_STORAGE", "file")
+SQLITE_PATH = os.environ.get("RETAIL_SQLITE_PATH", "retail_shop.db")
+
+PRODUCT_FILE = product_store.PRODUCT_FILE
+CUSTOMER_FILE = "customer.dat"
+SALE_FILE = "sale.dat"
+SALE_DETAIL_FILE = "sale_detail.dat"
+LOG_CODECS = log_writer.LOG_CODECS
+
+
+class StorageError(ValueError):
+    """A change the engine refuses, e.g. not enough stock (the message is meant for the user)"""
+
+
+def _key(raw):
+    return record_codec.text(raw).strip()
+
+
+def _norm(codec, record):
+    """Record as it would come back from the data file (text cut to size, floats as 32 bit)"""
+    return list(codec.unpack(codec.pack(*record)))
+
+
+def _new_only(records, seen):
+    """Drop records whose id is in seen or repeated -> (new records, skipped ids)"""
+    added, skipped = [], []
+    for record in records:
+        record_id = _key(record[0])
+        if record_id in seen:
+            skipped.append(record_id)
+            continue
+        seen.add(record_id)
+        added.append(record)
+    return added, skipped
+
+
+def _take_stock(record, pro_id, amount):
+    if amount > record[4]:
+        raise StorageError(f"Stock not enough for {pro_id}! Available: {record[4]}")
+    record[4] -= amount
+    if record[4] == 0:
+        record[6] = 2
+
+
+def _give_back(record, amount):
+    record[4] += amount
+    if record[6] == 2 and record[4] > 0:
+        record[6] = 1
+
+
+def _move_stock(record, pro_id, change):
+    """Put back (change > 0) or take (change < 0) stock of one product record"""
+    if change > 0:
+        _give_back(record, change)
+    else:
+        _take_stock(record, pro_id, -change)
+
+
+def _edit_changes(old_lines, old_status, lines, status):
+    """
+    {pro_id: stock change} when a bill's sale_detail records old_lines become
+    lines [(pro_id, amount, ...)]. A cancelled bill (status 1) holds no stock, so
+    cancelling puts the old lines back, un-cancelling takes the new lines out again
+    and editing a bill that stays cancelled moves nothing
+    """
+    old = product_store.aggregate((_key(r[1]), r[2]) for r in old_lines) if old_status != 1 else {}
+    new = product_store.aggregate((line[0], line[1]) for line in lines) if status != 1 else {}
+    changes = {pro_id: old.get(pro_id, 0) - new.get(pro_id, 0) for pro_id in {**old, **new}}
+    return {pro_id: change for pro_id, change in changes.items() if change}
+
+
+def _return_moves(sale_id, lines, returned):
+    """RETURN movements for (pro_id, amount) lines put back by return_stock (returned = its result)"""
+    return [(pro_id, stock_ledger.RETURN, amount, sale_id)
+            for pro_id, amount in product_store.aggregate(lines).items() if pro_id in returned]
+
+
+def _returned_amounts(lines, kept):
+    """(sale_price, discount) taken off a bill whose lines became kept"""
+    return sum(r[3] for r in lines) - sum(r[3] for r in kept), sum(r[4] for r in lines) - sum(r[4] for r in kept)
+
+
+def _sale_header(sale_id, cust_id, sale_date, lines, status):
+    total_discount = sum(line[3] for line in lines)
+    net_price = sum(line[2] for line in lines) - total_discount
+    return (sale_id.encode(), cust_id.encode(), sale_date.encode(), net_price, total_discount, status)
+
+
+def _day_range(day):
+    start, end = change_log.day_bounds(day)
+    return change_log.time_key(start), change_log.time_key(end)
+
+
+class Storage:
+    """Interface of a storage engine (products, customers, sales, sale details, change logs)"""
+    name = None
+
+    # ----- products -----
+    def products(self):
+        """Every product -> {Pro_id: list record} (the caller may change the lists)"""
+        raise NotImplementedError
+
+    def get_product(self, pro_id):
+        """One product record (list) or None"""
+        raise NotImplementedError
+
+    def add_products(self, records):
+        """Add new products; ids that exist or repeat are skipped -> (added records, skipped ids)"""
+        raise NotImplementedError
+
+    def update_product(self, record):
+        """Overwrite the product with the record's Pro_id -> False if there is none"""
+        raise NotImplementedError
+
+    def delete_product(self, pro_id):
+        """Remove a product -> its record, or None if there is none"""
+        raise NotImplementedError
+
+    # ----- customers -----
+    def customers(self):
+        """Every customer record"""
+        raise NotImplementedError
+
+    def get_customer(self, cust_id):
+        """One customer record or None"""
+        raise NotImplementedError
+
+    def find_customer(self, cust_name):
+        """Cust_id of the first customer with this name, or None"""
+        raise NotImplementedError
+
+    def add_customers(self, records):
+        """Add new customers; ids that exist or repeat are skipped -> (added records, skipped ids)"""
+        raise NotImplementedError
+
+    def update_customer(self, cust_id, cust_name=None, cust_tel=None, status=None):
+        """Change the given fields of one customer -> the saved record, or None if there is none"""
+        raise NotImplementedError
+
+    def delete_customer(self, cust_id):
+        """
+        Tombstone a customer (Cust_status CUSTOMER_DELETED): it no longer shows up
+        and its id may be added again -> the deleted record, or None if there is none
+        """
+        raise NotImplementedError
+
+    # ----- sales -----
+    def commit_sale(self, cust_id, sale_date, lines, status=0):
+        """
+        Save one bill of lines [(pro_id, amount, sale_price, discount)] and take its stock,
+        all or nothing -> (sale_id, {pro_id: product record after the sale}).
+        Raises StorageError when a product is missing or has not enough stock.
+        """
+        raise NotImplementedError
+
+    def sales_of_day(self, sale_date):
+        """Sale records of one day after their adjustments (voided bills left out), in the order they were saved"""
+        raise NotImplementedError
+
+    def sale_lines(self, sale_id):
+        """sale_detail records of one sale, returned items taken off"""
+        raise NotImplementedError
+
+    def void_sale(self, sale_id, sale_date):
+        """
+        Void a bill (a VOID adjustment is recorded) and put its stock back
+        -> {pro_id: new amount}, or None if there is no such bill
+        """
+        raise NotImplementedError
+
+    def remove_sale_item(self, sale_id, sale_date, pro_id, amount):
+        """
+        Take amount of pro_id off a bill (a RETURN adjustment is recorded) and put it back in stock
+        -> True, False if the bill no longer has that much of pro_id, None if there is no such bill.
+        """
+        raise NotImplementedError
+
+    def can_edit_sale(self, sale_id):
+        """False if update_sale would refuse this bill (it has returns, which are taken off when it is read)"""
+        return not any(r[6] == sale_ledger.RETURN for r in self.sale_adjustments(sale_id))
+
+    def update_sale(self, sale_id, sale_date, record, lines):
+        """
+        Rewrite a bill with a new sale record (customer, date, totals, status) and lines
+        [(pro_id, amount, sale_price, discount)], moving stock by the difference, all or nothing
+        -> {pro_id: product record after the change}, or None if there is no such bill.
+        Cancelling the bill (status 1) puts its old lines back in stock, un-cancelling it takes
+        the new lines out again; a bill that stays cancelled moves no stock.
+        Raises StorageError when a product is missing or has not enough stock.
+        """
+        raise NotImplementedError
+
+    def day_totals(self, sale_date):
+        """{"bills", "total", "max", "min"} of one day; cancelled bills (status 1) are not counted"""
+        totals = {"bills": 0, "total": 0.0, "max": None, "min": None}
+        for r in self.sales_of_day(sale_date):
+            if r[5] == 1:
+                continue
+            bill = (_key(r[0]), _key(r[1]), r[3])
+            totals["bills"] += 1
+            totals["total"] += r[3]
+            if totals["max"] is None or r[3] > totals["max"][2]:
+                totals["max"] = bill
+            if totals["min"] is None or r[3] < totals["min"][2]:
+                totals["min"] = bill
+        return totals
+
+    # ----- history -----
+    def sale_adjustments(self, sale_id):
+        """Void / return records (record_codec.SALE_ADJUST fields) of one bill, in the order they were recorded"""
+        raise NotImplementedError
+
+    def stock_moves(self):
+        """Every stock movement (record_codec.STOCK_MOVE fields), oldest first"""
+        raise NotImplementedError
+
+    # ----- change logs -----
+    def append_log(self, path, data):
+        """Add packed log records (one or more, see LOG_CODECS) to a change log"""
+        raise NotImplementedError
+
+    def read_log(self, path, day=None, row_type=None):
+        """Records of a change log, oldest first (only one day's if day is given)"""
+        raise NotImplementedError
+
+
+# ====== Fixed-record files ======
+class FileStorage(Storage):
+    """The .dat / .bin files with their sidecar indexes, file locks and journal"""
+    name = "file"
+
+    # ----- products -----
+    def products(self):
+        return {pro_id: record for pro_id, (_, record) in product_store.snapshot().items()}
+
+    def get_product(self, pro_id):
+        return product_store.read_product(pro_id)[1]
+
+    def add_products(self, records):
+        with file_lock.exclusive(PRODUCT_FILE):
+            added, skipped = _new_only(records, set(product_store.get_index()))
+            if added:
+                # stock ตั้งต้นของสินค้าใหม่เป็น movement RECEIVE ใน transaction เดียวกัน
+                with stock_ledger.lock(), journal.Transaction() as tx:
+                    product_store.add_records(added, tx)
+                    stock_ledger.append(tx, [(_key(r[0]), stock_ledger.RECEIVE, r[4], "") for r in added])
+        return added, skipped
+
+    @contextmanager
+    def locked_products(self, pro_ids):
+        """
+        Exclusive record locks on some products for the with-block
+        -> {pro_id: (offset, list record)} read after the locks are held.
+        """
+        pro_ids = list(dict.fromkeys(pro_ids))
+        while True:
+            offsets = {pro_id: product_store.find_offset(pro_id) for pro_id in pro_ids}
+            for pro_id, offset in offsets.items():
+                if offset is None:
+                    raise StorageError(f"Product {pro_id} not found")
+            with file_lock.records(PRODUCT_FILE, offsets.values(), product_store.PRODUCT_RECORD_SIZE):
+                fresh = {pro_id: product_store.read_product(pro_id) for pro_id in pro_ids}
+                # product.dat ถูกเขียนใหม่ทั้งไฟล์ระหว่างรอ lock (compaction) หรือสินค้าถูกลบ -> lock ใหม่
+                if all(fresh[pro_id][0] == offsets[pro_id] for pro_id in pro_ids):
+                    yield fresh
+                    return
+
+    def update_product(self, record):
+        pro_id = _key(record[0])
+        if product_store.find_offset(pro_id) is None:
+            return False
+        # record lock: อีกเครื่องอาจขายสินค้านี้อยู่พร้อมกัน
+        with self.locked_products([pro_id]) as fresh:
+            offset, old = fresh[pro_id]
+            with stock_ledger.lock(), journal.Transaction() as tx:
+                product_store.write_records([(offset, record)], tx=tx)
+                stock_ledger.append(tx, [(pro_id, stock_ledger.ADJUST, record[4] - old[4], "")])
+        return True
+
+    def delete_product(self, pro_id):
+        # tombstone: เขียนทับ status ของ record นี้ record เดียว (ดู compaction.py สำหรับการเก็บกวาด)
+        if product_store.find_offset(pro_id) is None:
+            return None
+        with self.locked_products([pro_id]) as fresh:
+            offset, record = fresh[pro_id]
+            with stock_ledger.lock(), journal.Transaction() as tx:
+                product_store.delete_record(offset, record, tx)
+                stock_ledger.append(tx, [(pro_id, stock_ledger.ADJUST, -record[4], "")])
+        return record
+
+    # ----- customers -----
+    def customers(self):
+        return list(record_codec.live_rows(CUSTOMER_FILE, record_codec.CUSTOMER))
+
+    def get_customer(self, cust_id):
+        offset = customer_index.lookup_offset(cust_id)
+        if offset is None:
+            return None
+        with open(CUSTOMER_FILE, "rb") as f:
+            f.seek(offset)
+            r = list(record_codec.CUSTOMER.unpack(f.read(record_codec.CUSTOMER.size)))
+        return None if record_codec.is_deleted(record_codec.CUSTOMER, r) else r
+
+    def find_customer(self, cust_name):
+        return customer_index.lookup_name(cust_name)
+
+    def add_customers(self, records):
+        with file_lock.exclusive(CUSTOMER_FILE):
+            added, skipped = _new_only(records, customer_index.ids())
+            if added:
+                with open(CUSTOMER_FILE, "ab") as f:
+                    f.write(b"".join(record_codec.CUSTOMER.pack(*record) for record in added))
+                customer_index.note_added_many([(_key(r[0]), _key(r[1])) for r in added])
+        return added, skipped
+
+    def update_customer(self, cust_id, cust_name=None, cust_tel=None, status=None):
+        size = record_codec.CUSTOMER.size
+        while True:
+            offset = customer_index.lookup_offset(cust_id)
+            if offset is None:
+                return None
+            with file_lock.records(CUSTOMER_FILE, [offset], size), open(CUSTOMER_FILE, "r+b") as f:
+                f.seek(offset)
+                r = list(record_codec.CUSTOMER.unpack(f.read(size)))
+                # customer.dat ถูกเขียนใหม่ทั้งไฟล์ระหว่างรอ lock -> record ที่ offset นี้ไม่ใช่คนเดิม ลองใหม่
+                if _key(r[0]) != cust_id:
+                    continue
+                if record_codec.is_deleted(record_codec.CUSTOMER, r):
+                    return None
+                if cust_name is not None:
+                    r[1] = cust_name.encode()
+                if cust_tel is not None:
+                    r[2] = cust_tel.encode()
+                if status is not None:
+                    r[3] = int(status)
+                f.seek(offset)
+                f.write(record_codec.CUSTOMER.pack(*r))
+                f.flush()   # ให้ stamp ที่ index บันทึกรวมการเขียนนี้แล้ว
+                if record_codec.is_deleted(record_codec.CUSTOMER, r):
+                    customer_index.note_deleted(cust_id)
+                else:
+                    customer_index.note_updated(cust_id, _key(r[1]))
+                return r
+
+    def delete_customer(self, cust_id):
+        # tombstone แบบเดียวกับ delete_product: lock และเขียนทับเฉพาะ record ของลูกค้าคนนี้
+        return self.update_customer(cust_id, status=record_codec.CUSTOMER_DELETED)
+
+    # ----- sales -----
+    def commit_sale(self, cust_id, sale_date, lines, status=0):
+        # ลำดับการ lock: record ของ product.dat ก่อน แล้วจึง sale.dat (sale.dat คุม sale_detail.dat ด้วย)
+        # และ stock ledger เป็นตัวสุดท้าย
+        needed = product_store.aggregate((line[0], line[1]) for line in lines)
+        with self.locked_products(needed) as fresh:
+            for pro_id, amount in needed.items():
+                _take_stock(fresh[pro_id][1], pro_id, amount)
+
+            # id จาก block ที่จองไว้ (ไม่ต้องอ่าน sale.dat) / lock sale.dat เฉพาะตอน append
+            sale_id = sale_ids.next_id()
+            header = _sale_header(sale_id, cust_id, sale_date, lines, status)
+            details = b"".join(record_codec.SALE_DETAIL.pack(sale_id.encode(), pro_id.encode(), *rest)
+                               for pro_id, *rest in lines)
+            with file_lock.exclusive(SALE_FILE), stock_ledger.lock():
+                with journal.Transaction() as tx:
+                    tx.append(SALE_DETAIL_FILE, details)
+                    product_store.write_records(fresh.values(), tx=tx)
+                    stock_ledger.append(tx, [(pro_id, stock_ledger.SALE, -amount, sale_id)
+                                             for pro_id, amount in needed.items()])
+                    tx.append(SALE_FILE, record_codec.SALE.pack(*header))
+                    tx.after_commit(lambda: sale_detail_index.note_appended(sale_id, len(lines)))
+                    tx.after_commit(lambda: sale_index.note_appended(sale_date))
+                    tx.after_commit(lambda: daily_totals.note_added(sale_date, sale_id, cust_id, header[3], status))
+        return sale_id, {pro_id: record for pro_id, (_, record) in fresh.items()}
+
+    def sales_of_day(self, sale_date):
+        # void / คืนสินค้าอยู่ใน sale_adjust.dat -> หักตอนอ่าน (บิลที่ void แล้วไม่ถูกส่งออกไป)
+        sales = (sale_ledger.net_sale(r) for _, r in sale_index.read_day(sale_date))
+        return [r for r in sales if r is not None]
+
+    def sale_lines(self, sale_id):
+        return sale_ledger.net_lines(sale_id, [r for _, r in sale_detail_index.read_lines(sale_id)])
+
+    def find_sale(self, sale_id, sale_date):
+        """Offset of a bill in sale.dat (looked up through sale_date.idx), or None (also once voided)"""
+        for offset, r in sale_index.read_day(sale_date):
+            if _key(r[0]) == sale_id:
+                return None if sale_ledger.is_void(sale_id) else offset
+        return None
+
+    def _find_sale_record(self, sale_id, sale_date):
+        return next((r for r in self.sales_of_day(sale_date) if _key(r[0]) == sale_id), None)
+
+    def _sale_products(self, sale_id):
+        """Pro_ids (still in product.dat) of the lines of one sale"""
+        pro_ids = dict.fromkeys(_key(r[1]) for r in self.sale_lines(sale_id))
+        return {pro_id for pro_id in pro_ids if product_store.find_offset(pro_id) is not None}
+
+    @contextmanager
+    def locked_sale(self, sale_id, extra_products=()):
+        """
+        Lock the products of one sale (plus extra_products) and sale.dat for the with-block,
+        in the usual order. Retries if the sale's lines changed while waiting.
+        """
+        while True:
+            pro_ids = self._sale_products(sale_id) | set(extra_products)
+            with self.locked_products(sorted(pro_ids)) as fresh, file_lock.exclusive(SALE_FILE):
+                if self._sale_products(sale_id) <= pro_ids:
+                    yield fresh
+                    return
+
+    def void_sale(self, sale_id, sale_date):
+        with self.locked_sale(sale_id):
+            # ตรวจภายใต้ lock: เครื่องอื่นอาจ void บิลนี้ไปแล้ว
+            sale = self._find_sale_record(sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = [(_key(r[1]), r[2]) for r in self.sale_lines(sale_id)]
+            with stock_ledger.lock(), journal.Transaction() as tx:
+                # คืนสินค้าเข้า stock (รวมจำนวนต่อ pro_id แล้วเขียนแต่ละสินค้าครั้งเดียว)
+                returned = product_store.return_stock(lines, tx)
+                stock_ledger.append(tx, _return_moves(sale_id, lines, returned))
+                # ไม่แตะ sale.dat / sale_detail.dat: ต่อท้าย VOID หนึ่ง record ใน ledger
+                sale_ledger.append(sale_ledger.pack(sale_ledger.VOID, sale_id, record_codec.text(sale[2]),
+                                                    sale_price=sale[3], discount=sale[4]), tx)
+                tx.after_commit(daily_totals.load)
+        return returned
+
+    def remove_sale_item(self, sale_id, sale_date, pro_id, amount):
+        # lock สินค้าของบิลนี้ + sale.dat แล้วอ่าน sale_detail ใหม่ (เครื่องอื่นอาจแก้บิลไปแล้ว)
+        with self.locked_sale(sale_id):
+            sale = self._find_sale_record(sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = self.sale_lines(sale_id)
+            if sale_ledger.item_amount(lines, pro_id) < amount:
+                return False
+            kept, returned = sale_ledger.remove_item(lines, pro_id, amount)
+            price, discount = _returned_amounts(lines, kept)
+            # stock และ RETURN record ถูกบันทึกพร้อมกัน (บิลเดิมไม่ถูกแก้ ยอดสุทธิหักตอนอ่าน)
+            with stock_ledger.lock(), journal.Transaction() as tx:
+                stock_ledger.append(tx, _return_moves(sale_id, returned, product_store.return_stock(returned, tx)))
+                sale_ledger.append(sale_ledger.pack(sale_ledger.RETURN, sale_id, record_codec.text(sale[2]),
+                                                    pro_id, amount, price, discount), tx)
+                tx.after_commit(daily_totals.load)
+        return True
+
+    def update_sale(self, sale_id, sale_date, record, lines):
+        new_date = record_codec.text(record[2])
+        added = {line[0] for line in lines} - {_key(r[1]) for r in self.sale_lines(sale_id)}
+        with self.locked_sale(sale_id, added) as fresh:
+            offset = self.find_sale(sale_id, sale_date)
+            if offset is None:
+                return None
+            if not self.can_edit_sale(sale_id):
+                raise StorageError("This sale has returned items and cannot be edited")
+            old = self._find_sale_record(sale_id, sale_date)
+            changes = _edit_changes(self.sale_lines(sale_id), old[5], lines, record[5])
+            for pro_id, change in changes.items():
+                if pro_id in fresh:
+                    _move_stock(fresh[pro_id][1], pro_id, change)
+                elif change < 0:
+                    raise StorageError(f"Product {pro_id} not found")
+            changed = [pro_id for pro_id in changes if pro_id in fresh]
+            # sale / sale_detail / stock ใน transaction เดียว (เขียนทับเฉพาะ record ที่เปลี่ยน)
+            with stock_ledger.lock(), journal.Transaction() as tx:
+                sale_index.write_sale(offset, record_codec.SALE.pack(*record), tx)
+                sale_detail_index.replace_lines(sale_id, [record_codec.SALE_DETAIL.pack(
+                    sale_id.encode(), pro_id.encode(), *rest) for pro_id, *rest in lines], tx)
+                product_store.write_records([fresh[pro_id] for pro_id in changed], tx=tx)
+                stock_ledger.append(tx, [(pro_id, stock_ledger.RETURN if changes[pro_id] > 0 else stock_ledger.SALE,
+                                          changes[pro_id], sale_id) for pro_id in changed])
+                # ยอดรวมรายวัน: คำนวณใหม่เฉพาะวันเดิมและวันใหม่ของบิลนี้
+                tx.after_commit(lambda: daily_totals.recompute([sale_date, new_date]))
+        return {pro_id: fresh[pro_id][1] for pro_id in changed}
+
+    def day_totals(self, sale_date):
+        return daily_totals.get(sale_date)
+
+    # ----- history -----
+    def sale_adjustments(self, sale_id):
+        return list(sale_ledger.adjustments().get(sale_id, ()))
+
+    def stock_moves(self):
+        return list(record_codec.read_rows(stock_ledger.MOVES_FILE, record_codec.STOCK_MOVE))
+
+    # ----- change logs -----
+    def append_log(self, path, data):
+        # เขียนเป็นชุดใน thread เบื้องหลังของ log_writer (rotate ให้ด้วย)
+        log_writer.write(path, data)
+
+    def read_log(self, path, day=None, row_type=None):
+        if day is None:
+            return change_log.read_all(path, LOG_CODECS[path], row_type)
+        return change_log.read_day(path, LOG_CODECS[path], day, row_type)
+
+
+# ====== In-memory ======
+class MemoryStorage(Storage):
+    """Everything in dicts of this process (nothing is written to disk)"""
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._products = {}     # Pro_id -> record (dict คงลำดับที่เพิ่ม)
+        self._customers = {}    # Cust_id -> record
+        self._names = {}        # Cust_name -> Cust_id ของลูกค้าคนแรกที่ใช้ชื่อนี้
+        self._sales = {}        # sale_id -> record
+        self._days = {}         # เลขวัน (date_codec.day_number) -> [sale_id]
+        self._lines = {}        # sale_id -> [sale_detail record]
+        self._adjustments = {}  # sale_id -> [SALE_ADJUST record] (void / คืนสินค้า)
+        self._moves = []        # STOCK_MOVE record ตามลำดับ
+        self._logs = {}         # log path -> [log record]
+        self._last_sale = 0
+
+    def _record_moves(self, moves):
+        self._moves.extend(_norm(record_codec.STOCK_MOVE, r) for r in stock_ledger.rows(moves))
+
+    # ----- products -----
+    def products(self):
+        with self._lock:
+            return {pro_id: list(r) for pro_id, r in self._products.items()}
+
+    def get_product(self, pro_id):
+        with self._lock:
+            record = self._products.get(pro_id)
+            return list(record) if record is not None else None
+
+    def add_products(self, records):
+        with self._lock:
+            added, skipped = _new_only(records, set(self._products))
+            for record in added:
+                self._products[_key(record[0])] = _norm(record_codec.PRODUCT, record)
+            self._record_moves([(_key(r[0]), stock_ledger.RECEIVE, r[4], "") for r in added])
+        return added, skipped
+
+    def update_product(self, record):
+        with self._lock:
+            pro_id = _key(record[0])
+            if pro_id not in self._products:
+                return False
+            old = self._products[pro_id]
+            self._products[pro_id] = _norm(record_codec.PRODUCT, record)
+            self._record_moves([(pro_id, stock_ledger.ADJUST, self._products[pro_id][4] - old[4], "")])
+        return True
+
+    def delete_product(self, pro_id):
+        with self._lock:
+            record = self._products.pop(pro_id, None)
+            if record is not None:
+                self._record_moves([(pro_id, stock_ledger.ADJUST, -record[4], "")])
+            return record
+
+    # ----- customers -----
+    # ลบลูกค้าแบบ tombstone (Cust_status 2) เหมือน engine แบบ file: record ยังอยู่แต่ค้นหา/แก้ไม่ได้อีก
+    # และเพิ่มลูกค้า id เดิมได้ใหม่ (record ใหม่แทนที่ tombstone และไปอยู่ท้ายสุดเหมือนต่อท้ายไฟล์)
+    def _live_customer(self, cust_id):
+        record = self._customers.get(cust_id)
+        return None if record is None or record_codec.is_deleted(record_codec.CUSTOMER, record) else record
+
+    def _reindex_names(self):
+        self._names = {}
+        for cust_id, r in self._customers.items():
+            if not record_codec.is_deleted(record_codec.CUSTOMER, r):
+                self._names.setdefault(_key(r[1]), cust_id)
+
+    def customers(self):
+        with self._lock:
+            return [list(r) for r in self._customers.values()
+                    if not record_codec.is_deleted(record_codec.CUSTOMER, r)]
+
+    def get_customer(self, cust_id):
+        with self._lock:
+            record = self._live_customer(cust_id)
+            return list(record) if record is not None else None
+
+    def find_customer(self, cust_name):
+        with self._lock:
+            return self._names.get(cust_name)
+
+    def add_customers(self, records):
+        with self._lock:
+            live = {cust_id for cust_id in self._customers if self._live_customer(cust_id)}
+            added, skipped = _new_only(records, live)
+            for record in added:
+                record = _norm(record_codec.CUSTOMER, record)
+                self._customers.pop(_key(record[0]), None)
+                self._customers[_key(record[0])] = record
+                self._names.setdefault(_key(record[1]), _key(record[0]))
+        return added, skipped
+
+    def update_customer(self, cust_id, cust_name=None, cust_tel=None, status=None):
+        with self._lock:
+            r = self._live_customer(cust_id)
+            if r is None:
+                return None
+            r = list(r)
+            if cust_name is not None:
+                r[1] = cust_name.encode()
+            if cust_tel is not None:
+                r[2] = cust_tel.encode()
+            if status is not None:
+                r[3] = int(status)
+            self._customers[cust_id] = _norm(record_codec.CUSTOMER, r)
+            self._reindex_names()
+            return list(self._customers[cust_id])
+
+    def delete_customer(self, cust_id):
+        return self.update_customer(cust_id, status=record_codec.CUSTOMER_DELETED)
+
+    # ----- sales -----
+    def _return_stock(self, lines):
+        returned = {}
+        for pro_id, amount in product_store.aggregate(lines).items():
+            record = self._products.get(pro_id)
+            if record is None:
+                continue
+            _give_back(record, amount)
+            returned[pro_id] = record[4]
+        return returned
+
+    def commit_sale(self, cust_id, sale_date, lines, status=0):
+        needed = product_store.aggregate((line[0], line[1]) for line in lines)
+        with self._lock:
+            changed = {}
+            for pro_id, amount in needed.items():
+                if pro_id not in self._products:
+                    raise StorageError(f"Product {pro_id} not found")
+                changed[pro_id] = list(self._products[pro_id])
+                _take_stock(changed[pro_id], pro_id, amount)
+            if self._last_sale >= sale_ids.MAX_NUMBER:
+                raise OverflowError(f"sale id numbers are used up (max {sale_ids.format_id(sale_ids.MAX_NUMBER)})")
+            self._last_sale += 1
+            sale_id = sale_ids.format_id(self._last_sale)
+            self._products.update(changed)
+            self._sales[sale_id] = _norm(record_codec.SALE, _sale_header(sale_id, cust_id, sale_date, lines, status))
+            self._days.setdefault(date_codec.day_number(sale_date), []).append(sale_id)
+            self._lines[sale_id] = [_norm(record_codec.SALE_DETAIL, (sale_id.encode(), pro_id.encode(), *rest))
+                                    for pro_id, *rest in lines]
+            self._record_moves([(pro_id, stock_ledger.SALE, -amount, sale_id) for pro_id, amount in needed.items()])
+            return sale_id, {pro_id: list(r) for pro_id, r in changed.items()}
+
+    def _adjust(self, record):
+        self._adjustments.setdefault(_key(record[0]), []).append(_norm(record_codec.SALE_ADJUST, record))
+
+    def sales_of_day(self, sale_date):
+        with self._lock:
+            sales = (sale_ledger.apply_sale(self._sales[sale_id], self._adjustments.get(sale_id))
+                     for sale_id in self._days.get(date_codec.day_number(sale_date), []))
+            return [list(r) for r in sales if r is not None]
+
+    def _sale_lines(self, sale_id):
+        return sale_ledger.apply_lines(self._lines.get(sale_id, []), self._adjustments.get(sale_id, ()))
+
+    def sale_lines(self, sale_id):
+        with self._lock:
+            return [list(r) for r in self._sale_lines(sale_id)]
+
+    def _find_sale(self, sale_id, sale_date):
+        """The bill after its adjustments, or None if it is not on that day (or was voided)"""
+        if sale_id not in self._days.get(date_codec.day_number(sale_date), []):
+            return None
+        return sale_ledger.apply_sale(self._sales[sale_id], self._adjustments.get(sale_id))
+
+    def void_sale(self, sale_id, sale_date):
+        with self._lock:
+            sale = self._find_sale(sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = [(_key(r[1]), r[2]) for r in self._sale_lines(sale_id)]
+            returned = self._return_stock(lines)
+            self._record_moves(_return_moves(sale_id, lines, returned))
+            self._adjust(sale_ledger.record(sale_ledger.VOID, sale_id, record_codec.text(sale[2]),
+                                            sale_price=sale[3], discount=sale[4]))
+            return returned
+
+    def remove_sale_item(self, sale_id, sale_date, pro_id, amount):
+        with self._lock:
+            sale = self._find_sale(sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = self._sale_lines(sale_id)
+            if sale_ledger.item_amount(lines, pro_id) < amount:
+                return False
+            kept, returned = sale_ledger.remove_item(lines, pro_id, amount)
+            price, discount = _returned_amounts(lines, kept)
+            self._record_moves(_return_moves(sale_id, returned, self._return_stock(returned)))
+            self._adjust(sale_ledger.record(sale_ledger.RETURN, sale_id, record_codec.text(sale[2]),
+                                            pro_id, amount, price, discount))
+            return True
+
+    def update_sale(self, sale_id, sale_date, record, lines):
+        with self._lock:
+            sale = self._find_sale(sale_id, sale_date)
+            if sale is None:
+                return None
+            if not self.can_edit_sale(sale_id):
+                raise StorageError("This sale has returned items and cannot be edited")
+            changed = {}
+            changes = _edit_changes(self._lines.get(sale_id, []), sale[5], lines, record[5])
+            for pro_id, change in changes.items():
+                if pro_id not in self._products:
+                    if change < 0:
+                        raise StorageError(f"Product {pro_id} not found")
+                    continue
+                changed[pro_id] = list(self._products[pro_id])
+                _move_stock(changed[pro_id], pro_id, change)
+            self._products.update(changed)
+            self._record_moves([(pro_id, stock_ledger.RETURN if change > 0 else stock_ledger.SALE, change, sale_id)
+                                for pro_id, change in changes.items() if pro_id in changed])
+            self._sales[sale_id] = _norm(record_codec.SALE, record)
+            self._lines[sale_id] = [_norm(record_codec.SALE_DETAIL, (sale_id.encode(), pro_id.encode(), *rest))
+                                    for pro_id, *rest in lines]
+            old_day, new_day = date_codec.day_number(sale[2]), date_codec.day_number(self._sales[sale_id][2])
+            if new_day != old_day:
+                # ย้ายไปวันใหม่ คงลำดับตามที่บันทึกบิล
+                self._days[old_day].remove(sale_id)
+                order = {sid: n for n, sid in enumerate(self._sales)}
+                self._days.setdefault(new_day, []).append(sale_id)
+                self._days[new_day].sort(key=order.get)
+            return {pro_id: list(r) for pro_id, r in changed.items()}
+
+    # ----- history -----
+    def sale_adjustments(self, sale_id):
+        with self._lock:
+            return [list(r) for r in self._adjustments.get(sale_id, [])]
+
+    def stock_moves(self):
+        with self._lock:
+            return [list(r) for r in self._moves]
+
+    # ----- change logs -----
+    def append_log(self, path, data):
+        codec = LOG_CODECS[path]
+        with self._lock:
+            self._logs.setdefault(path, []).extend(codec.unpack(r) for r in log_writer.split(path, data))
+
+    def read_log(self, path, day=None, row_type=None):
+        with self._lock:
+            rows = list(self._logs.get(path, []))
+        if day is not None:
+            start, end = _day_range(day)
+            rows = [r for r in rows if start <= change_log.time_key(r[0]) < end]
+        return rows if row_type is None else [row_type(r) for r in rows]
+
+
+# ====== SQLite ======
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    seq INTEGER PRIMARY KEY, pro_id TEXT NOT NULL UNIQUE, pro_name TEXT NOT NULL,
+    pro_cost REAL NOT NULL, pro_saleprice REAL NOT NULL, pro_amount INTEGER NOT NULL,
+    category TEXT NOT NULL, status INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS customers (
+    seq INTEGER PRIMARY KEY, cust_id TEXT NOT NULL UNIQUE, cust_name TEXT NOT NULL,
+    cust_tel TEXT NOT NULL, status INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS customers_by_name ON customers (cust_name);
+CREATE TABLE IF NOT EXISTS sales (
+    seq INTEGER PRIMARY KEY, sale_id TEXT NOT NULL UNIQUE, cust_id TEXT NOT NULL,
+    sale_date TEXT NOT NULL, sale_day INTEGER NOT NULL, net_price REAL NOT NULL,
+    total_discount REAL NOT NULL, status INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS sales_by_day ON sales (sale_day);
+CREATE INDEX IF NOT EXISTS sales_by_customer ON sales (cust_id);
+CREATE TABLE IF NOT EXISTS sale_details (
+    seq INTEGER PRIMARY KEY, sale_id TEXT NOT NULL, pro_id TEXT NOT NULL,
+    amount INTEGER NOT NULL, sale_price REAL NOT NULL, discount REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS sale_details_by_sale ON sale_details (sale_id);
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY, path TEXT NOT NULL, ts TEXT NOT NULL, data BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS change_log_by_time ON change_log (path, ts);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS sale_adjustments (
+    seq INTEGER PRIMARY KEY, sale_id TEXT NOT NULL, sale_date TEXT NOT NULL, pro_id TEXT NOT NULL,
+    amount INTEGER NOT NULL, sale_price REAL NOT NULL, discount REAL NOT NULL, kind INTEGER NOT NULL,
+    ts TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS sale_adjustments_by_sale ON sale_adjustments (sale_id);
+CREATE TABLE IF NOT EXISTS stock_moves (
+    seq INTEGER PRIMARY KEY, ts INTEGER NOT NULL, pro_id TEXT NOT NULL, kind INTEGER NOT NULL,
+    qty INTEGER NOT NULL, ref TEXT NOT NULL);
+"""
+PRODUCT_COLUMNS = "pro_id, pro_name, pro_cost, pro_saleprice, pro_amount, category, status"
+CUSTOMER_COLUMNS = "cust_id, cust_name, cust_tel, status"
+SALE_COLUMNS = "sale_id, cust_id, sale_date, net_price, total_discount, status"
+SALE_DETAIL_COLUMNS = "sale_id, pro_id, amount, sale_price, discount"
+SALE_ADJUST_COLUMNS = "sale_id, sale_date, pro_id, amount, sale_price, discount, kind, ts"
+STOCK_MOVE_COLUMNS = "ts, pro_id, kind, qty, ref"
+
+
+def _to_row(codec, record):
+    """record_codec record -> SQLite values (text fields decoded)"""
+    return tuple(_key(v) if isinstance(v, bytes) else v for v in _norm(codec, record))
+
+
+def _from_row(row):
+    """SQLite values -> record_codec record (text fields as bytes)"""
+    return [v.encode() if isinstance(v, str) else v for v in row]
+
+
+class SQLiteStorage(Storage):
+    """One SQLite database file; every change is one transaction (BEGIN IMMEDIATE, so several tills can share it)"""
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        # autocommit mode: transaction เปิด/ปิดเองใน _write()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SQLITE_SCHEMA)
+
+    def _read(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _add(self, db, table, columns, codec, records):
+        # id เป็น UNIQUE: record ที่ id มีอยู่แล้ว (หรือซ้ำกันในชุด) ถูก IGNORE ไม่ต้องอ่าน id ทั้งตาราง
+        marks = ", ".join(["?"] * len(columns.split(",")))
+        added, skipped = [], []
+        for record in records:
+            if db.execute(f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({marks})",
+                          _to_row(codec, record)).rowcount:
+                added.append(record)
+            else:
+                skipped.append(_key(record[0]))
+        return added, skipped
+
+    def _record_moves(self, db, moves):
+        db.executemany(f"INSERT INTO stock_moves ({STOCK_MOVE_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                       [_to_row(record_codec.STOCK_MOVE, r) for r in stock_ledger.rows(moves)])
+
+    # ----- products -----
+    def products(self):
+        return {r[0]: _from_row(r) for r in self._read(f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY seq")}
+
+    def _product(self, db, pro_id):
+        row = db.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE pro_id = ?", (pro_id,)).fetchone()
+        return _from_row(row) if row else None
+
+    def get_product(self, pro_id):
+        with self._lock:
+            return self._product(self._db, pro_id)
+
+    def add_products(self, records):
+        with self._write() as db:
+            added, skipped = self._add(db, "products", PRODUCT_COLUMNS, record_codec.PRODUCT, records)
+            self._record_moves(db, [(_key(r[0]), stock_ledger.RECEIVE, r[4], "") for r in added])
+        return added, skipped
+
+    def _set_product(self, db, record):
+        row = _to_row(record_codec.PRODUCT, record)
+        return db.execute("UPDATE products SET pro_name = ?, pro_cost = ?, pro_saleprice = ?, pro_amount = ?, "
+                          "category = ?, status = ? WHERE pro_id = ?", row[1:] + row[:1]).rowcount
+
+    def update_product(self, record):
+        pro_id = _key(record[0])
+        with self._write() as db:
+            old = self._product(db, pro_id)
+            if old is None:
+                return False
+            self._set_product(db, record)
+            self._record_moves(db, [(pro_id, stock_ledger.ADJUST, _to_row(record_codec.PRODUCT, record)[4] - old[4], "")])
+        return True
+
+    def delete_product(self, pro_id):
+        with self._write() as db:
+            record = self._product(db, pro_id)
+            if record is not None:
+                db.execute("DELETE FROM products WHERE pro_id = ?", (pro_id,))
+                self._record_moves(db, [(pro_id, stock_ledger.ADJUST, -record[4], "")])
+        return record
+
+    # ----- customers -----
+    # ลบลูกค้าแบบ tombstone (status = CUSTOMER_DELETED) เหมือน engine แบบ file: แถวยังอยู่แต่ค้นหา/แก้ไม่ได้อีก
+    # การเพิ่มลูกค้า id เดิมใหม่ลบแถว tombstone ก่อน (แถวใหม่ได้ seq ท้ายสุดเหมือนต่อท้ายไฟล์)
+    def customers(self):
+        return [_from_row(r) for r in self._read(f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE status != ? "
+                                                 "ORDER BY seq", (record_codec.CUSTOMER_DELETED,))]
+
+    def _customer(self, db, cust_id):
+        row = db.execute(f"SELECT {CUSTOMER_COLUMNS} FROM customers WHERE cust_id = ? AND status != ?",
+                         (cust_id, record_codec.CUSTOMER_DELETED)).fetchone()
+        return _from_row(row) if row else None
+
+    def get_customer(self, cust_id):
+        with self._lock:
+            return self._customer(self._db, cust_id)
+
+    def find_customer(self, cust_name):
+        rows = self._read("SELECT cust_id FROM customers WHERE cust_name = ? AND status != ? ORDER BY seq LIMIT 1",
+                          (cust_name, record_codec.CUSTOMER_DELETED))
+        return rows[0][0] if rows else None
+
+    def add_customers(self, records):
+        with self._write() as db:
+            db.executemany("DELETE FROM customers WHERE cust_id = ? AND status = ?",
+                           [(_key(r[0]), record_codec.CUSTOMER_DELETED) for r in records])
+            return self._add(db, "customers", CUSTOMER_COLUMNS, record_codec.CUSTOMER, records)
+
+    def update_customer(self, cust_id, cust_name=None, cust_tel=None, status=None):
+        with self._write() as db:
+            r = self._customer(db, cust_id)
+            if r is None:
+                return None
+            if cust_name is not None:
+                r[1] = cust_name.encode()
+            if cust_tel is not None:
+                r[2] = cust_tel.encode()
+            if status is not None:
+                r[3] = int(status)
+            row = _to_row(record_codec.CUSTOMER, r)
+            db.execute("UPDATE customers SET cust_name = ?, cust_tel = ?, status = ? WHERE cust_id = ?",
+                       row[1:] + row[:1])
+        return _from_row(row)
+
+    def delete_customer(self, cust_id):
+        return self.update_customer(cust_id, status=record_codec.CUSTOMER_DELETED)
+
+    # ----- sales -----
+    def _next_sale_id(self, db):
+        row = db.execute("SELECT value FROM counters WHERE name = 'sale_id'").fetchone()
+        number = row[0] if row else 1
+        if number > sale_ids.MAX_NUMBER:
+            raise OverflowError(f"sale id numbers are used up (max {sale_ids.format_id(sale_ids.MAX_NUMBER)})")
+        db.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('sale_id', ?)", (number + 1,))
+        return sale_ids.format_id(number)
+
+    def _return_stock(self, db, lines):
+        returned = {}
+        for pro_id, amount in product_store.aggregate(lines).items():
+            record = self._product(db, pro_id)
+            if record is None:
+                continue
+            _give_back(record, amount)
+            self._set_product(db, record)
+            returned[pro_id] = record[4]
+        return returned
+
+    def _insert_sale(self, db, header):
+        row = _to_row(record_codec.SALE, header)
+        db.execute("INSERT INTO sales (sale_id, cust_id, sale_date, sale_day, net_price, total_discount, status) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)", row[:3] + (date_codec.day_number(row[2]),) + row[3:])
+
+    def _insert_lines(self, db, lines):
+        db.executemany(f"INSERT INTO sale_details ({SALE_DETAIL_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                       [_to_row(record_codec.SALE_DETAIL, r) for r in lines])
+
+    def commit_sale(self, cust_id, sale_date, lines, status=0):
+        with self._write() as db:
+            changed = {}
+            for pro_id, amount in product_store.aggregate((line[0], line[1]) for line in lines).items():
+                record = self._product(db, pro_id)
+                if record is None:
+                    raise StorageError(f"Product {pro_id} not found")
+                _take_stock(record, pro_id, amount)
+                self._set_product(db, record)
+                changed[pro_id] = record
+            sale_id = self._next_sale_id(db)
+            self._insert_lines(db, [(sale_id.encode(), pro_id.encode(), *rest) for pro_id, *rest in lines])
+            self._insert_sale(db, _sale_header(sale_id, cust_id, sale_date, lines, status))
+            self._record_moves(db, [(pro_id, stock_ledger.SALE, -amount, sale_id)
+                                    for pro_id, amount in product_store.aggregate((line[0], line[1]) for line in lines).items()])
+        return sale_id, changed
+
+    def _adjust(self, db, record):
+        db.execute(f"INSERT INTO sale_adjustments ({SALE_ADJUST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   _to_row(record_codec.SALE_ADJUST, record))
+
+    def _adjustments(self, db, sale_id):
+        return [_from_row(r) for r in db.execute(
+            f"SELECT {SALE_ADJUST_COLUMNS} FROM sale_adjustments WHERE sale_id = ? ORDER BY seq", (sale_id,))]
+
+    def sales_of_day(self, sale_date):
+        day = date_codec.day_number(sale_date)
+        with self._lock:
+            sales = [_from_row(r) for r in self._db.execute(
+                f"SELECT {SALE_COLUMNS} FROM sales WHERE sale_day = ? ORDER BY seq", (day,))]
+            adjusted = {}
+            for r in self._db.execute(f"SELECT {SALE_ADJUST_COLUMNS} FROM sale_adjustments WHERE sale_id IN "
+                                      "(SELECT sale_id FROM sales WHERE sale_day = ?) ORDER BY seq", (day,)):
+                adjusted.setdefault(r[0], []).append(_from_row(r))
+        sales = (sale_ledger.apply_sale(r, adjusted.get(_key(r[0]))) for r in sales)
+        return [list(r) for r in sales if r is not None]
+
+    def _sale_lines(self, db, sale_id):
+        return sale_ledger.apply_lines([_from_row(r) for r in db.execute(
+            f"SELECT {SALE_DETAIL_COLUMNS} FROM sale_details WHERE sale_id = ? ORDER BY seq", (sale_id,))],
+            self._adjustments(db, sale_id))
+
+    def sale_lines(self, sale_id):
+        with self._lock:
+            return [list(r) for r in self._sale_lines(self._db, sale_id)]
+
+    def _find_sale(self, db, sale_id, sale_date):
+        """The bill after its adjustments, or None if it is not on that day (or was voided)"""
+        row = db.execute(f"SELECT {SALE_COLUMNS} FROM sales WHERE sale_id = ? AND sale_day = ?",
+                         (sale_id, date_codec.day_number(sale_date))).fetchone()
+        return sale_ledger.apply_sale(_from_row(row), self._adjustments(db, sale_id)) if row else None
+
+    def void_sale(self, sale_id, sale_date):
+        with self._write() as db:
+            sale = self._find_sale(db, sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = [(_key(r[1]), r[2]) for r in self._sale_lines(db, sale_id)]
+            returned = self._return_stock(db, lines)
+            self._record_moves(db, _return_moves(sale_id, lines, returned))
+            self._adjust(db, sale_ledger.record(sale_ledger.VOID, sale_id, record_codec.text(sale[2]),
+                                                sale_price=sale[3], discount=sale[4]))
+        return returned
+
+    def remove_sale_item(self, sale_id, sale_date, pro_id, amount):
+        with self._write() as db:
+            sale = self._find_sale(db, sale_id, sale_date)
+            if sale is None:
+                return None
+            lines = self._sale_lines(db, sale_id)
+            if sale_ledger.item_amount(lines, pro_id) < amount:
+                return False
+            kept, returned = sale_ledger.remove_item(lines, pro_id, amount)
+            price, discount = _returned_amounts(lines, kept)
+            self._record_moves(db, _return_moves(sale_id, returned, self._return_stock(db, returned)))
+            self._adjust(db, sale_ledger.record(sale_ledger.RETURN, sale_id, record_codec.text(sale[2]),
+                                                pro_id, amount, price, discount))
+        return True
+
+    def update_sale(self, sale_id, sale_date, record, lines):
+        with self._write() as db:
+            sale = self._find_sale(db, sale_id, sale_date)
+            if sale is None:
+                return None
+            if not self.can_edit_sale(sale_id):
+                raise StorageError("This sale has returned items and cannot be edited")
+            changed, moves = {}, []
+            for pro_id, change in _edit_changes(self._sale_lines(db, sale_id), sale[5], lines, record[5]).items():
+                product = self._product(db, pro_id)
+                if product is None:
+                    if change < 0:
+                        raise StorageError(f"Product {pro_id} not found")
+                    continue
+                _move_stock(product, pro_id, change)
+                self._set_product(db, product)
+                changed[pro_id] = product
+                moves.append((pro_id, stock_ledger.RETURN if change > 0 else stock_ledger.SALE, change, sale_id))
+            self._record_moves(db, moves)
+            db.execute("DELETE FROM sale_details WHERE sale_id = ?", (sale_id,))
+            self._insert_lines(db, [(sale_id.encode(), pro_id.encode(), *rest) for pro_id, *rest in lines])
+            row = _to_row(record_codec.SALE, record)
+            db.execute("UPDATE sales SET cust_id = ?, sale_date = ?, sale_day = ?, net_price = ?, total_discount = ?, "
+                       "status = ? WHERE sale_id = ?", row[1:3] + (date_codec.day_number(row[2]),) + row[3:] + (sale_id,))
+        return changed
+
+    # ----- history -----
+    def sale_adjustments(self, sale_id):
+        with self._lock:
+            return self._adjustments(self._db, sale_id)
+
+    def stock_moves(self):
+        return [_from_row(r) for r in self._read(f"SELECT {STOCK_MOVE_COLUMNS} FROM stock_moves ORDER BY seq")]
+
+    # ----- change logs -----
+    def append_log(self, path, data):
+        with self._write() as db:
+            db.executemany("INSERT INTO change_log (path, ts, data) VALUES (?, ?, ?)",
+                           [(path, change_log.time_key(r[:change_log.TS_SIZE]).decode(), r)
+                            for r in log_writer.split(path, data)])
+
+    def read_log(self, path, day=None, row_type=None):
+        if day is None:
+            rows = self._read("SELECT data FROM change_log WHERE path = ? ORDER BY seq", (path,))
+        else:
+            start, end = _day_range(day)
+            rows = self._read("SELECT data FROM change_log WHERE path = ? AND ts >= ? AND ts < ? ORDER BY seq",
+                              (path, start.decode(), end.decode()))
+        return list(record_codec.iter_rows(b"".join(r[0] for r in rows), LOG_CODECS[path], row_type))
+
+
+# ====== Engine selection ======
+ENGINES = {"file": FileStorage, "sqlite": SQLiteStorage, "memory": MemoryStorage}
+_engine = None
+
+
+def open_engine(name=None):
+    """New engine object by name (default ENGINE)"""
+    name = name or ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"Unknown storage engine {name!r} (choose one of {', '.join(ENGINES)})")
+    return ENGINES[name]()
+
+
+def get():
+    """The engine every module uses (opened on first use)"""
+    global _engine
+    if _engine is None:
+        _engine = open_engine()
+    return _engine
+
+
+def use(engine):
+    """Switch every module to another engine object (scripts / tests) -> the previous one"""
+    global _engine
+    previous, _engine = _engine, engine
+    return previous
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# โมดูลของร้านอยู่ที่ root ของ repo และเปิดไฟล์ข้อมูลแบบ relative path จาก cwd
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sale_ids
+
+DATA_FILES = ("product.dat", "customer.dat", "sale.dat", "sale_detail.dat")
+
+
+@pytest.fixture
+def shop_dir(tmp_path, monkeypatch):
+    """An empty shop (the data files exist but hold no record) as the working directory"""
+    monkeypatch.chdir(tmp_path)
+    # เหมือนเปิดโปรแกรมใหม่: block ของ sale id ที่จองไว้เป็นของร้านก่อนหน้า
+    monkeypatch.setattr(sale_ids, "_next", 0)
+    monkeypatch.setattr(sale_ids, "_end", 0)
+    for name in DATA_FILES:
+        (tmp_path / name).touch()
+    return tmp_path
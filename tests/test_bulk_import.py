@@ -0,0 +1,59 @@
+import pytest
+
+import bulk_import
+import log_writer
+import record_codec
+import storage
+
+
+@pytest.fixture
+def log_writes(shop_dir, monkeypatch):
+    """File engine for this shop; every log_writer.write call is kept instead of written"""
+    monkeypatch.setattr(storage, "_engine", storage.FileStorage())
+    writes = []
+    monkeypatch.setattr(log_writer, "write", lambda path, data: writes.append((path, data)))
+    return writes
+
+
+def test_csv_products_are_added_with_one_log_batch(log_writes, shop_dir):
+    (shop_dir / "catalogue.csv").write_text(
+        "Pro_id,Pro_name,Pro_cost,Pro_salePrice,Pro_amount,Category,Pro_status\n"
+        "P001,Glock 19,18000,22000,10,pistol,\n"
+        "P002,AR-15,abc,35000,5,Rifle,1\n"
+        "\n"
+        "P003,Remington 870,28000,33000,4,Shotgun,2\n"
+        "P001,Glock 19 again,1,1,1,Pistol,1\n"
+        "P004,Laser,1,1,1,Cannon,1\n", encoding="utf-8")
+    result = bulk_import.import_file("products", str(shop_dir / "catalogue.csv"), "tester")
+
+    assert result["added"] == 2
+    assert result["duplicates"] == ["P001"]
+    assert [line for line, _ in result["errors"]] == [3, 7]
+    products = storage.get().products()
+    assert sorted(products) == ["P001", "P003"]
+    assert record_codec.text(products["P001"][5]) == "Pistol"
+    # ทั้งชุดเป็น log ADD ก้อนเดียว
+    assert [path for path, _ in log_writes] == ["product_change.bin"]
+    rows = list(record_codec.iter_rows(log_writes[0][1], record_codec.PRODUCT_LOG, record_codec.ProductLogRow))
+    assert [(r.op_code, r.pro_id, r.user) for r in rows] == [(1, "P001", "tester"), (1, "P003", "tester")]
+
+
+def test_jsonl_customers(log_writes, shop_dir):
+    (shop_dir / "customers.jsonl").write_text(
+        '{"Cust_id": "C001", "Cust_name": "john", "Cust_tel": "0800000000"}\n'
+        'not json\n'
+        '["C002"]\n'
+        '{"Cust_id": "C002", "Cust_name": "jane", "Cust_tel": "0811111111", "Cust_status": 0}\n',
+        encoding="utf-8")
+    result = bulk_import.import_file("customers", str(shop_dir / "customers.jsonl"))
+
+    assert result == {"added": 2, "duplicates": [], "errors": [(2, "not a JSON object"), (3, "not a JSON object")]}
+    assert [(record_codec.text(r[0]), r[3]) for r in storage.get().customers()] == [("C001", 1), ("C002", 0)]
+    assert storage.get().find_customer("jane") == "C002"
+    assert len(log_writes) == 1
+
+
+def test_nothing_valid_writes_no_log(log_writes, shop_dir):
+    (shop_dir / "empty.csv").write_text("Cust_id,Cust_name,Cust_tel\n,,\n", encoding="utf-8")
+    assert bulk_import.import_file("customers", str(shop_dir / "empty.csv"))["added"] == 0
+    assert log_writes == []
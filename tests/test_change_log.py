@@ -0,0 +1,93 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import change_log
+import log_writer
+import record_codec
+
+LOG = "customer_change.bin"
+CODEC = record_codec.CUSTOMER_LOG
+
+
+def _records(start, n, user):
+    """n packed log records one second apart, as one blob (like service._log_many)"""
+    return b"".join(CODEC.pack((start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S").encode(), 1,
+                               f"C{i:03}".encode(), b"name", b"0800000000", 1, user.encode())
+                    for i in range(n))
+
+
+@pytest.fixture
+def sync_log():
+    log_writer.set_sync(True)
+    yield
+    log_writer.set_sync(False)
+
+
+def test_batch_behind_a_newer_tail_is_merged_in_order(shop_dir, sync_log):
+    now = datetime.now().replace(microsecond=0)
+    log_writer.write(LOG, _records(now - timedelta(seconds=10), 3, "old"))
+    # เครื่องอื่นเขียนชุดที่เวลาใหม่กว่า แล้วเครื่องนี้เขียนชุดที่เก่ากว่าท้ายไฟล์
+    log_writer.write(LOG, _records(now + timedelta(seconds=30), 7, "other"))
+    log_writer.write(LOG, _records(now, 4, "this"))
+
+    rows = change_log.read_all(LOG, CODEC)
+    assert len(rows) == 14
+    stamps = [change_log.time_key(r[0]) for r in rows]
+    assert stamps == sorted(stamps)
+    assert [record_codec.text(r[6]).strip("\x00") for r in rows] == ["old"] * 3 + ["this"] * 4 + ["other"] * 7
+    assert change_log.find_range(LOG, CODEC, now, now + timedelta(seconds=31)) == (3, 8)
+
+
+def _write_log(stamps):
+    with open(LOG, "wb") as f:
+        for n, ts in enumerate(stamps):
+            f.write(CODEC.pack(ts.encode(), 1, f"C{n:03}".encode(), b"name", b"0800000000", 1, b"user"))
+
+
+def test_find_range_bisects_the_timestamps(shop_dir):
+    _write_log(["2030-01-04 23:59:59", "2030-01-05 08:00:00", "2030-01-05 08:00:00",
+                "2030-01-05_17:30:00", "2030-01-06 00:00:00"])
+    # "_" ในเวลาเท่ากับช่องว่าง (log รุ่นเก่า)
+    assert change_log.find_range(LOG, CODEC, "2030-01-05", "2030-01-06") == (1, 4)
+    assert change_log.find_range(LOG, CODEC, "2030-01-05 08:00:00", "2030-01-05 08:00:01") == (1, 3)
+    assert change_log.find_range(LOG, CODEC, None, "2030-01-05") == (0, 1)
+    assert change_log.find_range(LOG, CODEC, "2030-01-07") == (5, 5)
+    assert change_log.find_range("missing.bin", CODEC) == (0, 0)
+
+
+def test_read_day_returns_only_that_day(shop_dir):
+    _write_log(["2030-01-04 23:59:59", "2030-01-05 08:00:00", "2030-01-05 17:30:00", "2030-01-06 00:00:00"])
+    rows = change_log.read_day(LOG, CODEC, datetime(2030, 1, 5, 12, 0), record_codec.CustomerLogRow)
+    assert [r.cust_id for r in rows] == ["C001", "C002"]
+    assert change_log.read_records(LOG, CODEC, 2, 2) == []
+
+
+def test_rotate_moves_old_days_into_a_segment(shop_dir, monkeypatch):
+    monkeypatch.setattr(change_log, "BLOCK_RECORDS", 2)
+    today = datetime.now().strftime("%Y-%m-%d")
+    _write_log(["2020-01-04 10:00:00", "2020-01-05 08:00:00", "2020-01-05 09:00:00", f"{today} 00:00:01"])
+    assert change_log.rotate(LOG, CODEC) == 3
+    assert change_log.segment_paths(LOG) == ["customer_change.000001.seg"]
+    assert [r[0] for r in change_log.read_records(LOG, CODEC, 0, 1)] == [f"{today} 00:00:01".encode()]
+
+    # segment อ่านได้ตามช่วงเวลา (block ที่อยู่นอกช่วงถูกข้าม) และต่อกับไฟล์ hot ตามลำดับเวลา
+    assert [r.cust_id for r in change_log.read_day(LOG, CODEC, date(2020, 1, 5), record_codec.CustomerLogRow)] \
+        == ["C001", "C002"]
+    assert [r.cust_id for r in change_log.read_all(LOG, CODEC, record_codec.CustomerLogRow)] \
+        == ["C000", "C001", "C002", "C003"]
+    # ไม่มี record ของวันก่อนหน้าเหลือ -> ไม่ rotate อีก
+    assert change_log.maybe_rotate(LOG, CODEC) == 0
+
+
+def test_full_hot_log_is_rotated_whole(shop_dir, monkeypatch):
+    monkeypatch.setattr(change_log, "ROTATE_BYTES", 2 * CODEC.size)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _write_log([now, now])
+    assert change_log.maybe_rotate(LOG, CODEC) == 2
+    assert os.path.getsize(LOG) == 0
+    _write_log([now])
+    assert change_log.maybe_rotate(LOG, CODEC) == 0
+    assert change_log.segment_paths(LOG) == ["customer_change.000001.seg"]
+    assert len(change_log.read_all(LOG, CODEC)) == 3
@@ -0,0 +1,51 @@
+import os
+
+import compaction
+import customer_index
+import product_store
+import record_codec
+import storage
+
+PRODUCTS = [(f"P{n:03}".encode(), b"Glock 19", 18000.0, 22000.0, 10, b"Pistol", 1) for n in range(1, 5)]
+
+
+def test_new_product_reuses_a_deleted_slot(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_products(PRODUCTS)
+    size = os.path.getsize("product.dat")
+    assert record_codec.text(engine.delete_product("P002")[0]) == "P002"
+    assert engine.get_product("P002") is None
+    assert compaction.dead_count("product.dat", record_codec.PRODUCT) == (1, 4)
+
+    engine.add_products([(b"P005", b"AR-15", 30000.0, 35000.0, 5, b"Rifle", 1)])
+    assert os.path.getsize("product.dat") == size
+    assert product_store.find_offset("P005") == record_codec.PRODUCT.size
+    assert list(engine.products()) == ["P001", "P005", "P003", "P004"]
+
+
+def test_compaction_waits_for_the_threshold(shop_dir, monkeypatch):
+    monkeypatch.setattr(compaction, "MIN_DEAD", 2)
+    engine = storage.FileStorage()
+    engine.add_customers([(f"C{n:03}".encode(), f"cust{n}".encode(), b"0800000000", 1) for n in range(1, 7)])
+    engine.delete_customer("C002")
+    # 1 ใน 6 record: ยังไม่ถึงเกณฑ์
+    assert compaction.compact("customer.dat", record_codec.CUSTOMER) == 0
+    engine.delete_customer("C005")
+    assert not compaction.needs_compaction(2, 8)
+    assert compaction.compact("customer.dat", record_codec.CUSTOMER) == 2
+
+    assert compaction.dead_count("customer.dat", record_codec.CUSTOMER) == (0, 4)
+    # index เห็นว่าไฟล์เปลี่ยนแล้วสร้างใหม่: offset ของลูกค้าที่เลื่อนขึ้นมายังถูกต้อง
+    assert customer_index.lookup_offset("C006") == 3 * record_codec.CUSTOMER.size
+    assert record_codec.text(engine.get_customer("C006")[1]) == "cust6"
+    assert engine.find_customer("cust5") is None
+
+
+def test_force_compacts_any_tombstone(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_products(PRODUCTS)
+    engine.delete_product("P004")
+    assert compaction.compact("product.dat", record_codec.PRODUCT) == 0
+    assert compaction.compact("product.dat", record_codec.PRODUCT, force=True) == 1
+    assert os.path.getsize("product.dat") == 3 * record_codec.PRODUCT.size
+    assert list(engine.products()) == ["P001", "P002", "P003"]
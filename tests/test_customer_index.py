@@ -0,0 +1,47 @@
+import customer_index
+import record_codec
+import storage
+
+
+def _names():
+    return dict(customer_index._by_name)
+
+
+def _rebuilt():
+    customer_index.rebuild()
+    return _names()
+
+
+def test_names_follow_updates_and_deletes(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_customers([(b"C001", b"john", b"0800000000", 1), (b"C002", b"jane", b"0811111111", 1),
+                          (b"C003", b"john", b"0822222222", 1)])
+    # ชื่อซ้ำ -> ลูกค้าคนแรกในไฟล์
+    assert customer_index.lookup_name("john") == "C001"
+
+    engine.update_customer("C001", cust_name="jack")
+    assert customer_index.lookup_name("john") == "C003"
+    assert customer_index.lookup_name("jack") == "C001"
+    engine.update_customer("C002", cust_name="john")
+    assert customer_index.lookup_name("john") == "C002"
+    assert customer_index.lookup_name("jane") is None
+
+    engine.delete_customer("C002")
+    assert customer_index.lookup_name("john") == "C003"
+    engine.delete_customer("C003")
+    assert customer_index.lookup_name("john") is None
+    assert _names() == _rebuilt() == {"jack": "C001"}
+
+
+def test_index_is_reloaded_from_its_entries(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_customers([(b"C001", b"john", b"0800000000", 1), (b"C002", b"john", b"0811111111", 1)])
+    engine.update_customer("C001", cust_name="jack")
+    engine.delete_customer("C002")
+    engine.add_customers([(b"C002", b"jane", b"0822222222", 1)])
+    expected = _names()
+    # เหมือนอีก process: โหลด customer.idx ใหม่จาก entry ที่ต่อท้ายไว้
+    customer_index._loaded_header = None
+    customer_index.load()
+    assert _names() == expected == {"jack": "C001", "jane": "C002"}
+    assert customer_index.lookup_offset("C002") == 2 * record_codec.CUSTOMER.size
@@ -0,0 +1,67 @@
+import pytest
+
+import columnar
+import daily_totals
+import record_codec
+import sale_ledger
+import storage
+
+DAY1, DAY2 = "2030-01-05", "2030-01-06"
+
+
+def _write_sales(sales):
+    with open(daily_totals.SALE_FILE, "wb") as f:
+        for sale_id, day, net, status in sales:
+            f.write(record_codec.SALE.pack(sale_id.encode(), b"C001", day.encode(), net, 0.0, status))
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_rebuild_from_columns(shop_dir, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(columnar, "np", None)
+    elif columnar.np is None:
+        pytest.skip("NumPy is not installed")
+    _write_sales([("s001", DAY1, 100.0, 0), ("s002", DAY1, 300.0, 0), ("s003", DAY2, 50.0, 0),
+                  ("s004", DAY1, 300.0, 0), ("s005", DAY1, 500.0, 1), ("s006", DAY1, 20.0, 0),
+                  ("s007", DAY2, 80.0, 0)])
+    with open(sale_ledger.ADJUST_FILE, "wb") as f:
+        # s002 คืนสินค้า 250 -> เหลือ 50, s006 ถูก void
+        f.write(sale_ledger.pack(sale_ledger.RETURN, "s002", DAY1, "P001", 1, 250.0, 0.0))
+        f.write(sale_ledger.pack(sale_ledger.VOID, "s006", DAY1, sale_price=20.0))
+
+    assert daily_totals.rebuild() == 2
+    assert daily_totals.get(DAY1) == {"bills": 3, "total": 450.0,
+                                      "max": ("s004", "C001", 300.0), "min": ("s002", "C001", 50.0)}
+    assert daily_totals.get(DAY2) == {"bills": 2, "total": 130.0,
+                                      "max": ("s007", "C001", 80.0), "min": ("s003", "C001", 50.0)}
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_ties_keep_the_first_bill(shop_dir, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(columnar, "np", None)
+    elif columnar.np is None:
+        pytest.skip("NumPy is not installed")
+    _write_sales([("s001", DAY1, 70.0, 0), ("s002", DAY1, 70.0, 0), ("s003", DAY1, 70.0, 0)])
+    daily_totals.rebuild()
+    day = daily_totals.get(DAY1)
+    assert day["max"][0] == day["min"][0] == "s001"
+
+
+def test_incremental_totals_match_a_rebuild(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_products([(b"P001", b"Glock 19", 18000.0, 22000.0, 20, b"Pistol", 1)])
+    sales = [engine.commit_sale("C001", day, [("P001", amount, 22000.0 * amount, 0.0)])[0]
+             for day, amount in [(DAY1, 1), (DAY1, 3), (DAY2, 2), (DAY1, 2)]]
+    assert daily_totals.get(DAY1)["bills"] == 3          # note_added
+
+    engine.void_sale(sales[1], DAY1)                      # VOID ใน sale_adjust.dat
+    engine.remove_sale_item(sales[3], DAY1, "P001", 1)    # RETURN
+    header = (sales[2].encode(), b"C001", DAY1.encode(), 44000.0, 0.0, 0)
+    engine.update_sale(sales[2], DAY2, header, [("P001", 2, 44000.0, 0.0)])  # ย้ายวัน -> recompute
+    incremental = {day: daily_totals.get(day) for day in (DAY1, DAY2)}
+    assert incremental[DAY1] == {"bills": 3, "total": 88000.0,
+                                 "max": (sales[2], "C001", 44000.0), "min": (sales[0], "C001", 22000.0)}
+
+    daily_totals.rebuild()
+    assert {day: daily_totals.get(day) for day in (DAY1, DAY2)} == incremental
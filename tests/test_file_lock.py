@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import pytest
+
+import file_lock
+
+pytestmark = pytest.mark.skipif(not file_lock.ENABLED, reason="fcntl is not available")
+
+PATH = "product.dat"
+SIZE = 64
+PROBE = """
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR)
+kind = fcntl.LOCK_EX if sys.argv[2] == "exclusive" else fcntl.LOCK_SH
+try:
+    fcntl.lockf(fd, kind | fcntl.LOCK_NB, int(sys.argv[4]), int(sys.argv[3]))
+except OSError:
+    print("busy")
+else:
+    print("free")
+"""
+
+
+@pytest.fixture(autouse=True)
+def lock_files(monkeypatch):
+    # ไฟล์ .lock ถูกเปิดครั้งเดียวต่อ path: แต่ละ test อยู่คนละ directory จึงเริ่มใหม่
+    monkeypatch.setattr(file_lock, "_fds", {})
+    monkeypatch.setattr(file_lock, "_held", {})
+
+
+def _other_process(mode, offset=0, length=0):
+    """Try the lock from another process without waiting -> "free" or "busy" """
+    out = subprocess.run([sys.executable, "-c", PROBE, PATH + file_lock.LOCK_SUFFIX, mode, str(offset), str(length)],
+                         capture_output=True, text=True, check=True)
+    return out.stdout.strip()
+
+
+def test_nested_lock_of_the_same_thread(shop_dir):
+    with file_lock.exclusive(PATH):
+        # ชั้นนอกครอบทั้งไฟล์แบบ exclusive แล้ว ชั้นในเป็น no-op
+        with file_lock.records(PATH, [SIZE], SIZE), file_lock.shared(PATH):
+            pass
+        assert _other_process("shared") == "busy"
+    assert _other_process("exclusive") == "free"
+
+
+def test_nested_lock_outside_the_held_one_raises(shop_dir):
+    with file_lock.shared(PATH):
+        with pytest.raises(file_lock.LockError):
+            with file_lock.exclusive(PATH):
+                pass
+    with file_lock.records(PATH, [0], SIZE):
+        with pytest.raises(file_lock.LockError):
+            with file_lock.records(PATH, [SIZE], SIZE):
+                pass
+    # lock ชั้นนอกถูกปล่อยครบ ทั้งที่ชั้นในล้มเหลว
+    assert file_lock._held[PATH] == {}
+    assert _other_process("exclusive") == "free"
+
+
+def test_locks_against_another_process(shop_dir):
+    with file_lock.records(PATH, [SIZE], SIZE):
+        # record อื่นของไฟล์เดียวกันยังขายได้
+        assert _other_process("exclusive", SIZE, SIZE) == "busy"
+        assert _other_process("exclusive", 0, SIZE) == "free"
+    with file_lock.shared(PATH):
+        assert _other_process("shared") == "free"
+        assert _other_process("exclusive") == "busy"
+    assert _other_process("exclusive") == "free"
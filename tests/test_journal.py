@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import journal
+
+
+def _crash(ops):
+    raise OSError("power cut")
+
+
+def _commit_then_crash(tx):
+    """Commit tx but stop after the journal is on disk, before any data file is written"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(journal, "_apply", _crash)
+        with pytest.raises(OSError):
+            tx.commit()
+
+
+def test_committed_journal_is_replayed(shop_dir):
+    with open("a.dat", "wb") as f:
+        f.write(b"0123456789")
+    tx = journal.Transaction()
+    tx.write("a.dat", 2, b"AB")
+    tx.append("b.dat", b"new file")
+    tx.truncate("a.dat", 6)
+    # journal ถูก fsync แล้วแต่เครื่องดับก่อนเขียนลงไฟล์จริง
+    _commit_then_crash(tx)
+    assert open("a.dat", "rb").read() == b"0123456789"
+
+    assert journal.recover() == 3
+    assert open("a.dat", "rb").read() == b"01AB45"
+    assert open("b.dat", "rb").read() == b"new file"
+    assert os.path.getsize(journal.JOURNAL_FILE) == 0
+    assert journal.recover() == 0
+
+
+def test_replaying_twice_gives_the_same_files(shop_dir):
+    with open("a.dat", "wb") as f:
+        f.write(b"0123456789")
+    tx = journal.Transaction()
+    tx.replace("a.dat", b"xyz")
+    _commit_then_crash(tx)
+    data = open(journal.JOURNAL_FILE, "rb").read()
+
+    journal.recover()
+    with open(journal.JOURNAL_FILE, "wb") as f:
+        f.write(data)
+    journal.recover()
+    assert open("a.dat", "rb").read() == b"xyz"
+
+
+def test_incomplete_journal_is_discarded(shop_dir):
+    with open("a.dat", "wb") as f:
+        f.write(b"0123456789")
+    tx = journal.Transaction()
+    tx.write("a.dat", 0, b"ZZZZ")
+    _commit_then_crash(tx)
+    # เครื่องดับระหว่างเขียน journal: ไม่มี commit record ครบ
+    data = open(journal.JOURNAL_FILE, "rb").read()
+    with open(journal.JOURNAL_FILE, "wb") as f:
+        f.write(data[:-3])
+
+    assert journal.recover() == 0
+    assert open("a.dat", "rb").read() == b"0123456789"
+    assert os.path.getsize(journal.JOURNAL_FILE) == 0
@@ -0,0 +1,77 @@
+import os
+
+import product_store
+import record_codec
+
+SIZE = product_store.PRODUCT_RECORD_SIZE
+PRODUCTS = [(b"P001", b"Glock 19", 18000.0, 22000.0, 10, b"Pistol", 1),
+            (b"P002", b"AR-15", 30000.0, 35000.0, 0, b"Rifle", 2),
+            (b"P003", b"Remington 870", 28000.0, 33000.0, 4, b"Shotgun", 1)]
+
+
+def _write_products():
+    with open(product_store.PRODUCT_FILE, "wb") as f:
+        f.write(b"".join(record_codec.PRODUCT.pack(*r) for r in PRODUCTS))
+    return open(product_store.PRODUCT_FILE, "rb").read()
+
+
+def test_stock_change_rewrites_only_that_record(shop_dir):
+    before = _write_products()
+    offset, record = product_store.read_product("P003")
+    assert offset == 2 * SIZE
+    record[4] -= 3
+    product_store.write_records([(offset, record)])
+
+    after = open(product_store.PRODUCT_FILE, "rb").read()
+    assert len(after) == len(before)
+    assert after[:offset] == before[:offset]
+    assert product_store.read_product("P003")[1][4] == 1
+
+
+def test_return_stock_writes_each_product_once(shop_dir, monkeypatch):
+    _write_products()
+    writes = []
+    real = product_store.write_records
+    monkeypatch.setattr(product_store, "write_records",
+                        lambda updates, **kw: (writes.append(list(updates)), real(updates, **kw)))
+    result = product_store.return_stock([("P002", 1), ("P001", 2), ("P002", 3), ("P999", 1)])
+    assert result == {"P002": 4, "P001": 12}
+    assert [[offset for offset, _ in batch] for batch in writes] == [[SIZE, 0]]
+    # สินค้าที่ขายหมด (status 2) กลับมาขายได้
+    assert product_store.read_product("P002")[1][6] == 1
+
+
+def _age(ns):
+    """Give product.dat an mtime ns nanoseconds in the past (older than RACY_NS, so it can be cached)"""
+    st = os.stat(product_store.PRODUCT_FILE)
+    os.utime(product_store.PRODUCT_FILE, ns=(st.st_atime_ns, st.st_mtime_ns - ns))
+    return os.stat(product_store.PRODUCT_FILE).st_mtime_ns
+
+
+def test_external_write_invalidates_the_snapshot(shop_dir, monkeypatch):
+    monkeypatch.setattr(product_store, "_cache", None)
+    _write_products()
+    mtime = _age(10 * product_store.RACY_NS)
+    reads = []
+    real = record_codec.read_rows
+    monkeypatch.setattr(record_codec, "read_rows", lambda *a: (reads.append(a), real(*a))[1])
+
+    assert product_store.snapshot()["P001"][1][4] == 10
+    assert product_store.snapshot()["P001"][1][4] == 10
+    assert len(reads) == 1
+
+    # เครื่องอื่นต่อท้ายสินค้าใหม่: ขนาดไฟล์เปลี่ยน (แม้ mtime จะเท่าเดิม)
+    with open(product_store.PRODUCT_FILE, "ab") as f:
+        f.write(record_codec.PRODUCT.pack(b"P004", b"MP5", 40000.0, 45000.0, 2, b"SMG", 1))
+    os.utime(product_store.PRODUCT_FILE, ns=(mtime, mtime))
+    assert "P004" in product_store.snapshot()
+    assert len(reads) == 2
+
+    # เครื่องอื่นแก้ stock ในที่เดิม: ขนาดเท่าเดิม mtime เปลี่ยน
+    record = list(PRODUCTS[0])
+    record[4] = 7
+    with open(product_store.PRODUCT_FILE, "r+b") as f:
+        f.write(record_codec.PRODUCT.pack(*record))
+    _age(5 * product_store.RACY_NS)
+    assert product_store.snapshot()["P001"][1][4] == 7
+    assert len(reads) == 3
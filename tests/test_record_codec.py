@@ -0,0 +1,28 @@
+import record_codec
+
+PRODUCT = (b"P001", b"Glock 19", 18000.0, 22000.0, 10, b"Pistol", 1)
+
+
+def test_product_record_uses_the_native_layout():
+    # 13s20sffi12si มี padding ก่อน float -> 64 bytes ไม่ใช่ผลรวมของ field
+    assert record_codec.PRODUCT.size == 64
+    assert record_codec.fixed("P001", 13) == b"P001" + b"\x00" * 9
+    assert record_codec.fixed("x" * 20, 13) == b"x" * 13
+
+
+def test_rows_decode_only_what_is_asked():
+    data = record_codec.PRODUCT.pack(*PRODUCT) * 2 + b"\x00" * 10
+    # record ท้ายที่ไม่ครบถูกข้าม
+    rows = list(record_codec.iter_rows(data, record_codec.PRODUCT, record_codec.ProductRow))
+    assert len(rows) == 2
+    assert rows[0].pro_id == "P001" and rows[0].category == "Pistol"
+    assert rows[0].pro_amount == 10
+    assert rows[0].raw[0] == record_codec.fixed("P001", 13)
+    assert rows[0].pack() == data[:record_codec.PRODUCT.size]
+
+
+def test_live_rows_skip_tombstones(shop_dir):
+    dead = PRODUCT[:6] + (record_codec.PRODUCT_DELETED,)
+    with open("product.dat", "wb") as f:
+        f.write(record_codec.PRODUCT.pack(*dead) + record_codec.PRODUCT.pack(*PRODUCT))
+    assert [r.status for r in record_codec.live_rows("product.dat", record_codec.PRODUCT, record_codec.ProductRow)] == [1]
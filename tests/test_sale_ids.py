@@ -0,0 +1,37 @@
+import pytest
+
+import record_codec
+import sale_ids
+
+
+def _restart(monkeypatch):
+    """Like opening the program again: the block this process reserved is gone"""
+    monkeypatch.setattr(sale_ids, "_next", 0)
+    monkeypatch.setattr(sale_ids, "_end", 0)
+
+
+def test_first_block_continues_after_sale_dat(shop_dir, monkeypatch):
+    with open(sale_ids.SALE_FILE, "wb") as f:
+        for sale_id in (b"s007", b"s041", b"x999"):
+            f.write(record_codec.SALE.pack(sale_id, b"C001", b"2030-01-05", 1.0, 0.0, 0))
+    assert [sale_ids.next_id() for _ in range(2)] == ["s042", "s043"]
+
+    # เลขที่จองไว้แต่ไม่ได้ใช้ถูกข้าม ไม่ซ้ำกับ process เดิม
+    _restart(monkeypatch)
+    assert sale_ids.next_id() == sale_ids.format_id(42 + sale_ids.BLOCK_SIZE)
+
+
+def test_ids_grow_past_three_digits(shop_dir, monkeypatch):
+    monkeypatch.setattr(sale_ids, "BLOCK_SIZE", 2)
+    assert sale_ids.reserve(998) == 1
+    assert [sale_ids.next_id() for _ in range(3)] == ["s999", "s1000", "s1001"]
+    assert sale_ids.parse_id("s1001") == 1001
+    assert sale_ids.parse_id("x1001") is None
+    assert len(sale_ids.format_id(sale_ids.MAX_NUMBER)) == 10
+
+
+def test_reserve_refuses_numbers_past_the_field(shop_dir):
+    sale_ids.reserve(sale_ids.MAX_NUMBER - 5)
+    with pytest.raises(OverflowError):
+        sale_ids.reserve(10)
+    assert sale_ids.reserve(5) == sale_ids.MAX_NUMBER - 4
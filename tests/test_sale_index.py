@@ -0,0 +1,55 @@
+import pytest
+
+import record_codec
+import sale_index
+
+SIZE = sale_index.SALE_RECORD_SIZE
+DAY1, DAY2 = sale_index.date_key("2030-01-05"), sale_index.date_key("2030-01-06")
+
+
+@pytest.fixture
+def ranges(monkeypatch):
+    monkeypatch.setattr(sale_index, "_ranges", [])
+    return lambda: sale_index._ranges
+
+
+def test_insert_merges_with_both_neighbours(ranges):
+    sale_index._ranges[:] = [(DAY1, 0, 2), (DAY1, 3 * SIZE, 1)]
+    sale_index._insert(DAY1, 2 * SIZE)
+    assert ranges() == [(DAY1, 0, 4)]
+
+
+def test_insert_starts_a_new_range_for_another_day(ranges):
+    sale_index._ranges[:] = [(DAY1, 0, 2)]
+    sale_index._insert(DAY2, 2 * SIZE)
+    assert ranges() == [(DAY1, 0, 2), (DAY2, 2 * SIZE, 1)]
+
+
+def test_remove_splits_a_range(ranges):
+    sale_index._ranges[:] = [(DAY1, 0, 5)]
+    assert sale_index._remove(DAY1, 2 * SIZE)
+    assert ranges() == [(DAY1, 0, 2), (DAY1, 3 * SIZE, 2)]
+    assert not sale_index._remove(DAY2, 0)
+    assert not sale_index._remove(DAY1, 2 * SIZE)
+
+
+def _write_sales(days):
+    with open(sale_index.SALE_FILE, "wb") as f:
+        for n, day in enumerate(days):
+            f.write(record_codec.SALE.pack(f"s{n:03}".encode(), b"C001", day.encode(), 1.0, 0.0, 0))
+
+
+def _rebuilt():
+    sale_index.rebuild()
+    return list(sale_index._ranges)
+
+
+def test_moved_sale_changes_its_range(shop_dir):
+    _write_sales(["2030-01-05", "2030-01-05", "2030-01-05"])
+    sale_index.rebuild()
+    moved = record_codec.SALE.pack(b"s001", b"C001", b"2030-01-06", 1.0, 0.0, 0)
+
+    sale_index.write_sale(SIZE, moved)
+    assert sale_index._ranges == [(DAY1, 0, 1), (DAY1, 2 * SIZE, 1), (DAY2, SIZE, 1)]
+    assert sale_index._ranges == _rebuilt()
+    assert [offset for offset, _ in sale_index.read_day("2030-01-06")] == [SIZE]
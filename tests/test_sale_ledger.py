@@ -0,0 +1,48 @@
+import sale_ledger
+
+DAY = "2030-01-05"
+SALE = (b"s001", b"C001", DAY.encode(), 98994.0, 6.0, 0)
+LINES = [(b"s001", b"P001", 3, 66000.0, 6.0), (b"s001", b"P006", 1, 33000.0, 0.0)]
+
+
+def _return(pro_id, amount, sale_price, discount):
+    return sale_ledger.record(sale_ledger.RETURN, "s001", DAY, pro_id, amount, sale_price, discount)
+
+
+def test_bill_without_adjustments_is_unchanged():
+    assert sale_ledger.apply_sale(SALE, None) is SALE
+    assert sale_ledger.apply_lines(LINES, ()) is LINES
+
+
+def test_return_takes_its_price_and_discount_off():
+    adjusted = [_return("P001", 1, 22000.0, 2.0), _return("P006", 1, 33000.0, 0.0)]
+    # ยอดสุทธิลดลงเท่าราคาที่คืนหักส่วนลดของส่วนนั้น ส่วนลดรวมลดลงเท่าส่วนลดของส่วนนั้น
+    assert sale_ledger.apply_amounts(98994.0, 6.0, adjusted) == (98994.0 - 21998.0 - 33000.0, 4.0)
+    assert sale_ledger.apply_sale(SALE, adjusted) == (b"s001", b"C001", DAY.encode(), 43996.0, 4.0, 0)
+    assert sale_ledger.apply_lines(LINES, adjusted) == [(b"s001", b"P001", 2, 44000.0, 4.0)]
+
+
+def test_void_drops_the_bill():
+    adjusted = [_return("P001", 1, 22000.0, 2.0),
+                sale_ledger.record(sale_ledger.VOID, "s001", DAY, sale_price=76996.0, discount=4.0)]
+    assert sale_ledger.apply_amounts(98994.0, 6.0, adjusted) is None
+    assert sale_ledger.apply_sale(SALE, adjusted) is None
+
+
+def test_remove_item_shares_the_discount_out():
+    kept, returned = sale_ledger.remove_item(LINES, "P001", 1)
+    assert kept == [(b"s001", b"P001", 2, 44000.0, 4.0), (b"s001", b"P006", 1, 33000.0, 0.0)]
+    assert returned == [("P001", 1)]
+    kept, returned = sale_ledger.remove_item(LINES, "P006", 1)
+    assert kept == [(b"s001", b"P001", 3, 66000.0, 6.0)]
+
+
+def test_return_spreads_over_lines_of_the_same_product():
+    lines = [(b"s001", b"P001", 2, 44000.0, 0.0), (b"s001", b"P001", 3, 66000.0, 0.0)]
+    kept, returned = sale_ledger.remove_item(lines, "P001", 1)
+    assert kept == [(b"s001", b"P001", 1, 22000.0, 0.0), (b"s001", b"P001", 3, 66000.0, 0.0)]
+    assert returned == [("P001", 1)]
+    kept, returned = sale_ledger.remove_item(lines, "P001", 4)
+    assert kept == [(b"s001", b"P001", 1, 22000.0, 0.0)]
+    assert returned == [("P001", 4)]
+    assert sale_ledger.item_amount(lines, "P001") == 5
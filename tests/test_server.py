@@ -0,0 +1,48 @@
+from datetime import date
+
+import pytest
+
+import server_client
+import storage
+
+PRODUCTS = [(b"P001", b"Glock 19", 18000.0, 22000.0, 3, b"Pistol", 1)]
+CUSTOMERS = [(b"C001", b"john", b"0800000000", 1)]
+
+
+@pytest.fixture(scope="module")
+def port():
+    # server ตัวเดียวทั้ง module (thread เบื้องหลังหยุดเองตอนจบ pytest)
+    return server_client.start_background()
+
+
+@pytest.fixture
+def call(port, shop_dir, monkeypatch):
+    engine = storage.MemoryStorage()
+    engine.add_products(PRODUCTS)
+    engine.add_customers(CUSTOMERS)
+    monkeypatch.setattr(storage, "_engine", engine)
+    return lambda method, path, body=None: server_client.request(method, path, body, port=port)
+
+
+def test_sale_and_void(call):
+    today = date.today().isoformat()
+    status, sale = call("POST", "/sales", {"cust_id": "C001", "items": [{"pro_id": "P001", "amount": 2}]})
+    assert status == 201
+    assert sale["net_price"] == 44000.0
+    assert call("GET", "/products/P001")[1]["Pro_amount"] == 1
+    assert call("GET", f"/reports/daily?date={today}")[1]["bills"] == 1
+
+    status, voided = call("DELETE", f"/sales/{sale['sale_id']}?date={today}")
+    assert (status, voided["returned_stock"]) == (200, {"P001": 3})
+    assert call("GET", f"/reports/daily?date={today}")[1]["bills"] == 0
+
+
+def test_error_responses(call):
+    today = date.today().isoformat()
+    assert call("GET", "/products/P999")[0] == 404
+    assert call("DELETE", f"/sales/s999?date={today}")[0] == 404
+    # สองเครื่องแย่งสินค้าชิ้นท้าย ๆ: เครื่องที่สองได้ error และ stock ไม่เปลี่ยน
+    assert call("POST", "/sales", {"cust_id": "C001", "items": [{"pro_id": "P001", "amount": 3}]})[0] == 201
+    status, error = call("POST", "/sales", {"cust_id": "C001", "items": [{"pro_id": "P001", "amount": 1}]})
+    assert status == 400 and "Stock not enough" in error["error"]
+    assert call("GET", "/products/P001")[1]["Pro_amount"] == 0
@@ -0,0 +1,83 @@
+import pytest
+
+import service
+import storage
+
+DAY = "2030-01-05"
+PRODUCTS = [(b"P001", b"Glock 19", 18000.0, 22000.0, 3, b"Pistol", 1),
+            (b"P006", b"Remington 870", 28000.0, 33000.0, 10, b"Shotgun", 1)]
+CUSTOMERS = [(b"C001", b"john", b"0800000000", 1)]
+
+
+@pytest.fixture
+def engine(shop_dir, monkeypatch):
+    engine = storage.MemoryStorage()
+    engine.add_products(PRODUCTS)
+    engine.add_customers(CUSTOMERS)
+    monkeypatch.setattr(storage, "_engine", engine)
+    return engine
+
+
+def test_reserve_line_checks_stock_and_discount(engine):
+    products = engine.products()
+    cart = []
+    line = service.reserve_line(cart, products, "P001", 2, 500)
+    assert line == {"pro_id": "P001", "amount": 2, "sale_price": 44000.0, "discount": 500.0}
+    assert products["P001"][4] == 1
+    with pytest.raises(service.ServiceError, match="Stock not enough"):
+        service.reserve_line(cart, products, "P001", 2, 0)
+    with pytest.raises(service.ServiceError, match="Discount"):
+        service.reserve_line(cart, products, "P006", 1, 33001)
+    with pytest.raises(service.ServiceError, match="Amount"):
+        service.reserve_line(cart, products, "P006", 0, 0)
+    # สินค้าชิ้นสุดท้ายออกจาก snapshot -> status 2 (สินค้าหมด)
+    service.reserve_line(cart, products, "P001", 1, 0)
+    assert (products["P001"][4], products["P001"][6]) == (0, 2)
+    assert len(cart) == 2
+    # ยังไม่มีอะไรถูกเขียน
+    assert engine.get_product("P001")[4] == 3
+
+
+def test_can_edit_sale(engine):
+    sale = service.create_sale("C001", [("P006", 2, 0)], DAY)
+    assert service.can_edit_sale(sale["sale_id"])
+    assert service.remove_sale_item(sale["sale_id"], DAY, "P006", 1) is True
+    assert not service.can_edit_sale(sale["sale_id"])
+    with pytest.raises(service.ServiceError, match="returned items"):
+        service.update_sale(sale["sale_id"], DAY, status=1)
+
+
+def test_not_found(engine):
+    with pytest.raises(service.NotFound):
+        service.get_product("P999")
+    with pytest.raises(service.NotFound):
+        service.get_customer("C999")
+    with pytest.raises(service.NotFound):
+        service.void_sale("s999", DAY)
+    with pytest.raises(service.NotFound):
+        service.remove_sale_item("s999", DAY, "P001", 1)
+    with pytest.raises(service.NotFound):
+        service.update_sale("s999", DAY, status=1)
+    sale = service.create_sale("C001", [("P001", 1, 0)], DAY)
+    # บิลมีอยู่แต่ไม่ใช่วันนั้น
+    with pytest.raises(service.NotFound):
+        service.void_sale(sale["sale_id"], "2030-01-06")
+
+
+def test_cancel_and_uncancel_a_bill(engine):
+    sale = service.create_sale("C001", [("P001", 2, 0)], DAY)
+    cancelled = service.update_sale(sale["sale_id"], DAY, status=1)
+    assert cancelled["stock"] == {"P001": 3}
+    assert service.daily_summary(DAY)["bills"] == 0
+
+    restored = service.update_sale(sale["sale_id"], DAY, status=0)
+    assert restored["stock"] == {"P001": 1}
+    summary = service.daily_summary(DAY)
+    assert (summary["bills"], summary["total"]) == (1, 44000.0)
+
+    # ขายชิ้นที่เหลือไปแล้ว -> ยกเลิกการยกเลิกไม่ได้ stock ไม่พอ
+    service.update_sale(sale["sale_id"], DAY, status=1)
+    service.create_sale("C001", [("P001", 3, 0)], DAY)
+    with pytest.raises(service.ServiceError, match="Stock not enough"):
+        service.update_sale(sale["sale_id"], DAY, status=0)
+    assert service.get_product("P001")["Pro_amount"] == 0
@@ -0,0 +1,66 @@
+import time
+
+import journal
+import product_store
+import stock_ledger
+import storage
+
+DAY = "2030-01-05"
+PRODUCTS = [(b"P001", b"Glock 19", 18000.0, 22000.0, 10, b"Pistol", 1),
+            (b"P006", b"Remington 870", 28000.0, 33000.0, 5, b"Shotgun", 1)]
+
+
+def test_stock_at_replays_from_the_checkpoint(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_products(PRODUCTS)
+    before_sale = time.time_ns()
+    sale_id, _ = engine.commit_sale("C001", DAY, [("P001", 3, 66000.0, 0.0), ("P006", 1, 33000.0, 0.0)])
+    after_sale = time.time_ns()
+    engine.void_sale(sale_id, DAY)
+
+    assert stock_ledger.stock_at(before_sale) == {"P001": 10, "P006": 5}
+    assert stock_ledger.stock_at(after_sale) == {"P001": 7, "P006": 4}
+    assert stock_ledger.stock_at(time.time_ns()) == {"P001": 10, "P006": 5}
+    assert stock_ledger.verify() == {}
+    # ledger ไม่ย้อนไปก่อน checkpoint แรก
+    assert stock_ledger.stock_at(0) is None
+
+
+def test_checkpoint_every_n_movements(shop_dir, monkeypatch):
+    monkeypatch.setattr(stock_ledger, "CHECKPOINT_EVERY", 2)
+    engine = storage.FileStorage()
+    engine.add_products(PRODUCTS)
+    for _ in range(3):
+        engine.commit_sale("C001", DAY, [("P001", 1, 22000.0, 0.0)])
+    # checkpoint แรกก่อน movement แรก แล้วทุก 2 movement
+    assert [h[0] for h in stock_ledger.checkpoints()] == [0, 2, 4]
+    assert stock_ledger.count() == 5
+    assert stock_ledger.stock_at(time.time_ns()) == {"P001": 7, "P006": 5}
+
+
+def test_rolled_back_movement_leaves_no_checkpoint(shop_dir):
+    storage.FileStorage().add_products(PRODUCTS[:1])
+    assert stock_ledger.count() == 1
+    with open(stock_ledger.CHECKPOINT_FILE, "wb"):
+        pass
+    with open(stock_ledger.MOVES_FILE, "wb"):
+        pass
+
+    try:
+        with stock_ledger.lock(), journal.Transaction() as tx:
+            stock_ledger.append(tx, [("P001", stock_ledger.SALE, -1, "s001")])
+            raise RuntimeError("till crashed")
+    except RuntimeError:
+        pass
+    assert stock_ledger.checkpoints() == []
+    assert stock_ledger.count() == 0
+
+
+def test_verify_reports_drift(shop_dir):
+    engine = storage.FileStorage()
+    engine.add_products(PRODUCTS)
+    record = engine.get_product("P006")
+    record[4] = 9
+    # เขียน product.dat ตรงๆ โดยไม่บันทึก movement
+    product_store.write_records([(product_store.find_offset("P006"), record)])
+    assert stock_ledger.verify() == {"P006": (5, 9)}
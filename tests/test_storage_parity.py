@@ -0,0 +1,139 @@
+import pytest
+
+import record_codec
+import stock_ledger
+import storage
+
+DAY = "2030-01-05"
+PRODUCTS = [(b"P001", b"Glock 19", 18000.0, 22000.0, 10, b"Pistol", 1),
+            (b"P006", b"Remington 870", 28000.0, 33000.0, 10, b"Shotgun", 1)]
+CUSTOMERS = [(b"C001", b"john", b"0800000000", 1)]
+
+
+def _engine(name, shop_dir):
+    if name == "file":
+        return storage.FileStorage()
+    if name == "memory":
+        return storage.MemoryStorage()
+    return storage.SQLiteStorage(str(shop_dir / "shop.db"))
+
+
+def _history(engine):
+    """One sale with a return and one voided sale -> everything a till can read back"""
+    text = record_codec.text
+    engine.add_products(PRODUCTS)
+    engine.add_customers(CUSTOMERS)
+    kept, _ = engine.commit_sale("C001", DAY, [("P001", 3, 66000.0, 6.0), ("P006", 1, 33000.0, 0.0)])
+    voided, _ = engine.commit_sale("C001", DAY, [("P006", 2, 66000.0, 0.0)])
+    assert engine.remove_sale_item(kept, DAY, "P001", 1) is True
+    assert engine.remove_sale_item(kept, DAY, "P001", 5) is False
+    assert engine.void_sale(voided, DAY) == {"P006": 9}
+    assert engine.void_sale(voided, DAY) is None
+    totals = engine.day_totals(DAY)
+    return {
+        "sales": [(text(r[0]), text(r[1]), r[3], r[4], r[5]) for r in engine.sales_of_day(DAY)],
+        "lines": [(text(r[1]), r[2], r[3], r[4]) for r in engine.sale_lines(kept)],
+        "stock": {pro_id: r[4] for pro_id, r in engine.products().items()},
+        "totals": (totals["bills"], totals["total"]),
+        "adjustments": [(r[6], text(r[2]), r[3], r[4], r[5]) for sale_id in (kept, voided)
+                        for r in engine.sale_adjustments(sale_id)],
+        "moves": [(text(r[1]), r[2], r[3], text(r[4])) for r in engine.stock_moves()],
+        "can_edit": engine.can_edit_sale(kept),
+    }
+
+
+def test_file_engine_history(shop_dir):
+    history = _history(_engine("file", shop_dir))
+    assert history["sales"] == [("s001", "C001", 76996.0, 4.0, 0)]
+    assert history["lines"] == [("P001", 2, 44000.0, 4.0), ("P006", 1, 33000.0, 0.0)]
+    assert history["stock"] == {"P001": 8, "P006": 9}
+    assert history["totals"] == (1, 76996.0)
+    assert [a[0] for a in history["adjustments"]] == [2, 1]
+    assert history["moves"][2:] == [("P001", stock_ledger.SALE, -3, "s001"), ("P006", stock_ledger.SALE, -1, "s001"),
+                                    ("P006", stock_ledger.SALE, -2, "s002"), ("P001", stock_ledger.RETURN, 1, "s001"),
+                                    ("P006", stock_ledger.RETURN, 2, "s002")]
+    assert not history["can_edit"]
+
+
+@pytest.mark.parametrize("name", ["memory", "sqlite"])
+def test_engine_matches_file_engine(shop_dir, name):
+    assert _history(_engine(name, shop_dir)) == _history(_engine("file", shop_dir))
+
+
+@pytest.mark.parametrize("name", ["file", "memory", "sqlite"])
+def test_sale_with_returns_cannot_be_edited(shop_dir, name):
+    engine = _engine(name, shop_dir)
+    engine.add_products(PRODUCTS)
+    sale_id, _ = engine.commit_sale("C001", DAY, [("P001", 2, 44000.0, 0.0)])
+    engine.remove_sale_item(sale_id, DAY, "P001", 1)
+    header = (sale_id.encode(), b"C001", DAY.encode(), 22000.0, 0.0, 0)
+    with pytest.raises(storage.StorageError):
+        engine.update_sale(sale_id, DAY, header, [("P001", 1, 22000.0, 0.0)])
+
+
+@pytest.mark.parametrize("name", ["file", "memory", "sqlite"])
+def test_return_from_a_product_on_two_lines(shop_dir, name):
+    engine = _engine(name, shop_dir)
+    engine.add_products(PRODUCTS)
+    sale_id, _ = engine.commit_sale("C001", DAY, [("P001", 2, 44000.0, 0.0), ("P001", 3, 66000.0, 0.0)])
+    assert engine.remove_sale_item(sale_id, DAY, "P001", 1) is True
+    assert engine.products()["P001"][4] == 6
+    assert [r[2] for r in engine.sale_lines(sale_id)] == [1, 3]
+    assert [(r[3], r[4]) for r in engine.sale_adjustments(sale_id)] == [(1, 22000.0)]
+    assert engine.remove_sale_item(sale_id, DAY, "P001", 5) is False
+
+
+@pytest.mark.parametrize("name", ["file", "memory", "sqlite"])
+def test_deleted_customer_is_a_tombstone(shop_dir, name):
+    engine = _engine(name, shop_dir)
+    engine.add_customers(CUSTOMERS + [(b"C002", b"jane", b"0811111111", 1)])
+    deleted = engine.delete_customer("C001")
+    assert record_codec.text(deleted[0]) == "C001" and deleted[3] == record_codec.CUSTOMER_DELETED
+    assert engine.get_customer("C001") is None
+    assert engine.find_customer("john") is None
+    assert engine.update_customer("C001", cust_tel="0822222222") is None
+    assert engine.delete_customer("C001") is None
+    assert [record_codec.text(r[0]) for r in engine.customers()] == ["C002"]
+
+    # id เดิมเพิ่มใหม่ได้ และไปอยู่ท้ายสุด
+    assert engine.add_customers([(b"C001", b"jim", b"0833333333", 1)])[1] == []
+    assert engine.find_customer("jim") == "C001"
+    assert [record_codec.text(r[0]) for r in engine.customers()] == ["C002", "C001"]
+    # Cust_status 2 ผ่าน update ก็เป็นการลบเหมือนกัน
+    assert engine.update_customer("C002", status=record_codec.CUSTOMER_DELETED) is not None
+    assert engine.get_customer("C002") is None
+
+
+@pytest.mark.parametrize("name", ["file", "memory", "sqlite"])
+def test_cancel_and_uncancel_moves_stock_back(shop_dir, name):
+    engine = _engine(name, shop_dir)
+    engine.add_products(PRODUCTS)
+    sale_id, _ = engine.commit_sale("C001", DAY, [("P001", 3, 66000.0, 0.0)])
+
+    def header(status):
+        return (sale_id.encode(), b"C001", DAY.encode(), 66000.0, 0.0, status)
+
+    engine.update_sale(sale_id, DAY, header(1), [("P001", 3, 66000.0, 0.0)])
+    assert engine.products()["P001"][4] == 10
+    assert engine.day_totals(DAY)["bills"] == 0
+    # แก้บรรทัดของบิลที่ยกเลิกแล้ว: stock ไม่ขยับ
+    engine.update_sale(sale_id, DAY, header(1), [("P001", 4, 88000.0, 0.0)])
+    assert engine.products()["P001"][4] == 10
+    # ยกเลิกการยกเลิก: ตัดบรรทัดใหม่ออกจาก stock อีกครั้ง
+    engine.update_sale(sale_id, DAY, header(0), [("P001", 4, 88000.0, 0.0)])
+    assert engine.products()["P001"][4] == 6
+    totals = engine.day_totals(DAY)
+    assert (totals["bills"], totals["total"]) == (1, 66000.0)
+
+
+@pytest.mark.parametrize("name", ["file", "memory", "sqlite"])
+def test_uncancel_needs_enough_stock(shop_dir, name):
+    engine = _engine(name, shop_dir)
+    engine.add_products(PRODUCTS)
+    sale_id, _ = engine.commit_sale("C001", DAY, [("P001", 6, 132000.0, 0.0)])
+    cancelled = (sale_id.encode(), b"C001", DAY.encode(), 132000.0, 0.0, 1)
+    engine.update_sale(sale_id, DAY, cancelled, [("P001", 6, 132000.0, 0.0)])
+    engine.commit_sale("C001", DAY, [("P001", 8, 176000.0, 0.0)])
+    with pytest.raises(storage.StorageError):
+        engine.update_sale(sale_id, DAY, cancelled[:5] + (0,), [("P001", 6, 132000.0, 0.0)])
+    assert engine.products()["P001"][4] == 2
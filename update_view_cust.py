@@ -2,12 +2,18 @@ import struct
 from datetime import datetime
 from tabulate import tabulate
 import os
+import record_codec
+import audit_policy
+import service
+import storage
 # Customer format (main data file)
-Customer_format = '10s50s10si'  
-Customer_size = struct.calcsize(Customer_format)
+Customer_format = record_codec.CUSTOMER.format
+Customer_size = record_codec.CUSTOMER.size
 
-log_format = "19sI10s50s10sI20s"
-log_size = struct.calcsize(log_format)
+CUSTOMER_FILE = "customer.dat"
+
+log_format = record_codec.CUSTOMER_LOG.format
+log_size = record_codec.CUSTOMER_LOG.size
 
 
 # Constants for better maintainability
@@ -23,17 +29,17 @@ def log_change_binary(op_code, Customer_data, user):
     try:
         # Create timestamp - pad to exactly 19 bytes
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # 19 characters exactly
-        timestamp_bytes = ts.encode('utf-8').ljust(19, b'\x00')[:19]
+        timestamp_bytes = record_codec.fixed(ts, 19)
         
         # Prepare Customer data - ensure exact byte lengths
-        cust_id = str(Customer_data[0]).encode('utf-8').ljust(10, b'\x00')[:10]
-        custname = str(Customer_data[1]).encode('utf-8').ljust(50, b'\x00')[:50]
-        cust_tel = str(Customer_data[2]).encode('utf-8').ljust(10, b'\x00')[:10]
+        cust_id = record_codec.fixed(Customer_data[0], 10)
+        custname = record_codec.fixed(Customer_data[1], 50)
+        cust_tel = record_codec.fixed(Customer_data[2], 10)
         cus_status  = int(Customer_data[3])
-        user_bytes = str(user).encode('utf-8').ljust(20, b'\x00')[:20]
+        user_bytes = record_codec.fixed(user, 20)
         
         # Pack the complete record
-        record = struct.pack(log_format, 
+        record = record_codec.CUSTOMER_LOG.pack(
                            timestamp_bytes,    # 19 bytes
                            op_code,           # 4 bytes (i)
                            cust_id,            # 10 bytes
@@ -43,15 +49,13 @@ def log_change_binary(op_code, Customer_data, user):
                            user_bytes)        # 20 bytes
         
         # Verify the record size is correct
-        expected_size = struct.calcsize(log_format)
+        expected_size = log_size
         if len(record) != expected_size:
             print(f"⚠️ Warning: Record size mismatch! Expected {expected_size}, got {len(record)}")
             return False
         
-        # Write the complete record as one atomic operation
-        with open("customer_change.bin", "ab") as f:
-            f.write(record)
-            f.flush()  # Ensure data is written immediately
+        # ส่ง record ให้ storage engine (แบบ file: log_writer เขียนเป็นชุดใน thread เบื้องหลัง)
+        storage.get().append_log("customer_change.bin", record)
         
         print(f"📝 Logged: {OPERATIONS.get(op_code, 'UNKNOWN')} Customer {Customer_data[0]} by {user} ({len(record)} bytes)")
         return True
@@ -63,35 +67,18 @@ def log_change_binary(op_code, Customer_data, user):
         print(f"❌ Unexpected error in logging: {e}")
         return False
 
+def log_view_summary(user, count):
+    """Write count aggregated VIEWs of one user as a single VIEW record (audit_policy "aggregated")"""
+    return log_change_binary(4, ["*", f"{count} views", "", 1], user)
+
+audit_policy.register_aggregate("customer_change.bin", log_view_summary)
+
 def read_all_Customers():
-    """Helper function to read all Customers from binary file"""
-    data = []
-    try:
-        with open("Customer.dat", "rb") as f:
-            while True:
-                chunk = f.read(Customer_size)
-                if not chunk:
-                    break
-                if len(chunk) < Customer_size:
-                    continue
-                record = struct.unpack(Customer_format, chunk)
-                data.append(record)
-        return data
-    except FileNotFoundError:
+    """Helper function to read all Customers from the storage engine"""
+    data = storage.get().customers()
+    if not data:
         print("❌ Customer file not found!")
-        return []
-
-def write_all_Customers(data):
-    """Helper function to write all Customers to binary file"""
-    try:
-        with open('Customer.dat', 'wb') as f:
-            for record in data:
-                binary_record = struct.pack(Customer_format, *record)
-                f.write(binary_record)
-        return True
-    except Exception as e:
-        print(f"❌ Error writing to file: {e}")
-        return False
+    return data
 
 def get_user_input(prompt, current_value=None, data_type=str, required=False):
     """Helper function for user input with validation"""
@@ -137,11 +124,11 @@ def update_Customer():
     
     # Find and update record
     for i, record in enumerate(data):
-        current_id = record[0].decode().strip("\x00")
+        current_id = record_codec.text(record[0])
         if current_id == cust_id:
             # Get current values
-            current_name = record[1].decode().strip("\x00")
-            current_tel = record[2].decode().strip("\x00")
+            current_name = record_codec.text(record[1])
+            current_tel = record_codec.text(record[2])
             current_status = record[3]
             
             
@@ -160,25 +147,14 @@ def update_Customer():
                 print("❌ Invalid status! Using current value.")
                 status = current_status
             
-            # Create updated binary record
-            cust_id_bytes = cust_id.encode().ljust(13, b'\x00')
-            name_bytes = name.encode().ljust(20, b'\x00')
-            tel_bytes = tel.encode().ljust(12, b'\x00')
-            
-            updated_record = struct.pack(Customer_format,
-                                       cust_id_bytes, name_bytes, tel_bytes, status)
-            
-            # Replace the record in data list
-            data[i] = struct.unpack(Customer_format, updated_record)
-            
-            # Write back to file
-            if write_all_Customers(data):
-                # Log the update
-                Customer_data = [cust_id, name, tel, status]
-                log_change_binary(2, Customer_data, user)
-                print("✅ Customer updated successfully!")
-            else:
-                print("❌ Failed to save changes!")
+            # Positioned write of this one record + index + log (service.update_customer)
+            try:
+                service.update_customer(cust_id, user, name, tel, status)
+            except (service.ServiceError, OSError) as e:
+                print(f"❌ Failed to save changes! {e}")
+                return
+            print(f"📝 Logged: {OPERATIONS[2]} Customer {cust_id} by {user} ({log_size} bytes)")
+            print("✅ Customer updated successfully!")
             return
     
     print("❌ Customer ID not found.")
@@ -186,9 +162,9 @@ def update_Customer():
 def format_Customer_record(record):
     """Helper function to format Customer record for display"""
     decoded_record = (
-        record[0].decode().strip("\x00"),
-        record[1].decode().strip("\x00"),
-        record[2].decode().strip("\x00"),
+        record_codec.text(record[0]),
+        record_codec.text(record[1]),
+        record_codec.text(record[2]),
         record[3]
     )
     
@@ -234,7 +210,7 @@ def view_Customers_with_tabulate():
             
             # Log the VIEW operation for the specific Customer
             original_record = next((row for row in formatted_data if row[0] == Customer_id), None)
-            if original_record:
+            if original_record and audit_policy.audit_view("customer_change.bin", user):
                 Customer_data = [
                     original_record[0],
                     original_record[1],
@@ -250,7 +226,7 @@ def view_Customers_with_tabulate():
         print(tabulate(formatted_data, headers=headers, tablefmt="grid"))
         
         # Log VIEW operation for all Customers view - use first Customer as representative
-        if formatted_data:
+        if formatted_data and audit_policy.audit_view("customer_change.bin", user):
             first_Customer = formatted_data[0]
             Customer_data = [
                 first_Customer[0],
@@ -262,15 +238,11 @@ def view_Customers_with_tabulate():
         
     
 
-def view_change_log():
-    """View change log with user field support"""
-    
-    if not os.path.exists("customer_change.bin"):
-        print("📄 No change log found!")
-        return
+def view_change_log(day=None):
+    """View change log with user field support (day = show only that day's entries)"""
     
-    # Check file format 
-    file_size = os.path.getsize("customer_change.bin")
+    # Check file format (engine แบบ file เท่านั้นที่มีไฟล์ log)
+    file_size = os.path.getsize("customer_change.bin") if os.path.exists("customer_change.bin") else 0
     if file_size % log_size != 0:
         print("⚠️  Warning: Log file might be corrupted!")
         print(f"File size: {file_size} bytes, Expected record size: {log_size} bytes")
@@ -279,46 +251,28 @@ def view_change_log():
     changes = []
     
     try:
-        with open("customer_change.bin", "rb") as f:
-            record_num = 1
-            while True:
-                chunk = f.read(log_size)
-                if not chunk:
-                    break
-                    
-                if len(chunk) < log_size:
-                    print(f"⚠️ Incomplete record #{record_num}, skipping...")
-                    continue
-                
-                try:
-                    # Unpack log record with user field
-                    record = struct.unpack(log_format, chunk)
-                    
-                    # Decode strings properly
-                    timestamp = record[0].decode('utf-8', errors='ignore').strip('\x00')
-                    op_code = record[1]
-                    Cust_id = record[2].decode('utf-8', errors='ignore').strip('\x00')
-                    name_after = record[3].decode('utf-8', errors='ignore').strip('\x00')
-                    tel_after = record[4].decode('utf-8', errors='ignore').strip('\x00')
-                    status_after = record[5]
-                    user = record[6].decode('utf-8', errors='ignore').strip('\x00')
-                    
-                    changes.append([
-                        record_num,
-                        OPERATIONS.get(op_code, f"OP_{op_code}"),
-                        timestamp,
-                        Cust_id,
-                        name_after,
-                        tel_after,
-                        STATUS_NAMES.get(status_after, f"Status_{status_after}"),
-                        user
-                    ])
-                    
-                except (struct.error, UnicodeDecodeError) as e:
-                    print(f"⚠️ Error reading record #{record_num}: {e}")
-                    continue
+        record_num = 1
+        # ผ่าน storage engine (แบบ file: ระบุวัน = binary search ตาม timestamp แล้วอ่านเฉพาะช่วงนั้น)
+        records = storage.get().read_log("customer_change.bin", day, record_codec.CustomerLogRow)
+        for record in records:
+            try:
+                status_after = record.status
+                changes.append([
+                    record_num,
+                    OPERATIONS.get(record.op_code, f"OP_{record.op_code}"),
+                    record.ts,
+                    record.cust_id,
+                    record.cust_name,
+                    record.cust_tel,
+                    STATUS_NAMES.get(status_after, f"Status_{status_after}"),
+                    record.user
+                ])
                 
-                record_num += 1
+            except (struct.error, UnicodeDecodeError) as e:
+                print(f"⚠️ Error reading record #{record_num}: {e}")
+                continue
+            
+            record_num += 1
                 
     except Exception as e:
         print(f"❌ Error reading log file: {e}")